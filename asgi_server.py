@@ -0,0 +1,115 @@
+"""Production serving mode: admission control and load shedding in front of the dashboard
+
+    python asgi_server.py [host] [port]
+    uvicorn asgi_server:application --host 0.0.0.0 --port 8050
+
+The Flask app runs unchanged, converted to ASGI by a2wsgi on a pool of
+DISPATCH_THREADS threads, under an ASGI server (uvicorn). In front of it,
+AdmissionControl lets at most DISPATCH_THREADS requests run at once; up to
+MAX_PENDING more wait for a free slot, for at most QUEUE_TIMEOUT seconds,
+and anything beyond that is answered straight away with 503 and a
+Retry-After header. An overloaded server thus sheds load instead of
+building an unbounded queue in which every request times out. The
+admission counters are exported at /metrics.
+
+This is not a faster way to run the app: the callbacks are CPU-bound
+pandas and plotly work on threads sharing the GIL, so requests per second
+stay those of the thread pool. What changes past saturation is that the
+latency of admitted requests stays bounded and the excess fails fast;
+load_test.py --compare measures both against the development server.
+"""
+
+import asyncio
+import os
+import sys
+
+from a2wsgi import WSGIMiddleware
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+# Importing the app loads the data, once per server process
+from crime_dashboard_with_map import server
+from instrumentation import REGISTRY
+
+DISPATCH_THREADS = int(os.environ.get('CRIME_DASHBOARD_DISPATCH_THREADS', 8))
+MAX_PENDING = int(os.environ.get('CRIME_DASHBOARD_MAX_PENDING', 64))
+QUEUE_TIMEOUT = float(os.environ.get('CRIME_DASHBOARD_QUEUE_TIMEOUT', 30))
+
+
+class AdmissionControl:
+    """ASGI middleware running at most limit HTTP requests of app at once, queueing or shedding the rest"""
+
+    def __init__(self, app, limit=DISPATCH_THREADS, max_pending=MAX_PENDING, queue_timeout=QUEUE_TIMEOUT):
+        self.app = app
+        self.limit = limit
+        self.max_pending = max_pending
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiting = 0
+        self.rejected = 0
+        # Created on first use, inside the server's event loop
+        self._slots = None
+
+    def stats(self):
+        return {'active': self.active, 'waiting': self.waiting, 'rejected': self.rejected}
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.limit)
+        if not self._slots.locked():
+            # A free slot is taken without yielding, so the next request sees it gone
+            await self._slots.acquire()
+        elif self.waiting >= self.max_pending:
+            return await self._reject(send)
+        else:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                return await self._reject(send)
+            finally:
+                self.waiting -= 1
+
+        self.active += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.active -= 1
+            self._slots.release()
+
+    async def _reject(self, send):
+        self.rejected += 1
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [(b'content-type', b'text/plain'), (b'retry-after', b'1')]
+        })
+        await send({'type': 'http.response.body', 'body': b'Server busy, retry shortly\n'})
+
+
+def dispatcher_metrics():
+    stats = application.stats()
+    return [
+        ('crime_dashboard_dispatch_active', 'Requests running on a dispatch thread', {(): stats['active']}),
+        ('crime_dashboard_dispatch_waiting', 'Requests waiting for a dispatch thread', {(): stats['waiting']}),
+        ('crime_dashboard_dispatch_rejected', 'Requests turned away with 503', {(): stats['rejected']}),
+    ]
+
+
+# As many threads as admitted requests, so an admitted request never waits for one
+application = AdmissionControl(WSGIMiddleware(server, workers=DISPATCH_THREADS))
+REGISTRY.add_collector(dispatcher_metrics)
+
+
+if __name__ == '__main__':
+    if uvicorn is None:
+        sys.exit("asgi_server.py needs an ASGI server: pip install uvicorn")
+    host = sys.argv[1] if len(sys.argv) > 1 else '0.0.0.0'
+    port = int(sys.argv[2]) if len(sys.argv) > 2 else 8050
+    # One process: the figure caches, job queue and stream ingester live in it
+    uvicorn.run(application, host=host, port=port, loop='asyncio', log_level='warning')
@@ -0,0 +1,233 @@
+// Clientside filtering of the overview page (CRIME_DASHBOARD_CLIENTSIDE=1).
+//
+// The server ships the selected state's rows once as typed arrays (see
+// overview_clientside.py); every slider movement is then answered here by
+// filtering them and rebuilding the scatter plot, histogram and box plot with
+// the same statistics and styling as overview_figures.py.
+
+(function () {
+    var TYPED_ARRAYS = {
+        uint8: Uint8Array, uint16: Uint16Array, uint32: Uint32Array,
+        int8: Int8Array, int16: Int16Array, int32: Int32Array,
+        float32: Float32Array, float64: Float64Array
+    };
+
+    // Decoded columns per payload, so a drag only decodes once
+    var decoded = new WeakMap();
+
+    function decodeArray(encoded) {
+        var binary = atob(encoded.data);
+        var bytes = new Uint8Array(binary.length);
+        for (var i = 0; i < binary.length; i++) {
+            bytes[i] = binary.charCodeAt(i);
+        }
+        var codes = new TYPED_ARRAYS[encoded.dtype](bytes.buffer);
+        if (encoded.missing === null) {
+            return codes;
+        }
+        var values = new Float64Array(codes.length);
+        for (var j = 0; j < codes.length; j++) {
+            values[j] = codes[j] === encoded.missing ? NaN : codes[j] / encoded.scale;
+        }
+        return values;
+    }
+
+    function decodePayload(payload) {
+        var columns = decoded.get(payload);
+        if (!columns) {
+            columns = {labels: decodeArray(payload.labels)};
+            Object.keys(payload.columns).forEach(function (name) {
+                columns[name] = decodeArray(payload.columns[name]);
+            });
+            decoded.set(payload, columns);
+        }
+        return columns;
+    }
+
+    function round(value, places) {
+        var scale = Math.pow(10, places);
+        return Math.round(value * scale) / scale;
+    }
+
+    // Same snapping as figure_cache.quantize_range
+    function quantize(low, high, step) {
+        return [
+            round(Math.floor(round(low / step, 6)) * step, 10),
+            round(Math.ceil(round(high / step, 6)) * step, 10)
+        ];
+    }
+
+    function copy(object) {
+        return JSON.parse(JSON.stringify(object));
+    }
+
+    // Linear interpolation between closest ranks, as numpy.quantile
+    function quantile(sorted, q) {
+        var position = q * (sorted.length - 1);
+        var lower = Math.floor(position);
+        var upper = Math.min(lower + 1, sorted.length - 1);
+        var a = sorted[lower], b = sorted[upper], t = position - lower;
+        return t >= 0.5 ? b - (b - a) * (1 - t) : a + (b - a) * t;
+    }
+
+    // Row positions per state label, labels in order of first appearance
+    function groupRows(rows, labels) {
+        var groups = [];
+        var byCode = {};
+        rows.forEach(function (row) {
+            var code = labels[row];
+            if (code < 0) {
+                return;
+            }
+            if (!(code in byCode)) {
+                byCode[code] = {code: code, rows: []};
+                groups.push(byCode[code]);
+            }
+            byCode[code].rows.push(row);
+        });
+        return groups;
+    }
+
+    function pick(values, rows) {
+        var picked = new Float64Array(rows.length);
+        for (var i = 0; i < rows.length; i++) {
+            picked[i] = values[rows[i]];
+        }
+        return picked;
+    }
+
+    function scatterFigure(payload, columns, rows, groups, templates) {
+        var size = columns.medIncome;
+        var maxSize = -Infinity;
+        rows.forEach(function (row) {
+            if (size[row] > maxSize) {
+                maxSize = size[row];
+            }
+        });
+        var sizeref = rows.length ? 2.0 * maxSize / (templates.size_max * templates.size_max) : 1;
+        var type = rows.length > templates.webgl_threshold ? 'scattergl' : 'scatter';
+
+        var traces = groups.map(function (group, i) {
+            var label = payload.label_names[group.code];
+            var trace = copy(templates.scatter.trace);
+            trace.type = type;
+            trace.x = pick(columns.population, group.rows);
+            trace.y = pick(columns.ViolentCrimesPerPop, group.rows);
+            trace.customdata = group.rows.map(function (row) {
+                return [payload.names[row], columns.pctUrban[row], columns.PctPopUnderPov[row]];
+            });
+            trace.name = trace.legendgroup = trace.meta = label;
+            trace.marker.color = templates.colors[i % templates.colors.length];
+            trace.marker.size = pick(size, group.rows);
+            trace.marker.sizeref = sizeref;
+            return trace;
+        });
+        var layout = copy(templates.scatter.layout);
+        layout.uirevision = payload.uirevision;
+        return {data: traces, layout: layout};
+    }
+
+    // numpy.histogram: equal-width bins over the data range, last bin closed
+    function histogramFigure(crime, rows, templates) {
+        var bins = templates.histogram_bins;
+        var values = pick(crime, rows);
+        var low = Infinity, high = -Infinity;
+        values.forEach(function (value) {
+            low = Math.min(low, value);
+            high = Math.max(high, value);
+        });
+        if (!values.length) {
+            low = 0;
+            high = 1;
+        } else if (low === high) {
+            low -= 0.5;
+            high += 0.5;
+        }
+        var edges = [];
+        for (var i = 0; i < bins; i++) {
+            edges.push(i * ((high - low) / bins) + low);
+        }
+        edges.push(high);
+
+        // Bin index from the scaled offset, corrected against the edges like numpy
+        var norm = bins / (high - low);
+        var counts = new Array(bins).fill(0);
+        values.forEach(function (value) {
+            var index = Math.min(Math.floor((value - low) * norm), bins - 1);
+            if (value < edges[index]) {
+                index -= 1;
+            } else if (index !== bins - 1 && value >= edges[index + 1]) {
+                index += 1;
+            }
+            counts[index] += 1;
+        });
+
+        var trace = copy(templates.histogram.trace);
+        trace.x = counts.map(function (_, i) { return (edges[i] + edges[i + 1]) / 2; });
+        trace.y = counts;
+        trace.width = counts.map(function (_, i) { return edges[i + 1] - edges[i]; });
+        return {data: [trace], layout: copy(templates.histogram.layout)};
+    }
+
+    // Tukey boxes for the states with the most rows, largest first
+    function boxFigure(payload, crime, groups, templates) {
+        var top = groups.map(function (group, i) { return [group, i]; });
+        top.sort(function (a, b) { return (b[0].rows.length - a[0].rows.length) || (a[1] - b[1]); });
+        top = top.slice(0, templates.box_states).map(function (entry) { return entry[0]; });
+
+        var box = copy(templates.box.trace);
+        var outliers = copy(templates.box.outliers);
+        ['x', 'q1', 'median', 'q3', 'lowerfence', 'upperfence'].forEach(function (key) { box[key] = []; });
+        outliers.x = [];
+        outliers.y = [];
+        top.forEach(function (group) {
+            var label = payload.label_names[group.code];
+            var sorted = Array.from(pick(crime, group.rows)).sort(function (a, b) { return a - b; });
+            var q1 = quantile(sorted, 0.25), q3 = quantile(sorted, 0.75);
+            var reach = 1.5 * (q3 - q1);
+            var inside = sorted.filter(function (value) { return value >= q1 - reach && value <= q3 + reach; });
+            var lower = inside[0], upper = inside[inside.length - 1];
+            box.x.push(label);
+            box.q1.push(q1);
+            box.median.push(quantile(sorted, 0.5));
+            box.q3.push(q3);
+            box.lowerfence.push(lower);
+            box.upperfence.push(upper);
+            sorted.forEach(function (value) {
+                if (value < lower || value > upper) {
+                    outliers.x.push(label);
+                    outliers.y.push(value);
+                }
+            });
+        });
+        var data = outliers.y.length ? [box, outliers] : [box];
+        return {data: data, layout: copy(templates.box.layout)};
+    }
+
+    window.dash_clientside = Object.assign({}, window.dash_clientside, {
+        overview: {
+            filter_figures: function (crimeRange, payload, templates) {
+                var noUpdate = window.dash_clientside.no_update;
+                if (!payload || !crimeRange) {
+                    return [noUpdate, noUpdate, noUpdate];
+                }
+                var columns = decodePayload(payload);
+                var crime = columns.ViolentCrimesPerPop;
+                var range = quantize(crimeRange[0], crimeRange[1], payload.slider_step);
+
+                var rows = [];
+                for (var row = 0; row < payload.rows; row++) {
+                    if (crime[row] >= range[0] && crime[row] <= range[1]) {
+                        rows.push(row);
+                    }
+                }
+                var groups = groupRows(rows, columns.labels);
+                return [
+                    scatterFigure(payload, columns, rows, groups, templates),
+                    histogramFigure(crime, rows, templates),
+                    boxFigure(payload, crime, groups, templates)
+                ];
+            }
+        }
+    });
+})();
@@ -0,0 +1,193 @@
+"""Streaming batch exports of filtered communities and figure variants
+
+The dashboard's Flask server answers
+
+    /export/communities.csv?state=6&low=0.1&high=0.5    filtered communities, every column
+    /export/communities.parquet?...                     the same as Parquet (needs pyarrow)
+    /export/states.csv?metric=crime_rate_median         the map page's state summary, ranked
+    /export/figures?panels=boxplot&states=each          overview figures, one variant per state
+    /export/figures?page=map&metrics=crime_rate_mean    map figures per metric and color scale
+
+with the overview filters (state: a code or all; low/high: the crime-rate
+range within [0, 1], default the full range) and the map page's metric. Rows are read and
+written EXPORT_CHUNK_ROWS at a time, so exporting the whole dataset holds
+one chunk in memory, never the full response. Figure variants are rendered
+on a pool of EXPORT_WORKERS threads and streamed as JSON lines in request
+order, each as soon as it and those before it are done.
+"""
+
+import io
+import itertools
+import json
+import math
+import os
+import zlib
+from collections import deque
+
+import flask
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_CHUNK_ROWS = int(os.environ.get('CRIME_DASHBOARD_EXPORT_CHUNK_ROWS', 10000))
+EXPORT_WORKERS = int(os.environ.get('CRIME_DASHBOARD_EXPORT_WORKERS', os.cpu_count() or 2))
+
+TABLE_FORMATS = {'csv': 'text/csv', 'parquet': 'application/vnd.apache.parquet'}
+# gzip member header and trailer, as Content-Encoding: gzip expects
+GZIP_WBITS = 31
+
+
+def parse_state(value, known):
+    """State code of a state query argument, None for all; codes not in known are rejected"""
+    if value in (None, '', 'all'):
+        return None
+    try:
+        state = int(value)
+    except ValueError:
+        flask.abort(400, description=f"Invalid state: {value}")
+    if state not in known:
+        flask.abort(400, description=f"Unknown state: {value}")
+    return state
+
+
+def parse_states(value, known):
+    """State codes (None for all) of a states query argument: codes, all, or each for every state in known"""
+    if value == 'each':
+        return sorted(known)
+    return [parse_state(item, known) for item in (value or 'all').split(',')]
+
+
+def parse_choices(value, allowed):
+    """Comma-separated choices from allowed, every one of them when value is empty"""
+    if not value:
+        return list(allowed)
+    choices = value.split(',')
+    unknown = [choice for choice in choices if choice not in allowed]
+    if unknown:
+        flask.abort(400, description=f"Unknown choices {unknown}; expected some of {list(allowed)}")
+    return choices
+
+
+def parse_float(args, name, default, bounds=(-math.inf, math.inf)):
+    """Float query argument within bounds (inclusive); inf and nan are rejected too"""
+    try:
+        value = float(args.get(name, default))
+    except ValueError:
+        flask.abort(400, description=f"Invalid {name}: {args[name]}")
+    if not (math.isfinite(value) and bounds[0] <= value <= bounds[1]):
+        flask.abort(400, description=f"{name} must be a number in [{bounds[0]:g}, {bounds[1]:g}], got {value}")
+    return value
+
+
+def csv_chunks(frames):
+    """CSV text of a sequence of DataFrames, with the header once (from the first, even if empty)"""
+    header = True
+    for frame in frames:
+        if header or len(frame):
+            yield frame.to_csv(index=False, header=header).encode()
+            header = False
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file collecting what the Parquet writer produces until drained"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def parquet_chunks(frames):
+    """Parquet file of a sequence of DataFrames, one row group each, produced as it is written"""
+    sink = _ChunkSink()
+    writer = None
+    try:
+        for frame in frames:
+            if writer is None:
+                table = pa.Table.from_pandas(frame, preserve_index=False)
+                writer = pq.ParquetWriter(sink, table.schema)
+            elif not len(frame):
+                continue
+            else:
+                # Chunks infer their own types, e.g. null for a column missing in all their rows
+                table = pa.Table.from_pandas(frame, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+            yield sink.drain()
+    finally:
+        if writer is not None:
+            writer.close()
+    yield sink.drain()
+
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, GZIP_WBITS)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def ordered_map(executor, fn, argument_lists, window):
+    """fn(*arguments) of each item, run on executor and yielded in order, at most window at a time
+
+    Closing the generator early (the client went away) cancels the work not started yet.
+    """
+    arguments = iter(argument_lists)
+    pending = deque(executor.submit(fn, *args) for args in itertools.islice(arguments, window))
+    try:
+        while pending:
+            result = pending.popleft().result()
+            pending.extend(executor.submit(fn, *args) for args in itertools.islice(arguments, 1))
+            yield result
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+def json_line(fields, figures):
+    """A JSON line of fields plus a figures list, splicing in figure JSON text without re-parsing it"""
+    items = [f'{json.dumps(name)}: {json.dumps(value)}' for name, value in fields.items()]
+    items.append('"figures": [' + ', '.join(figures) + ']')
+    return ('{' + ', '.join(items) + '}\n').encode()
+
+
+def streamed_response(chunks, mimetype, filename):
+    """Flask response sending chunks as they come, gzip-compressed on the fly when the client accepts it"""
+    headers = {'Content-Disposition': f'attachment; filename="{filename}"'}
+    if mimetype != TABLE_FORMATS['parquet'] and flask.request.accept_encodings.best_match(['gzip']):
+        chunks = gzip_chunks(chunks)
+        headers['Content-Encoding'] = 'gzip'
+        headers['Vary'] = 'Accept-Encoding'
+    return flask.Response(chunks, mimetype=mimetype, headers=headers)
+
+
+def stream_table(frames, fmt, name):
+    """Response with a sequence of DataFrames as one CSV or Parquet file"""
+    if fmt not in TABLE_FORMATS:
+        flask.abort(404)
+    if fmt == 'parquet':
+        if pq is None:
+            flask.abort(501, description="Parquet exports need the pyarrow package (pip install pyarrow)")
+        chunks = parquet_chunks(frames)
+    else:
+        chunks = csv_chunks(frames)
+    return streamed_response(chunks, TABLE_FORMATS[fmt], f'{name}.{fmt}')
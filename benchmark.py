@@ -0,0 +1,324 @@
+"""Benchmarks for the load, filter, aggregate and figure-build hot paths
+
+Synthesizes communities datasets with the real 128-column schema at several
+sizes, then times each stage the dashboard goes through separately and
+records its peak traced memory:
+
+    parse_csv        load_data() straight from the CSV file
+    parse_cached     load_data() from the columnar cache
+    parse_partitioned
+                     load_data() of the same rows split into one file per state,
+                     all of them and pruned to the largest state
+    build_index      CrimeRangeIndex, OverviewFrame and CorrelationEngine construction
+    filter           index query for a selection (update_overview_plots)
+    aggregate        create_state_summary, the incremental engine, overview stats,
+                     all-attribute correlations from the engine vs a pandas rescan
+    figures          overview and map figure construction
+    serialize        figure JSON serialization (payload size is recorded too)
+    patch            dash.Patch delta to the figures one slider step away
+                     (sizes recorded raw and after gzip / brotli)
+
+Results are written as JSON so runs on different commits can be compared:
+
+    python benchmark.py --sizes 2000 100000 --output before.json
+    python benchmark.py --sizes 2000 100000 --output after.json --compare before.json
+
+Generated datasets are kept under .cache/benchmark and reused. The 10M row
+set is about 6 GB of CSV, takes a while to generate and needs well over
+10 GB of memory once loaded.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+import plotly
+from dash import Patch
+
+from correlation_engine import ATTRIBUTE_COLUMNS, CorrelationEngine
+from crime_data import COLUMN_NAMES, create_state_summary, load_data
+from figure_cache import serialize_figures
+from figure_patch import figure_patch
+from filter_index import CrimeRangeIndex
+from map_figures import build_map_figures
+from overview_figures import build_overview_figures
+from overview_stats import OverviewFrame, compute_overview_stats
+from partitioned_data import LOAD_WORKERS
+from response_compression import available_encodings, compress
+from summary_engine import StateSummaryEngine
+
+DEFAULT_SIZES = [2000, 100000, 1000000, 10000000]
+BENCHMARK_DIR = os.path.join('.cache', 'benchmark')
+CHUNK_ROWS = 250000
+
+# Approximate number of communities per state FIPS code in the UCI file,
+# used as sampling weights so state groups have realistic sizes
+STATE_WEIGHTS = {
+    1: 41, 2: 2, 4: 15, 5: 26, 6: 279, 8: 30, 9: 50, 10: 4, 11: 1, 12: 90,
+    13: 37, 16: 7, 18: 42, 19: 27, 20: 20, 21: 23, 22: 21, 23: 16, 24: 6,
+    25: 123, 27: 34, 28: 26, 29: 35, 32: 3, 33: 16, 34: 211, 35: 9, 36: 89,
+    37: 41, 38: 4, 39: 111, 40: 40, 41: 27, 42: 101, 44: 17, 45: 29, 46: 4,
+    47: 34, 48: 221, 49: 23, 50: 2, 51: 26, 53: 38, 54: 11, 55: 60, 56: 5
+}
+
+# Columns mostly missing in the real data, with their share of missing values:
+# the LEMAS police statistics and the county/community codes
+POLICE_COLUMNS = COLUMN_NAMES[COLUMN_NAMES.index('LemasSwornFT'):COLUMN_NAMES.index('PolicAveOTWorked') + 1] + [
+    'PolicCars', 'PolicOperBudg', 'LemasPctPolicOnPatr', 'LemasGangUnitDeploy', 'PolicBudgPerPop'
+]
+SPARSE_COLUMNS = dict.fromkeys(POLICE_COLUMNS, 0.84)
+SPARSE_COLUMNS.update({'county': 0.59, 'community': 0.59})
+
+# Selections timed for the overview path: (label, state, low, high); 'largest'
+# is replaced by the state with the most communities
+SELECTIONS = [
+    ('all', None, 0.0, 1.0),
+    ('largest_state', 'largest', 0.0, 1.0),
+    ('narrow_range', None, 0.2, 0.3),
+]
+
+# Slider resolution of the dashboard, the smallest change a drag makes
+SLIDER_STEP = 0.01
+
+
+def synthesize_frame(rows, seed=0, start=0):
+    """rows synthetic communities in the raw file layout (before load_data)"""
+    rng = np.random.default_rng([seed, start])
+    codes = np.array(list(STATE_WEIGHTS))
+    weights = np.array(list(STATE_WEIGHTS.values()), dtype=float)
+    states = rng.choice(codes, size=rows, p=weights / weights.sum())
+
+    # Attributes are normalized to [0, 1] with two decimals, mostly right-skewed;
+    # shape parameters per column come from a fixed generator so every chunk agrees
+    shapes = np.random.default_rng(seed).uniform(0.6, 4.0, size=(len(COLUMN_NAMES), 2))
+    data = {}
+    for i, name in enumerate(COLUMN_NAMES):
+        if name == 'state':
+            data[name] = states
+        elif name == 'communityname':
+            data[name] = pd.Series(np.arange(start, start + rows)).map('Community{}city'.format)
+        elif name == 'fold':
+            data[name] = (np.arange(start, start + rows) % 10) + 1
+        elif name in ('county', 'community'):
+            values = rng.integers(1, 800, size=rows).astype(float)
+            values[rng.random(rows) < SPARSE_COLUMNS[name]] = np.nan
+            data[name] = values
+        else:
+            a, b = shapes[i]
+            if name == 'ViolentCrimesPerPop':
+                # Crime rates differ by state so the state summary is not flat
+                a, b = 0.8, 2.5
+                values = rng.beta(a, b, size=rows) * (0.6 + 0.8 * ((states * 37) % 11) / 10)
+            else:
+                values = rng.beta(a, b, size=rows)
+            values = np.round(np.clip(values, 0, 1), 2)
+            if SPARSE_COLUMNS.get(name):
+                values[rng.random(rows) < SPARSE_COLUMNS[name]] = np.nan
+            data[name] = values
+    return pd.DataFrame(data, columns=COLUMN_NAMES)
+
+
+def synthesize_dataset(rows, seed=0, directory=BENCHMARK_DIR):
+    """Path of a synthetic communities_crime.data with rows rows, generated once"""
+    path = os.path.join(directory, f'communities-{rows}-seed{seed}.data')
+    if os.path.exists(path):
+        return path
+    os.makedirs(directory, exist_ok=True)
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'w') as f:
+        for start in range(0, rows, CHUNK_ROWS):
+            chunk = synthesize_frame(min(CHUNK_ROWS, rows - start), seed, start)
+            chunk.to_csv(f, header=False, index=False, na_rep='?', float_format='%.2f')
+    os.replace(tmp, path)
+    return path
+
+
+def partition_dataset(path):
+    """Directory of the dataset at path split into one state=<code>.data file per state, written once"""
+    directory = path[:-len('.data')] + '-partitions'
+    if os.path.isdir(directory):
+        return directory
+    tmp = f'{directory}.tmp-{os.getpid()}'
+    os.makedirs(tmp)
+    raw = pd.read_csv(path, names=COLUMN_NAMES, dtype=str, keep_default_na=False)
+    for state, rows in raw.groupby('state'):
+        rows.to_csv(os.path.join(tmp, f'state={state}.data'), header=False, index=False)
+    os.replace(tmp, directory)
+    return directory
+
+
+def measure(fn, repeat):
+    """Timings of repeat calls to fn, then one extra traced call for peak memory
+
+    Returns (result, seconds, peak_bytes).
+    """
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        seconds.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def run_size(rows, repeat=3, seed=0, directory=BENCHMARK_DIR, log=print):
+    """Benchmark every stage on a synthetic dataset of rows communities"""
+    results = []
+
+    def record(stage, fn, stage_repeat=repeat, **extra):
+        result, seconds, peak = measure(fn, stage_repeat)
+        entry = {
+            'rows': rows,
+            'stage': stage,
+            'seconds': seconds,
+            'min': min(seconds),
+            'median': statistics.median(seconds),
+            'peak_bytes': peak,
+        }
+        entry.update(extra)
+        results.append(entry)
+        log(f"{rows:>10,}  {stage:<40} {entry['median'] * 1000:10.1f} ms  {peak / 2 ** 20:9.1f} MiB")
+        return result
+
+    start = time.perf_counter()
+    path = synthesize_dataset(rows, seed, directory)
+    log(f"{rows:>10,}  dataset {path} ({os.path.getsize(path) / 2 ** 20:.0f} MiB, {time.perf_counter() - start:.1f} s)")
+
+    # Parsing is the slowest stage by far at large sizes, so it is repeated less
+    parse_repeat = 1 if rows >= 1000000 else repeat
+    df = record('parse_csv', lambda: load_data(path, use_cache=False), parse_repeat)
+    load_data(path)
+    record('parse_cached', lambda: load_data(path), parse_repeat)
+    partitions = partition_dataset(path)
+    record('parse_partitioned', lambda: load_data(partitions, use_cache=False), parse_repeat, workers=LOAD_WORKERS)
+    largest = int(df['state'].value_counts().idxmax())
+    record('parse_partitioned/one_state', lambda: load_data(partitions, use_cache=False, states=[largest]), parse_repeat)
+
+    crime_index = record('build_index/crime_range_index', lambda: CrimeRangeIndex.from_frame(df))
+    overview_frame = record('build_index/overview_frame', lambda: OverviewFrame.from_frame(df))
+
+    summary = record('aggregate/create_state_summary', lambda: create_state_summary(df))
+    record('aggregate/state_summary_engine', lambda: StateSummaryEngine.from_frame(df).summary())
+    correlations = record('build_index/correlation_engine', lambda: CorrelationEngine.from_frame(df))
+    record('aggregate/correlation/engine', lambda: correlations.correlation())
+    record('aggregate/correlation/pandas', lambda: df[ATTRIBUTE_COLUMNS].corr())
+
+    for label, state, low, high in SELECTIONS:
+        state = largest if state == 'largest' else state
+        filtered = record(
+            f'filter/{label}', lambda: overview_frame.take(crime_index.query(state, low, high)),
+            selection=label, filtered_rows=len(crime_index.query(state, low, high))
+        )
+        stats = record(f'aggregate/overview_stats/{label}', lambda: compute_overview_stats(filtered), selection=label)
+        figures = record(f'figures/overview/{label}', lambda: build_overview_figures(filtered, stats), selection=label)
+        payload = serialize_figures(figures)
+        record(f'serialize/overview/{label}', lambda: serialize_figures(figures),
+               selection=label, **payload_sizes(payload))
+
+        # The same selection one slider step narrower, as sent while dragging
+        stepped = overview_frame.take(crime_index.query(state, low, high - SLIDER_STEP))
+        next_payload = serialize_figures(build_overview_figures(stepped, compute_overview_stats(stepped)))
+        old, new = [json.loads(figure) for figure in payload], [json.loads(figure) for figure in next_payload]
+        patches = record(f'patch/overview/{label}', lambda: [figure_patch(a, b) for a, b in zip(old, new)],
+                         selection=label, full_bytes=sum(len(figure) for figure in next_payload))
+        results[-1].update(payload_sizes([
+            json.dumps(patch.to_plotly_json()) for patch in patches if isinstance(patch, Patch)
+        ]))
+
+    figures = record('figures/map', lambda: build_map_figures(summary, 'crime_rate_mean', 'Reds'))
+    payload = serialize_figures(figures)
+    record('serialize/map', lambda: serialize_figures(figures), **payload_sizes(payload))
+    return results
+
+
+def payload_sizes(payload):
+    """Bytes of serialized figures as sent, raw and with each available content encoding"""
+    body = ''.join(payload).encode()
+    sizes = {'payload_bytes': len(body)}
+    for encoding in available_encodings():
+        sizes[f'{encoding}_bytes'] = len(compress(body, encoding))
+    return sizes
+
+
+def environment():
+    """Versions and machine details stored with every run"""
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'commit': commit,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'plotly': plotly.__version__,
+    }
+
+
+def compare(baseline, current, threshold=1.1, log=print):
+    """Log median time ratios against a baseline run; returns the regressed stages"""
+    before = {(entry['rows'], entry['stage']): entry for entry in baseline['results']}
+    regressions = []
+    log(f"\nCompared with {baseline['environment'].get('commit') or 'baseline'}:")
+    for entry in current['results']:
+        old = before.get((entry['rows'], entry['stage']))
+        if old is None:
+            continue
+        ratio = entry['median'] / old['median'] if old['median'] else float('inf')
+        flag = '  REGRESSION' if ratio > threshold else ''
+        log(f"{entry['rows']:>10,}  {entry['stage']:<40} {ratio:6.2f}x{flag}")
+        if flag:
+            regressions.append((entry['rows'], entry['stage'], ratio))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='dataset sizes in rows')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs per stage')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='write results as JSON to this file (default: stdout)')
+    parser.add_argument('--compare', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=1.1, help='slowdown ratio reported as a regression')
+    args = parser.parse_args(argv)
+
+    log = lambda line: print(line, file=sys.stderr)
+    report = {'environment': environment(), 'results': []}
+    for rows in args.sizes:
+        report['results'] += run_size(rows, args.repeat, args.seed, log=log)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold, log)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,204 @@
+"""Compact in-memory storage of the communities frame
+
+Every attribute of the UCI data is normalized to [0, 1] with two decimals,
+so it fits a one-byte fixed-point code (value * 100, with 255 for missing);
+integer codes such as state or county take the smallest unsigned type that
+holds them, and the state and community names become categoricals. Columns
+that do not fit a fixed-point code exactly fall back to float32, whose
+largest error is recorded per column. Decoding a fixed-point code gives back
+exactly the float64 the CSV parser produces, so for the real data the
+compact frame is lossless.
+
+Only the working set - the columns the callbacks read - is loaded up front;
+any other column is read from the dataset cache the first time it is used.
+
+    python compact_frame.py [communities_crime.data]
+
+prints the memory used by both representations and the accuracy bound.
+"""
+
+import os
+import sys
+import threading
+
+import numpy as np
+import pandas as pd
+
+from crime_data import COLUMN_NAMES, DATA_FILE, load_data
+from overview_stats import OVERVIEW_COLUMNS
+from summary_engine import INPUT_COLUMNS
+
+COMPACT_STORAGE = os.environ.get('CRIME_DASHBOARD_COMPACT', '0') == '1'
+
+# Fixed-point scales tried in order, the first exact one wins: whole numbers
+# (codes as small as the values, e.g. county), then two-decimal values
+FIXED_POINT_SCALES = (1, 100)
+
+# Columns read by the overview callbacks and the state summary
+WORKING_SET = list(dict.fromkeys(['state', 'state_abbr', 'communityname'] + OVERVIEW_COLUMNS + INPUT_COLUMNS))
+
+
+class CompactColumn:
+    """A numeric column as fixed-point unsigned codes or, failing that, float32"""
+
+    def __init__(self, codes, dtype, scale=None, missing=None, max_error=0.0):
+        self.codes = codes
+        self.dtype = dtype
+        self.scale = scale
+        self.missing = missing
+        self.max_error = max_error
+
+    @classmethod
+    def encode(cls, values):
+        values = np.asarray(values)
+        dtype = values.dtype
+        if np.issubdtype(dtype, np.integer):
+            # Integer columns have no missing values, so need no sentinel
+            if len(values) and values.min() >= 0:
+                return cls(values.astype(np.min_scalar_type(values.max())), dtype)
+            return cls(values, dtype)
+
+        values = values.astype(np.float64)
+        present = ~np.isnan(values)
+        finite = values[present]
+        for scale in FIXED_POINT_SCALES:
+            scaled = np.round(finite * scale)
+            if len(scaled) and scaled.min() < 0:
+                continue
+            if np.array_equal(scaled / scale, finite):
+                # The largest code of the type marks a missing value
+                code_type = np.min_scalar_type(int(scaled.max()) + 1 if len(scaled) else 1)
+                missing = np.iinfo(code_type).max
+                codes = np.full(len(values), missing, dtype=code_type)
+                codes[present] = scaled
+                return cls(codes, dtype, scale, missing)
+
+        codes = values.astype(np.float32)
+        max_error = float(np.nanmax(np.abs(codes - values))) if present.any() else 0.0
+        return cls(codes, dtype, max_error=max_error)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes
+
+    def decode(self):
+        if self.missing is None:
+            # Integer or float32 codes
+            return self.codes.astype(self.dtype)
+        values = self.codes / self.scale
+        values[self.codes == self.missing] = np.nan
+        return values
+
+
+class CompactFrame:
+    """Read-only frame of compact columns, decoded to pandas on access
+
+    Indexing with a column name returns a Series and with a list of names a
+    DataFrame, as with pandas, which is all the index, overview and summary
+    builders need. loader(name) provides columns outside the working set.
+    """
+
+    def __init__(self, columns, length, loader=None, available=None):
+        self._columns = columns
+        self._length = length
+        self._loader = loader
+        self._lock = threading.Lock()
+        self.columns = list(available or columns)
+
+    @classmethod
+    def from_frame(cls, df, loader=None, available=None):
+        return cls({name: _encode(df[name]) for name in df.columns}, len(df), loader, available)
+
+    def __len__(self):
+        return self._length
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return pd.Series(_decode(self._column(key)), name=key)
+        return pd.DataFrame({name: _decode(self._column(name)) for name in key})
+
+    def row_slice(self, start, stop, columns):
+        """DataFrame of rows [start, stop) of columns, decoding only those rows"""
+        return pd.DataFrame({name: _decode(_slice(self._column(name), start, stop)) for name in columns})
+
+    def _column(self, name):
+        column = self._columns.get(name)
+        if column is None:
+            if self._loader is None or name not in self.columns:
+                raise KeyError(name)
+            with self._lock:
+                column = self._columns.get(name)
+                if column is None:
+                    column = self._columns[name] = _encode(self._loader(name))
+        return column
+
+    @property
+    def loaded_columns(self):
+        return list(self._columns)
+
+    def memory_usage(self):
+        """Bytes held per loaded column"""
+        return {name: _nbytes(column) for name, column in self._columns.items()}
+
+    def accuracy(self):
+        """Largest absolute decoding error per loaded numeric column"""
+        return {
+            name: column.max_error
+            for name, column in self._columns.items() if isinstance(column, CompactColumn)
+        }
+
+
+def _encode(series):
+    if pd.api.types.is_numeric_dtype(series):
+        return CompactColumn.encode(series.to_numpy())
+    return pd.Categorical(series)
+
+
+def _decode(column):
+    return column.decode() if isinstance(column, CompactColumn) else column
+
+
+def _slice(column, start, stop):
+    if isinstance(column, CompactColumn):
+        return CompactColumn(column.codes[start:stop], column.dtype, column.scale, column.missing, column.max_error)
+    return column[start:stop]
+
+
+def _nbytes(column):
+    if isinstance(column, CompactColumn):
+        return column.nbytes
+    return column.codes.nbytes + int(column.categories.memory_usage(deep=True))
+
+
+def load_compact_data(path=DATA_FILE, columns=WORKING_SET, states=None):
+    """load_data() as a CompactFrame holding columns, with the rest loaded lazily"""
+    df = load_data(path, columns=columns, states=states)
+    available = list(df.columns) + [name for name in COLUMN_NAMES if name not in df.columns]
+    return CompactFrame.from_frame(
+        df.reset_index(drop=True),
+        loader=lambda name: load_data(path, columns=[name], states=states)[name].reset_index(drop=True),
+        available=available
+    )
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else DATA_FILE
+    full = load_data(path)
+    compact = load_compact_data(path)
+    full_bytes = int(full.memory_usage(deep=True).sum())
+    compact_bytes = sum(compact.memory_usage().values())
+    print(f"Full frame:    {full_bytes / 2 ** 20:9.1f} MiB ({len(full.columns)} columns)")
+    print(f"Compact frame: {compact_bytes / 2 ** 20:9.1f} MiB ({len(compact.loaded_columns)} columns loaded)")
+    print(f"Reduction:     {full_bytes / compact_bytes:9.1f}x")
+
+    # Accuracy over every column, loading the lazy ones too
+    for name in compact.columns:
+        compact[name]
+    errors = compact.accuracy()
+    print(f"Largest decoding error: {max(errors.values()):.3g}")
+    for name, error in sorted(errors.items(), key=lambda item: -item[1]):
+        if error:
+            print(f"  {name}: {error:.3g}")
@@ -0,0 +1,138 @@
+"""Per-state sufficient statistics for correlations over every numeric attribute
+
+For each state the engine keeps, over all ATTRIBUTE_COLUMNS, the pairwise
+observation counts and the sums, sums of squares and cross products over
+the rows where both attributes are present. The correlation matrix of any
+union of states is then a sum of small matrices rather than a scan of the
+rows, and matches pandas' pairwise-complete DataFrame.corr(): the LEMAS
+police columns, missing for most communities, are correlated over the
+rows that have them. min_periods hides pairs with too few observations.
+
+Values are shifted by the column means of the first load before
+accumulating, which leaves correlations unchanged but keeps the sums well
+conditioned.
+"""
+
+import numpy as np
+import pandas as pd
+
+from compact_frame import CompactFrame
+from crime_data import COLUMN_NAMES
+
+# Identifiers and codes rather than attributes
+ID_COLUMNS = ['state', 'county', 'community', 'communityname', 'fold']
+ATTRIBUTE_COLUMNS = [name for name in COLUMN_NAMES if name not in ID_COLUMNS]
+
+# Rows folded in per matrix product, bounding the temporary arrays
+CHUNK_ROWS = 100000
+
+
+class PairwiseMoments:
+    """Counts and sums over the pairwise-complete rows of every column pair
+
+    With M the presence mask and X the values (0 where missing):
+      n[i, j]   = rows where both i and j are present   (M'M)
+      sx[i, j]  = sum of x_i over those rows            (X'M)
+      sxx[i, j] = sum of x_i ** 2 over those rows       ((X*X)'M)
+      sxy[i, j] = sum of x_i * x_j over those rows      (X'X)
+    """
+
+    def __init__(self, k):
+        self.n = np.zeros((k, k))
+        self.sx = np.zeros((k, k))
+        self.sxx = np.zeros((k, k))
+        self.sxy = np.zeros((k, k))
+
+    def update(self, values, sign=1):
+        present = ~np.isnan(values)
+        mask = present.astype(float)
+        x = np.where(present, values, 0.0)
+        self.n += sign * (mask.T @ mask)
+        self.sx += sign * (x.T @ mask)
+        self.sxx += sign * ((x * x).T @ mask)
+        self.sxy += sign * (x.T @ x)
+
+    def merge(self, other):
+        for name in ('n', 'sx', 'sxx', 'sxy'):
+            getattr(self, name).__iadd__(getattr(other, name))
+
+    def select(self, positions):
+        """Moments restricted to the columns at positions"""
+        selected = PairwiseMoments(0)
+        grid = np.ix_(positions, positions)
+        for name in ('n', 'sx', 'sxx', 'sxy'):
+            setattr(selected, name, getattr(self, name)[grid])
+        return selected
+
+    def correlation(self, min_periods=1):
+        """Pearson correlations, NaN for pairs with fewer than min_periods rows or no variance"""
+        n, sx = self.n, self.sx
+        with np.errstate(divide='ignore', invalid='ignore'):
+            covariance = n * self.sxy - sx * sx.T
+            variance = n * self.sxx - sx * sx
+            corr = covariance / np.sqrt(variance * variance.T)
+        corr = np.clip(corr, -1.0, 1.0)
+        corr[(n < max(min_periods, 2)) | ~np.isfinite(corr)] = np.nan
+        return corr
+
+
+class CorrelationEngine:
+    """PairwiseMoments per state, absorbing inserted and deleted rows in O(delta)"""
+
+    def __init__(self, columns=ATTRIBUTE_COLUMNS, shift=None):
+        self.columns = list(columns)
+        self.position = {name: i for i, name in enumerate(self.columns)}
+        self.shift = np.zeros(len(self.columns)) if shift is None else np.asarray(shift, dtype=float)
+        self.states = {}
+
+    @classmethod
+    def from_frame(cls, df, columns=ATTRIBUTE_COLUMNS, chunk_rows=CHUNK_ROWS):
+        """Engine over a DataFrame or CompactFrame, read chunk_rows rows at a time"""
+        engine = None
+        for start in range(0, len(df), chunk_rows):
+            if isinstance(df, CompactFrame):
+                rows = df.row_slice(start, start + chunk_rows, ['state'] + columns)
+            else:
+                rows = df.iloc[start:start + chunk_rows]
+            if engine is None:
+                # Shift by the first chunk's means, which every later row shares
+                engine = cls(columns, np.nan_to_num(np.nanmean(rows[columns].to_numpy(dtype=float), axis=0)))
+            engine.insert(rows)
+        return engine if engine is not None else cls(columns)
+
+    def insert(self, rows):
+        self._apply(rows, 1)
+
+    def delete(self, rows):
+        self._apply(rows, -1)
+
+    def _apply(self, rows, sign):
+        for state, group in rows.groupby('state', sort=False):
+            moments = self.states.get(state)
+            if moments is None:
+                if sign < 0:
+                    raise KeyError(f"Cannot delete rows for unknown state {state}")
+                moments = self.states[state] = PairwiseMoments(len(self.columns))
+            moments.update(group[self.columns].to_numpy(dtype=float) - self.shift, sign)
+
+    def moments(self, states=None, columns=None):
+        """Summed moments of states (None for all), optionally for some columns only"""
+        total = PairwiseMoments(len(self.columns))
+        for state, moments in self.states.items():
+            if states is None or state in states:
+                total.merge(moments)
+        if columns is not None:
+            total = total.select([self.position[name] for name in columns])
+        return total
+
+    def correlation(self, states=None, columns=None, min_periods=1):
+        """Correlation matrix of columns (default all) over states, as DataFrame.corr() returns it"""
+        columns = self.columns if columns is None else list(columns)
+        corr = self.moments(states, columns).correlation(min_periods)
+        return pd.DataFrame(corr, index=columns, columns=columns)
+
+    def pair_counts(self, states=None, columns=None):
+        """Rows where both attributes of each pair are present"""
+        columns = self.columns if columns is None else list(columns)
+        counts = self.moments(states, columns).n.astype(np.int64)
+        return pd.DataFrame(counts, index=columns, columns=columns)
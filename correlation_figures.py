@@ -0,0 +1,54 @@
+"""Figure builders for the correlation explorer page"""
+
+import plotly.graph_objects as go
+
+# Cell labels are drawn only while they stay legible
+MAX_LABELED_COLUMNS = 15
+
+
+def build_explorer_figures(corr, counts, columns, target):
+    """Heatmap of columns and every attribute's correlation with target, from the full corr / counts frames"""
+    return (
+        build_explorer_heatmap(corr.loc[columns, columns], counts.loc[columns, columns]),
+        build_target_bar(corr, counts, target)
+    )
+
+
+def build_explorer_heatmap(corr, counts):
+    columns = list(corr.columns)
+    heatmap_fig = go.Figure(go.Heatmap(
+        z=corr.to_numpy().round(3),
+        x=columns,
+        y=columns,
+        customdata=counts.to_numpy(),
+        zmin=-1,
+        zmax=1,
+        colorscale='RdBu_r',
+        texttemplate='%{z:.2f}' if len(columns) <= MAX_LABELED_COLUMNS else None,
+        hovertemplate='x: %{x}<br>y: %{y}<br>r: %{z}<br>pairs: %{customdata}<extra></extra>'
+    ))
+    heatmap_fig.update_layout(
+        title='Correlation Matrix (pairwise complete observations)',
+        yaxis={'autorange': 'reversed'},
+        height=max(500, 18 * len(columns))
+    )
+    return heatmap_fig
+
+
+def build_target_bar(corr, counts, target):
+    """Attributes ranked by their correlation with target; pairs below min_periods are left out"""
+    values = corr[target].drop(target).dropna().sort_values()
+    bar_fig = go.Figure(go.Bar(
+        x=values.index,
+        y=values.to_numpy(),
+        customdata=counts.loc[values.index, target].to_numpy(),
+        marker={'color': values.to_numpy(), 'colorscale': 'RdBu_r', 'cmin': -1, 'cmax': 1},
+        hovertemplate='%{x}<br>r: %{y:.3f}<br>pairs: %{customdata}<extra></extra>'
+    ))
+    bar_fig.update_layout(
+        title=f'Correlation of Every Attribute with {target}',
+        xaxis={'tickangle': -60, 'tickfont': {'size': 9}},
+        yaxis={'title': 'r', 'range': [-1, 1]},
+        height=500
+    )
+    return bar_fig
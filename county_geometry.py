@@ -0,0 +1,261 @@
+"""County boundaries for the drill-down map, simplified per zoom level
+
+The boundaries are read from COUNTY_GEOJSON, a FeatureCollection of county
+polygons whose feature ids are 5-digit FIPS codes (state code followed by
+county code), such as the geojson-counties-fips.json file of the plotly
+datasets repository. It is not part of this repository; without it the
+county map shows a notice instead.
+
+Raw boundaries are several megabytes, far more detail than a map of the
+whole country can show, so they are simplified at the tolerances in
+GEOMETRY_LEVELS and each view uses the coarsest level that is still finer
+than a pixel. Simplification preserves topology: rings are cut into arcs
+at the points where counties meet, each shared border is simplified once
+(Douglas-Peucker) and used by both neighbours, so no gaps or overlaps open
+up between counties. Every arc keeps at least one interior point and rings
+smaller than a few tolerances keep all of theirs, so no county vanishes.
+Each level is computed once and cached as GeoJSON under GEOMETRY_DIR, keyed
+by the digest of the source file;
+
+    python county_geometry.py
+
+computes every level ahead of deployment.
+"""
+
+import json
+import math
+import os
+import sys
+import threading
+
+import numpy as np
+
+from data_cache import CACHE_DIR, file_digest
+
+COUNTY_GEOJSON = os.environ.get('CRIME_DASHBOARD_COUNTY_GEOJSON', os.path.join('geo', 'us_counties.json'))
+GEOMETRY_DIR = os.path.join(CACHE_DIR, 'geometry')
+
+# Simplification tolerance per level, in degrees (about 2 km, 400 m and 80 m)
+GEOMETRY_LEVELS = {'country': 0.02, 'state': 0.004, 'detail': 0.0008}
+
+# Longitudes the USA-scope map spans at zoom 1, and the map's width in pixels
+US_EXTENT = 60.0
+MAP_PIXELS = 1000
+
+# Rings smaller than this many tolerances are kept at full resolution
+MIN_RING_TOLERANCES = 4
+
+# Shared vertices are matched after rounding to this many decimals
+PRECISION = 6
+
+_lock = threading.Lock()
+_levels = {}
+_topology = {}
+
+
+def geometry_available(path=COUNTY_GEOJSON):
+    return os.path.exists(path)
+
+
+def level_for_extent(extent):
+    """Coarsest level whose tolerance stays below a pixel when extent degrees fill the map"""
+    pixel = extent / MAP_PIXELS
+    for level, tolerance in GEOMETRY_LEVELS.items():
+        if tolerance <= pixel:
+            return level
+    return level
+
+
+def county_features(level, fips, path=COUNTY_GEOJSON):
+    """FeatureCollection of the counties with the given FIPS codes, simplified to level
+
+    Counties without data are left out, which keeps the figure small.
+    """
+    fips = set(fips)
+    features = [feature for feature in simplified_counties(level, path)['features'] if feature['id'] in fips]
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def features_extent(collection):
+    """Largest side, in degrees, of the bounding box of a FeatureCollection"""
+    points = np.concatenate([
+        np.asarray(ring) for feature in collection['features']
+        for polygon in _polygons(feature['geometry']) for ring in polygon
+    ]) if collection['features'] else np.zeros((1, 2))
+    return float((points.max(axis=0) - points.min(axis=0)).max())
+
+
+def simplified_counties(level, path=COUNTY_GEOJSON, directory=GEOMETRY_DIR):
+    """The county FeatureCollection simplified to level, from memory, the disk cache or computed"""
+    tolerance = GEOMETRY_LEVELS[level]
+    with _lock:
+        if level in _levels:
+            return _levels[level]
+        cached = os.path.join(directory, f'counties-{file_digest(path)[:16]}-{tolerance:g}.json')
+        try:
+            with open(cached) as f:
+                collection = json.load(f)
+        except (FileNotFoundError, ValueError):
+            if path not in _topology:
+                with open(path) as f:
+                    _topology[path] = Topology(json.load(f)['features'])
+            collection = _topology[path].simplify(tolerance)
+            os.makedirs(directory, exist_ok=True)
+            tmp = f'{cached}.tmp-{os.getpid()}'
+            with open(tmp, 'w') as f:
+                json.dump(collection, f, separators=(',', ':'))
+            os.replace(tmp, cached)
+        _levels[level] = collection
+        return collection
+
+
+def _polygons(geometry):
+    if geometry['type'] == 'Polygon':
+        return [geometry['coordinates']]
+    if geometry['type'] == 'MultiPolygon':
+        return geometry['coordinates']
+    return []
+
+
+class Topology:
+    """Polygon rings of county features as sequences of shared arcs"""
+
+    def __init__(self, features, precision=PRECISION):
+        self.features = features
+        self.arcs = []
+        self._arc_index = {}
+        # Per feature, per polygon, per ring: [(arc, reversed), ...]
+        self.rings = []
+
+        rings = [
+            [[self._open_ring(ring, precision) for ring in polygon] for polygon in _polygons(feature['geometry'])]
+            for feature in features
+        ]
+        junctions = self._junctions(ring for polygons in rings for polygon in polygons for ring in polygon)
+        for polygons in rings:
+            self.rings.append([[self._cut(ring, junctions) for ring in polygon] for polygon in polygons])
+
+    @staticmethod
+    def _open_ring(ring, precision):
+        points = [(round(x, precision), round(y, precision)) for x, y, *_ in ring]
+        # Drop the closing point and repeated vertices
+        points = [point for i, point in enumerate(points) if point != points[i - 1]] if len(points) > 1 else points
+        return points
+
+    @staticmethod
+    def _junctions(rings):
+        """Points with more than two distinct neighbours, where borders between different counties meet"""
+        neighbours = {}
+        for ring in rings:
+            n = len(ring)
+            for i, point in enumerate(ring):
+                neighbours.setdefault(point, set()).update((ring[i - 1], ring[(i + 1) % n]))
+        return {point for point, adjacent in neighbours.items() if len(adjacent) > 2}
+
+    def _cut(self, ring, junctions):
+        cuts = [i for i, point in enumerate(ring) if point in junctions]
+        if not cuts:
+            # A ring meeting no other: rotate to a canonical start so an enclave
+            # and the hole around it still share the arc
+            start = ring.index(min(ring))
+            ring = ring[start:] + ring[:start]
+            return [self._arc(ring + [ring[0]])]
+        ring = ring[cuts[0]:] + ring[:cuts[0]]
+        cuts = [i - cuts[0] for i in cuts] + [len(ring)]
+        ring = ring + [ring[0]]
+        return [self._arc(ring[start:end + 1]) for start, end in zip(cuts, cuts[1:])]
+
+    def _arc(self, points):
+        key = tuple(points)
+        if key in self._arc_index:
+            return self._arc_index[key], False
+        reverse = key[::-1]
+        if reverse in self._arc_index:
+            return self._arc_index[reverse], True
+        self._arc_index[key] = len(self.arcs)
+        self.arcs.append(np.array(points))
+        return len(self.arcs) - 1, False
+
+    def simplify(self, tolerance):
+        """FeatureCollection with every shared arc simplified once to tolerance"""
+        keep_full = set()
+        for polygons in self.rings:
+            for polygon in polygons:
+                for ring in polygon:
+                    points = np.concatenate([self.arcs[arc] for arc, _ in ring])
+                    if (points.max(axis=0) - points.min(axis=0)).max() < MIN_RING_TOLERANCES * tolerance:
+                        keep_full.update(arc for arc, _ in ring)
+
+        decimals = max(0, math.ceil(-math.log10(tolerance)) + 1)
+        arcs = [
+            (arc if i in keep_full else arc[douglas_peucker(arc, tolerance)]).round(decimals).tolist()
+            for i, arc in enumerate(self.arcs)
+        ]
+
+        features = []
+        for feature, polygons in zip(self.features, self.rings):
+            coordinates = [[self._ring(ring, arcs) for ring in polygon] for polygon in polygons]
+            properties = {'name': (feature.get('properties') or {}).get('NAME')}
+            features.append({
+                'type': 'Feature',
+                'id': str(feature['id']),
+                'properties': properties,
+                'geometry': {'type': 'MultiPolygon', 'coordinates': coordinates}
+            })
+        return {'type': 'FeatureCollection', 'features': features}
+
+    @staticmethod
+    def _ring(ring, arcs):
+        points = []
+        for arc, reverse in ring:
+            part = arcs[arc][::-1] if reverse else arcs[arc]
+            # Consecutive arcs share their junction point
+            points += part if not points else part[1:]
+        return points
+
+
+def douglas_peucker(points, tolerance):
+    """Indices of the points of a polyline kept at tolerance, always with its ends and one interior point
+
+    A closed polyline (first point equal to the last) is measured from its
+    first point, so it keeps at least three distinct points.
+    """
+    n = len(points)
+    if n <= 3:
+        return np.arange(n)
+    keep = np.zeros(n, dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, n - 1, True)]
+    while stack:
+        first, last, forced = stack.pop()
+        if last - first < 2:
+            continue
+        distances = _distances(points[first + 1:last], points[first], points[last])
+        i = int(np.argmax(distances))
+        if forced or distances[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            # The halves of a closed ring must also stay open polygons
+            closed = forced and np.array_equal(points[first], points[last])
+            stack += [(first, split, closed), (split, last, closed)]
+    return np.flatnonzero(keep)
+
+
+def _distances(points, start, end):
+    """Distances of points from the segment start-end (from start when they coincide)"""
+    segment = end - start
+    length = float(segment @ segment)
+    if length == 0:
+        return np.hypot(*(points - start).T)
+    t = np.clip((points - start) @ segment / length, 0, 1)
+    return np.hypot(*(points - start - t[:, None] * segment).T)
+
+
+if __name__ == '__main__':
+    path = sys.argv[1] if len(sys.argv) > 1 else COUNTY_GEOJSON
+    if not geometry_available(path):
+        sys.exit(f"No county boundaries at {path}; set CRIME_DASHBOARD_COUNTY_GEOJSON")
+    raw = os.path.getsize(path)
+    for level, tolerance in GEOMETRY_LEVELS.items():
+        size = len(json.dumps(simplified_counties(level, path), separators=(',', ':')))
+        print(f"{level:<8} tolerance {tolerance:g} deg: {size / 2 ** 20:6.1f} MiB ({raw / size:.0f}x smaller)")
@@ -1,105 +1,100 @@
+# First, so the startup clock includes the imports below
+from startup_timing import STARTUP, install_startup_report
+
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import pandas as pd
 import numpy as np
-import plotly.express as px
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
 import dash
-from dash import dcc, html, Input, Output, callback
+from dash import dcc, html, Input, Output, State, ClientsideFunction, Patch, callback, clientside_callback
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
+import flask
 
-# State FIPS code mapping (partial - for the states that have data)
-STATE_FIPS_MAPPING = {
-    1: 'AL', 2: 'AK', 4: 'AZ', 5: 'AR', 6: 'CA', 8: 'CO', 9: 'CT', 10: 'DE', 
-    11: 'DC', 12: 'FL', 13: 'GA', 15: 'HI', 16: 'ID', 17: 'IL', 18: 'IN', 
-    19: 'IA', 20: 'KS', 21: 'KY', 22: 'LA', 23: 'ME', 24: 'MD', 25: 'MA', 
-    26: 'MI', 27: 'MN', 28: 'MS', 29: 'MO', 30: 'MT', 31: 'NE', 32: 'NV', 
-    33: 'NH', 34: 'NJ', 35: 'NM', 36: 'NY', 37: 'NC', 38: 'ND', 39: 'OH', 
-    40: 'OK', 41: 'OR', 42: 'PA', 44: 'RI', 45: 'SC', 46: 'SD', 47: 'TN', 
-    48: 'TX', 49: 'UT', 50: 'VT', 51: 'VA', 53: 'WA', 54: 'WV', 55: 'WI', 56: 'WY'
-}
+from batch_export import (EXPORT_CHUNK_ROWS, EXPORT_WORKERS, json_line, ordered_map, parse_choices, parse_float,
+                          parse_state, parse_states, stream_table, streamed_response)
+from correlation_engine import ATTRIBUTE_COLUMNS
+from county_geometry import COUNTY_GEOJSON, US_EXTENT, county_features, features_extent, geometry_available, level_for_extent
+from correlation_figures import build_explorer_figures
+from data_source import open_data_source
+from figure_cache import FigureCache, quantize_range, serialize_figures
+from figure_patch import PATCH_RESPONSES, figure_patch
+from figure_snapshots import SNAPSHOTS, load_snapshots, save_snapshots, snapshot_fingerprint
+from instrumentation import REGISTRY, install_metrics, instrument, observe_rows, stage
+from job_queue import ExecutorCallbackManager, make_compute_executor, submit_compute
+from map_figures import build_county_figure, build_map_figures, build_notice_figure
+from overview_clientside import CLIENTSIDE_FILTERING, build_overview_payload, figure_templates
+from overview_figures import LARGE_DATA_THRESHOLD, build_heatmap_figure, build_overview_figures, build_overview_json, build_scatter_figure, parse_viewport
+from overview_stats import CORR_COLUMNS, compute_overview_stats, correlation_matrix
+from response_compression import COMPRESSION, install_compression
+from stream_ingest import REFRESH_INTERVAL_MS, STREAM_URL, StreamIngester
 
-def load_data():
-    """Load and preprocess the UCI Communities and Crime dataset"""
-    
-    # Column names based on the .names file
-    column_names = [
-        'state', 'county', 'community', 'communityname', 'fold', 
-        'population', 'householdsize', 'racepctblack', 'racePctWhite', 'racePctAsian',
-        'racePctHisp', 'agePct12t21', 'agePct12t29', 'agePct16t24', 'agePct65up',
-        'numbUrban', 'pctUrban', 'medIncome', 'pctWWage', 'pctWFarmSelf',
-        'pctWInvInc', 'pctWSocSec', 'pctWPubAsst', 'pctWRetire', 'medFamInc',
-        'perCapInc', 'whitePerCap', 'blackPerCap', 'indianPerCap', 'AsianPerCap',
-        'OtherPerCap', 'HispPerCap', 'NumUnderPov', 'PctPopUnderPov', 'PctLess9thGrade',
-        'PctNotHSGrad', 'PctBSorMore', 'PctUnemployed', 'PctEmploy', 'PctEmplManu',
-        'PctEmplProfServ', 'PctOccupManu', 'PctOccupMgmtProf', 'MalePctDivorce', 'MalePctNevMarr',
-        'FemalePctDiv', 'TotalPctDiv', 'PersPerFam', 'PctFam2Par', 'PctKids2Par',
-        'PctYoungKids2Par', 'PctTeen2Par', 'PctWorkMomYoungKids', 'PctWorkMom', 'NumIlleg',
-        'PctIlleg', 'NumImmig', 'PctImmigRecent', 'PctImmigRec5', 'PctImmigRec8',
-        'PctImmigRec10', 'PctRecentImmig', 'PctRecImmig5', 'PctRecImmig8', 'PctRecImmig10',
-        'PctSpeakEnglOnly', 'PctNotSpeakEnglWell', 'PctLargHouseFam', 'PctLargHouseOccup', 'PersPerOccupHous',
-        'PersPerOwnOccHous', 'PersPerRentOccHous', 'PctPersOwnOccup', 'PctPersDenseHous', 'PctHousLess3BR',
-        'MedNumBR', 'HousVacant', 'PctHousOccup', 'PctHousOwnOcc', 'PctVacantBoarded',
-        'PctVacMore6Mos', 'MedYrHousBuilt', 'PctHousNoPhone', 'PctWOFullPlumb', 'OwnOccLowQuart',
-        'OwnOccMedVal', 'OwnOccHiQuart', 'RentLowQ', 'RentMedian', 'RentHighQ',
-        'MedRent', 'MedRentPctHousInc', 'MedOwnCostPctInc', 'MedOwnCostPctIncNoMtg', 'NumInShelters',
-        'NumStreet', 'PctForeignBorn', 'PctBornSameState', 'PctSameHouse85', 'PctSameCity85',
-        'PctSameState85', 'LemasSwornFT', 'LemasSwFTPerPop', 'LemasSwFTFieldOps', 'LemasSwFTFieldPerPop',
-        'LemasTotalReq', 'LemasTotReqPerPop', 'PolicReqPerOffic', 'PolicPerPop', 'RacialMatchCommPol',
-        'PctPolicWhite', 'PctPolicBlack', 'PctPolicHisp', 'PctPolicAsian', 'PctPolicMinor',
-        'OfficAssgnDrugUnits', 'NumKindsDrugsSeiz', 'PolicAveOTWorked', 'LandArea', 'PopDens',
-        'PctUsePubTrans', 'PolicCars', 'PolicOperBudg', 'LemasPctPolicOnPatr', 'LemasGangUnitDeploy',
-        'LemasPctOfficDrugUn', 'PolicBudgPerPop', 'ViolentCrimesPerPop'
-    ]
-    
-    # Load the data
-    df = pd.read_csv('communities_crime.data', names=column_names, na_values='?')
-    
-    # Clean community names
-    df['communityname'] = df['communityname'].fillna('Unknown')
-    
-    # Map state codes to abbreviations
-    df['state_abbr'] = df['state'].map(STATE_FIPS_MAPPING)
-    
-    # Filter out rows with missing crime data (target variable)
-    df = df.dropna(subset=['ViolentCrimesPerPop'])
-    
-    return df
-
-def create_state_summary(df):
-    """Create state-level aggregated data"""
-    state_summary = df.groupby(['state', 'state_abbr']).agg({
-        'ViolentCrimesPerPop': ['mean', 'median', 'std', 'count'],
-        'population': 'sum',
-        'medIncome': 'mean',
-        'PctPopUnderPov': 'mean',
-        'pctUrban': 'mean'
-    }).round(4)
-    
-    # Flatten column names
-    state_summary.columns = [
-        'crime_rate_mean', 'crime_rate_median', 'crime_rate_std', 'num_communities',
-        'total_population', 'avg_income', 'avg_poverty_rate', 'avg_urban_pct'
-    ]
-    
-    state_summary = state_summary.reset_index()
-    return state_summary
+STARTUP.mark('import')
 
-# Load data
-df = load_data()
-state_summary = create_state_summary(df)
+# Crime rates are normalized to [0, 1] with two-decimal precision
+SLIDER_STEP = 0.01
+
+MAP_METRIC_OPTIONS = [
+    {'label': 'Average Crime Rate', 'value': 'crime_rate_mean'},
+    {'label': 'Median Crime Rate', 'value': 'crime_rate_median'},
+    {'label': 'Number of Communities', 'value': 'num_communities'}
+]
+
+COLOR_SCALE_OPTIONS = [
+    {'label': 'Reds', 'value': 'Reds'},
+    {'label': 'Blues', 'value': 'Blues'},
+    {'label': 'Viridis', 'value': 'Viridis'},
+    {'label': 'Plasma', 'value': 'Plasma'}
+]
+
+# Attribute the explorer ranks every other attribute against
+EXPLORER_TARGET = 'ViolentCrimesPerPop'
+
+OVERVIEW_CACHE_SIZE = int(os.environ.get('CRIME_DASHBOARD_FIGURE_CACHE_SIZE', 256))
+# County maps carry their boundaries, so fewer of them are kept
+COUNTY_CACHE_SIZE = int(os.environ.get('CRIME_DASHBOARD_COUNTY_CACHE_SIZE', 32))
+
+# Load data: the CSV file in memory by default, or a database given by URL
+data_source = open_data_source(os.environ.get('CRIME_DASHBOARD_DATABASE_URL'))
+state_summary = data_source.state_summary()
+# Plain floats: numpy scalars as slider mark keys are not JSON serializable
+crime_min, crime_max = (float(bound) for bound in data_source.crime_bounds())
+# Bumped whenever the data changes under the running app (new rows, new shared generation)
+dataset_version = 0
+STARTUP.mark('data')
+
+# Figure caches: overview keyed by (state, quantized range); the map has only
+# metric x color scale combinations, all of which are precomputed below
+overview_figure_cache = FigureCache(maxsize=OVERVIEW_CACHE_SIZE)
+map_figure_cache = FigureCache(maxsize=None)
+# County drill-down keyed by (state, geometry level, metric, color scale)
+county_figure_cache = FigureCache(maxsize=COUNTY_CACHE_SIZE)
+
+# Optional background execution of the heavy overview callback on a local job
+# queue, with figure construction on a thread or process pool (off by default)
+compute_executor = make_compute_executor()
+job_manager = ExecutorCallbackManager() if compute_executor is not None else None
 
 # Initialize Dash app
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
+server = app.server  # WSGI entry point, e.g. gunicorn crime_dashboard_with_map:server
 
 # Define the layout with multiple pages
 app.layout = dbc.Container([
     dcc.Location(id='url', refresh=False),
     
+    # Figures redraw when the dataset version changes; polled only while streaming
+    dcc.Store(id='dataset-version', data=dataset_version),
+    dcc.Interval(id='dataset-refresh', interval=REFRESH_INTERVAL_MS, disabled=not STREAM_URL),
+    
     # Navigation bar
     dbc.NavbarSimple(
         children=[
             dbc.NavItem(dbc.NavLink("Overview", href="/", id="overview-link")),
             dbc.NavItem(dbc.NavLink("US Map", href="/map", id="map-link")),
+            dbc.NavItem(dbc.NavLink("Correlations", href="/correlations", id="correlations-link")),
         ],
         brand="US Crime Rate Dashboard",
         brand_href="/",
@@ -112,258 +107,767 @@ app.layout = dbc.Container([
     html.Div(id='page-content')
 ])
 
-# Overview page layout
-overview_layout = [
-    dbc.Row([
-        dbc.Col([
-            html.H2("Crime Rate Analysis Overview", className="text-center mb-4"),
-            html.P("Exploring crime rates across US communities using UCI dataset",
-                   className="text-center text-muted mb-4")
-        ])
-    ]),
-    
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Filters", className="card-title"),
-                    html.Label("State:"),
-                    dcc.Dropdown(
-                        id='state-dropdown',
-                        options=[{'label': 'All States', 'value': 'all'}] + 
-                               [{'label': f"{row.state_abbr} (State {row.state})", 'value': row.state} 
-                                for _, row in state_summary.iterrows() if pd.notna(row.state_abbr)],
-                        value='all',
-                        className="mb-3"
-                    ),
-                    html.Label("Crime Rate Range:"),
-                    dcc.RangeSlider(
-                        id='crime-range-slider',
-                        min=df['ViolentCrimesPerPop'].min(),
-                        max=df['ViolentCrimesPerPop'].max(),
-                        value=[df['ViolentCrimesPerPop'].min(), df['ViolentCrimesPerPop'].max()],
-                        marks={
-                            df['ViolentCrimesPerPop'].min(): f"{df['ViolentCrimesPerPop'].min():.2f}",
-                            df['ViolentCrimesPerPop'].max(): f"{df['ViolentCrimesPerPop'].max():.2f}"
-                        },
-                        tooltip={"placement": "bottom", "always_visible": True}
-                    )
-                ])
+def state_options():
+    """Dropdown options of the states in the state summary"""
+    states = state_summary.dropna(subset=['state_abbr'])
+    return [
+        {'label': f"{abbr} (State {state})", 'value': state}
+        for state, abbr in zip(states['state'].tolist(), states['state_abbr'])
+    ]
+
+# Page layouts are built the first time display_page routes to them (see page_layout)
+def build_overview_layout():
+    layout = [
+        dbc.Row([
+            dbc.Col([
+                html.H2("Crime Rate Analysis Overview", className="text-center mb-4"),
+                html.P("Exploring crime rates across US communities using UCI dataset",
+                       className="text-center text-muted mb-4")
             ])
-        ], width=3),
+        ]),
         
-        dbc.Col([
-            dcc.Graph(id='crime-scatter-plot')
-        ], width=9)
-    ], className="mb-4"),
-    
-    dbc.Row([
-        dbc.Col([
-            dcc.Graph(id='crime-histogram')
-        ], width=6),
-        dbc.Col([
-            dcc.Graph(id='state-boxplot')
-        ], width=6)
-    ], className="mb-4"),
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Filters", className="card-title"),
+                        html.Label("State:"),
+                        dcc.Dropdown(
+                            id='state-dropdown',
+                            options=[{'label': 'All States', 'value': 'all'}] + state_options(),
+                            value='all',
+                            className="mb-3"
+                        ),
+                        html.Label("Crime Rate Range:"),
+                        dcc.RangeSlider(
+                            id='crime-range-slider',
+                            min=crime_min,
+                            max=crime_max,
+                            step=SLIDER_STEP,
+                            value=[crime_min, crime_max],
+                            marks={
+                                crime_min: f"{crime_min:.2f}",
+                                crime_max: f"{crime_max:.2f}"
+                            },
+                            tooltip={"placement": "bottom", "always_visible": True}
+                        ),
+                        # Shown while a background overview job is queued or running
+                        html.Div(
+                            dbc.Progress(id='overview-progress', value=0, striped=True, animated=True),
+                            id='overview-progress-wrapper',
+                            className="mt-3",
+                            style={'display': 'none'}
+                        )
+                    ])
+                ])
+            ], width=3),
+            
+            dbc.Col([
+                dcc.Graph(id='crime-scatter-plot')
+            ], width=9)
+        ], className="mb-4"),
+        
+        dbc.Row([
+            dbc.Col([
+                dcc.Graph(id='crime-histogram')
+            ], width=6),
+            dbc.Col([
+                dcc.Graph(id='state-boxplot')
+            ], width=6)
+        ], className="mb-4"),
+        
+        dbc.Row([
+            dbc.Col([
+                dcc.Graph(id='correlation-heatmap')
+            ], width=12)
+        ])
+    ]
     
-    dbc.Row([
-        dbc.Col([
-            dcc.Graph(id='correlation-heatmap')
-        ], width=12)
-    ])
-]
+    if CLIENTSIDE_FILTERING:
+        # Rows of the selected state and the figure styling for the clientside callback
+        layout += [
+            dcc.Store(id='overview-data'),
+            dcc.Store(id='overview-templates', data=figure_templates())
+        ]
+    elif PATCH_RESPONSES:
+        # Cache key of each overview figure the page currently shows, for delta updates
+        layout.append(dcc.Store(id='overview-figure-keys'))
+    return layout
 
 # US Map page layout
-map_layout = [
-    dbc.Row([
-        dbc.Col([
-            html.H2("US Crime Rate Map", className="text-center mb-4"),
-            html.P("State-level crime rates visualized on US map",
-                   className="text-center text-muted mb-4")
-        ])
-    ]),
-    
-    dbc.Row([
-        dbc.Col([
-            dbc.Card([
-                dbc.CardBody([
-                    html.H5("Map Options", className="card-title"),
-                    html.Label("Metric to Display:"),
-                    dcc.Dropdown(
-                        id='map-metric-dropdown',
-                        options=[
-                            {'label': 'Average Crime Rate', 'value': 'crime_rate_mean'},
-                            {'label': 'Median Crime Rate', 'value': 'crime_rate_median'},
-                            {'label': 'Number of Communities', 'value': 'num_communities'}
-                        ],
-                        value='crime_rate_mean',
-                        className="mb-3"
-                    ),
-                    html.Label("Color Scale:"),
-                    dcc.Dropdown(
-                        id='color-scale-dropdown',
-                        options=[
-                            {'label': 'Reds', 'value': 'Reds'},
-                            {'label': 'Blues', 'value': 'Blues'},
-                            {'label': 'Viridis', 'value': 'Viridis'},
-                            {'label': 'Plasma', 'value': 'Plasma'}
-                        ],
-                        value='Reds',
-                        className="mb-3"
-                    )
+def build_map_layout():
+    return [
+        dbc.Row([
+            dbc.Col([
+                html.H2("US Crime Rate Map", className="text-center mb-4"),
+                html.P("State-level crime rates visualized on US map",
+                       className="text-center text-muted mb-4")
+            ])
+        ]),
+        
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Map Options", className="card-title"),
+                        html.Label("Metric to Display:"),
+                        dcc.Dropdown(
+                            id='map-metric-dropdown',
+                            options=MAP_METRIC_OPTIONS,
+                            value='crime_rate_mean',
+                            className="mb-3"
+                        ),
+                        html.Label("Color Scale:"),
+                        dcc.Dropdown(
+                            id='color-scale-dropdown',
+                            options=COLOR_SCALE_OPTIONS,
+                            value='Reds',
+                            className="mb-3"
+                        )
+                    ])
+                ])
+            ], width=3),
+            
+            dbc.Col([
+                dcc.Graph(id='us-map', style={'height': '600px'})
+            ], width=9)
+        ], className="mb-4"),
+        
+        dbc.Row([
+            dbc.Col([
+                dcc.Graph(id='state-ranking-bar')
+            ], width=12)
+        ], className="mb-4"),
+        
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("County Detail", className="card-title"),
+                        html.Label("State (or click one on the map):"),
+                        dcc.Dropdown(
+                            id='county-state-dropdown',
+                            options=[{'label': 'All States', 'value': 'all'}] + state_options(),
+                            value='all',
+                            className="mb-3"
+                        )
+                    ])
                 ])
+            ], width=3),
+            
+            dbc.Col([
+                dcc.Graph(id='county-map', style={'height': '600px'}),
+                # (state, geometry level, metric, color scale, dataset version) the county map shows
+                dcc.Store(id='county-map-view')
+            ], width=9)
+        ])
+    ]
+
+# Correlation explorer page layout
+def build_correlations_layout():
+    return [
+        dbc.Row([
+            dbc.Col([
+                html.H2("Correlation Explorer", className="text-center mb-4"),
+                html.P("Correlations between all community attributes, for any combination of states",
+                       className="text-center text-muted mb-4")
             ])
-        ], width=3),
+        ]),
         
-        dbc.Col([
-            dcc.Graph(id='us-map', style={'height': '600px'})
-        ], width=9)
-    ], className="mb-4"),
-    
-    dbc.Row([
-        dbc.Col([
-            dcc.Graph(id='state-ranking-bar')
-        ], width=12)
-    ])
-]
+        dbc.Row([
+            dbc.Col([
+                dbc.Card([
+                    dbc.CardBody([
+                        html.H5("Explorer Options", className="card-title"),
+                        html.Label("States:"),
+                        dcc.Dropdown(
+                            id='explorer-state-dropdown',
+                            options=state_options(),
+                            value=[],
+                            multi=True,
+                            placeholder="All States",
+                            className="mb-3"
+                        ),
+                        html.Label("Attributes:"),
+                        dcc.Dropdown(
+                            id='explorer-column-dropdown',
+                            options=ATTRIBUTE_COLUMNS,
+                            value=CORR_COLUMNS,
+                            multi=True,
+                            className="mb-3"
+                        ),
+                        # Many police (LEMAS) attributes are reported by few communities
+                        html.Label("Minimum paired observations:"),
+                        dcc.Input(
+                            id='explorer-min-pairs',
+                            type='number',
+                            min=2,
+                            step=1,
+                            value=10,
+                            className="form-control"
+                        )
+                    ])
+                ])
+            ], width=3),
+            
+            dbc.Col([
+                dcc.Graph(id='explorer-heatmap')
+            ], width=9)
+        ], className="mb-4"),
+        
+        dbc.Row([
+            dbc.Col([
+                dcc.Graph(id='explorer-target-bar')
+            ], width=12)
+        ])
+    ]
+
+PAGE_BUILDERS = {'/': build_overview_layout, '/map': build_map_layout, '/correlations': build_correlations_layout}
+# Built pages by (path, dataset version); cleared when the default views are rendered again
+page_layouts = {}
 
 @callback(Output('page-content', 'children'), [Input('url', 'pathname')])
+@instrument
 def display_page(pathname):
-    if pathname == '/map':
-        return map_layout
-    else:
-        return overview_layout
+    return page_layout(pathname if pathname in PAGE_BUILDERS else '/')
+
+def page_layout(path):
+    """Layout of a page, built on its first visit with the prerendered default views embedded"""
+    key = (path, dataset_version)
+    layout = page_layouts.get(key)
+    if layout is None:
+        with stage('layout'):
+            layout = PAGE_BUILDERS[path]()
+            embed_snapshots(layout_components(layout))
+        page_layouts[key] = layout
+    return layout
 
 # Overview page callbacks
-@callback(
-    [Output('crime-scatter-plot', 'figure'),
-     Output('crime-histogram', 'figure'),
-     Output('state-boxplot', 'figure'),
-     Output('correlation-heatmap', 'figure')],
-    [Input('state-dropdown', 'value'),
-     Input('crime-range-slider', 'value')]
-)
-def update_overview_plots(selected_state, crime_range):
-    # Filter data based on selections
-    filtered_df = df.copy()
-    
-    if selected_state != 'all':
-        filtered_df = filtered_df[filtered_df['state'] == int(selected_state)]
+@instrument
+def update_overview_plots(selected_state, crime_range, data_version, displayed_keys=None, set_progress=None):
+    # Normalize inputs so equivalent selections share one cache entry
+    state = None if selected_state == 'all' else int(selected_state)
+    low, high = quantize_range(crime_range[0], crime_range[1], SLIDER_STEP)
+    key = (state, low, high)
+    if compute_executor is None:
+        figures = overview_figure_cache.get_or_build(key, lambda: render_overview_figures(state, low, high))
+    else:
+        figures = overview_figure_cache.get(key)
+        if figures is None:
+            if set_progress:
+                set_progress((50, 'Building figures'))
+            generation = overview_figure_cache.generation
+            payload = render_overview_json(state, low, high, compute_executor)
+            overview_figure_cache.put_serialized(key, payload, generation)
+            figures = [json.loads(figure) for figure in payload]
+    if not PATCH_RESPONSES:
+        return figures
     
-    filtered_df = filtered_df[
-        (filtered_df['ViolentCrimesPerPop'] >= crime_range[0]) &
-        (filtered_df['ViolentCrimesPerPop'] <= crime_range[1])
+    # Send only what differs from the figures on the page, when those are still cached;
+    # figures drawn before the data last changed may no longer match their cache entry
+    displayed_keys = [
+        tuple(shown[:-1]) if shown and shown[-1] == data_version else None
+        for shown in displayed_keys or [None] * len(figures)
     ]
-    
-    # 1. Scatter plot: Population vs Crime Rate
-    scatter_fig = px.scatter(
-        filtered_df,
-        x='population',
-        y='ViolentCrimesPerPop',
-        color='state_abbr',
-        size='medIncome',
-        hover_data=['communityname', 'pctUrban', 'PctPopUnderPov'],
-        title='Crime Rate vs Population (sized by median income)',
-        labels={
-            'population': 'Population (normalized)',
-            'ViolentCrimesPerPop': 'Violent Crimes Per Capita',
-            'state_abbr': 'State'
-        }
-    )
-    scatter_fig.update_layout(height=500)
-    
-    # 2. Histogram of crime rates
-    hist_fig = px.histogram(
-        filtered_df,
-        x='ViolentCrimesPerPop',
-        nbins=30,
-        title='Distribution of Crime Rates',
-        labels={'ViolentCrimesPerPop': 'Violent Crimes Per Capita'}
+    with stage('diff'):
+        # Diff the cached JSON form, freshly built figures are still go.Figure objects
+        current = overview_figure_cache.peek(key)
+        previous = {shown: overview_figure_cache.peek(shown) for shown in set(displayed_keys) if shown}
+        updates = [
+            figure if current is None or previous.get(shown) is None else figure_patch(previous[shown][i], current[i])
+            for i, (shown, figure) in enumerate(zip(displayed_keys, figures))
+        ]
+    return updates + [[list(key) + [data_version]] * len(figures)]
+
+overview_outputs = [
+    Output('crime-scatter-plot', 'figure'),
+    Output('crime-histogram', 'figure'),
+    Output('state-boxplot', 'figure'),
+    Output('correlation-heatmap', 'figure')
+]
+overview_inputs = [
+    Input('state-dropdown', 'value'),
+    Input('crime-range-slider', 'value'),
+    Input('dataset-version', 'data')
+]
+overview_states = []
+if PATCH_RESPONSES and not CLIENTSIDE_FILTERING:
+    overview_outputs.append(Output('overview-figure-keys', 'data'))
+    overview_states.append(State('overview-figure-keys', 'data'))
+
+@instrument
+def ship_overview_data(selected_state, data_version):
+    # Every row of the state; the browser filters them by crime range itself
+    state = None if selected_state == 'all' else int(selected_state)
+    with stage('filter'):
+        frame = data_source.query_overview(state)
+    observe_rows(len(frame))
+    with stage('serialize'):
+        return build_overview_payload(frame, SLIDER_STEP, uirevision=str(state))
+
+@instrument
+def update_correlation_heatmap(selected_state, crime_range, data_version):
+    state = None if selected_state == 'all' else int(selected_state)
+    low, high = quantize_range(crime_range[0], crime_range[1], SLIDER_STEP)
+    return overview_figure_cache.get_or_build(
+        ('heatmap', state, low, high), lambda: [render_correlation_heatmap(state, low, high)]
+    )[0]
+
+if CLIENTSIDE_FILTERING:
+    # Slider drags are answered in the browser (assets/overview_clientside.js);
+    # the server ships each state's rows once and computes only the correlations
+    callback(Output('overview-data', 'data'), [overview_inputs[0], overview_inputs[2]])(ship_overview_data)
+    callback(overview_outputs[3], overview_inputs, prevent_initial_call=SNAPSHOTS)(update_correlation_heatmap)
+    clientside_callback(
+        ClientsideFunction(namespace='overview', function_name='filter_figures'),
+        overview_outputs[:3],
+        [Input('crime-range-slider', 'value'), Input('overview-data', 'data')],
+        State('overview-templates', 'data')
     )
-    hist_fig.update_layout(height=400)
-    
-    # 3. Box plot by state (top 10 states with most communities)
-    state_counts = filtered_df['state_abbr'].value_counts().head(10)
-    top_states_df = filtered_df[filtered_df['state_abbr'].isin(state_counts.index)]
-    
-    box_fig = px.box(
-        top_states_df,
-        x='state_abbr',
-        y='ViolentCrimesPerPop',
-        title='Crime Rate Distribution by State (Top 10 States)',
-        labels={'state_abbr': 'State', 'ViolentCrimesPerPop': 'Violent Crimes Per Capita'}
+elif job_manager is None:
+    callback(overview_outputs, overview_inputs, *overview_states, prevent_initial_call=SNAPSHOTS)(update_overview_plots)
+else:
+    # Runs on the job queue; Dash cancels a job when a newer slider/dropdown
+    # value supersedes it or the user navigates away
+    @callback(
+        overview_outputs,
+        overview_inputs,
+        *overview_states,
+        prevent_initial_call=SNAPSHOTS,
+        background=True,
+        manager=job_manager,
+        interval=200,
+        progress=[Output('overview-progress', 'value'), Output('overview-progress', 'label')],
+        running=[(Output('overview-progress-wrapper', 'style'), {'display': 'block'}, {'display': 'none'})],
+        cancel=[Input('url', 'pathname')]
     )
-    box_fig.update_layout(height=400)
+    def update_overview_plots_background(set_progress, selected_state, crime_range, data_version, displayed_keys=None):
+        return update_overview_plots(selected_state, crime_range, data_version, displayed_keys, set_progress)
+
+@instrument
+def zoom_scatter_plot(relayout_data, selected_state, crime_range):
+    # Zooming only matters in large-data mode, where the zoomed region is
+    # re-aggregated (or sent as full-resolution points)
+    viewport = parse_viewport(relayout_data)
+    state = None if selected_state == 'all' else int(selected_state)
+    low, high = quantize_range(crime_range[0], crime_range[1], SLIDER_STEP)
+    if viewport is None:
+        raise PreventUpdate
+    with stage('filter'):
+        filtered = data_source.query_overview(state, low, high)
+    observe_rows(len(filtered))
+    if len(filtered) <= LARGE_DATA_THRESHOLD:
+        raise PreventUpdate
     
-    # 4. Correlation heatmap of key socioeconomic factors
-    corr_columns = [
-        'ViolentCrimesPerPop', 'medIncome', 'PctPopUnderPov', 'PctUnemployed',
-        'pctUrban', 'population', 'racepctblack', 'racePctWhite', 'PctBSorMore'
-    ]
-    corr_data = filtered_df[corr_columns].corr()
+    with stage('figures'):
+        scatter_fig = build_scatter_figure(
+            filtered, viewport=None if viewport == 'reset' else viewport,
+            uirevision=str((state, low, high))
+        )
+    if not overview_states:
+        return scatter_fig
     
-    heatmap_fig = px.imshow(
-        corr_data.values,
-        x=corr_data.columns,
-        y=corr_data.columns,
-        color_continuous_scale='RdBu_r',
-        title='Correlation Matrix: Crime Rate vs Socioeconomic Factors',
-        text_auto=True
-    )
-    heatmap_fig.update_layout(height=500)
+    # The zoomed scatter plot matches no cached figure, so the next update sends it whole
+    displayed_keys = Patch()
+    displayed_keys[0] = None
+    return scatter_fig, displayed_keys
+
+if not CLIENTSIDE_FILTERING:
+    # The clientside scatter plot draws every point with WebGL instead
+    zoom_outputs = Output('crime-scatter-plot', 'figure', allow_duplicate=True)
+    if overview_states:
+        zoom_outputs = [zoom_outputs, Output('overview-figure-keys', 'data', allow_duplicate=True)]
+    callback(
+        zoom_outputs,
+        Input('crime-scatter-plot', 'relayoutData'),
+        [State('state-dropdown', 'value'),
+         State('crime-range-slider', 'value')],
+        prevent_initial_call=True
+    )(zoom_scatter_plot)
+
+def render_overview_figures(state, low, high):
+    # Filter data based on selections; the data source answers from its prebuilt
+    # index (or a database query) with only the columns the overview reads
+    with stage('filter'):
+        filtered = data_source.query_overview(state, low, high)
+    observe_rows(len(filtered))
     
-    return scatter_fig, hist_fig, box_fig, heatmap_fig
+    # One pass over the filtered block for all four panels, then lightweight go.* traces
+    with stage('aggregate'):
+        stats = compute_overview_stats(filtered)
+    with stage('figures'):
+        return build_overview_figures(filtered, stats, uirevision=str((state, low, high)))
+
+def render_correlation_heatmap(state, low, high):
+    with stage('filter'):
+        filtered = data_source.query_overview(state, low, high)
+    observe_rows(len(filtered))
+    with stage('aggregate'):
+        corr = correlation_matrix(filtered)
+    with stage('figures'):
+        return build_heatmap_figure(corr)
+
+def render_overview_json(state, low, high, executor=None):
+    """JSON text of the overview figures, built on executor (a compute pool) when given"""
+    if executor is None:
+        return serialize_figures(render_overview_figures(state, low, high))
+    # The selected rows travel with the task, so pool workers need no copy of the data
+    with stage('filter'):
+        filtered = data_source.query_overview(state, low, high)
+    observe_rows(len(filtered))
+    with stage('compute_pool'):
+        return submit_compute(executor, build_overview_json, filtered, str((state, low, high))).result()
 
 # Map page callbacks
 @callback(
     [Output('us-map', 'figure'),
      Output('state-ranking-bar', 'figure')],
     [Input('map-metric-dropdown', 'value'),
-     Input('color-scale-dropdown', 'value')]
+     Input('color-scale-dropdown', 'value'),
+     Input('dataset-version', 'data')],
+    prevent_initial_call=SNAPSHOTS
 )
-def update_map_plots(selected_metric, color_scale):
-    # Create choropleth map
-    map_fig = px.choropleth(
-        state_summary.dropna(subset=['state_abbr']),
-        locations='state_abbr',
-        color=selected_metric,
-        locationmode='USA-states',
-        color_continuous_scale=color_scale,
-        scope='usa',
-        title=f'US States by {selected_metric.replace("_", " ").title()}',
-        hover_data={
-            'crime_rate_mean': ':.4f',
-            'num_communities': True,
-            'avg_income': ':.4f',
-            'avg_poverty_rate': ':.4f'
-        },
-        labels={
-            'crime_rate_mean': 'Avg Crime Rate',
-            'crime_rate_median': 'Median Crime Rate',
-            'num_communities': 'Communities',
-            'state_abbr': 'State'
-        }
+@instrument
+def update_map_plots(selected_metric, color_scale, data_version):
+    return map_figure_cache.get_or_build(
+        (selected_metric, color_scale), lambda: render_map_figures(selected_metric, color_scale)
     )
-    map_fig.update_layout(height=600)
+
+def render_map_figures(selected_metric, color_scale):
+    with stage('figures'):
+        return build_map_figures(state_summary, selected_metric, color_scale)
+
+# Correlation explorer callbacks
+@callback(
+    [Output('explorer-heatmap', 'figure'),
+     Output('explorer-target-bar', 'figure')],
+    [Input('explorer-state-dropdown', 'value'),
+     Input('explorer-column-dropdown', 'value'),
+     Input('explorer-min-pairs', 'value'),
+     Input('dataset-version', 'data')]
+)
+@instrument
+def update_correlation_explorer(selected_states, selected_columns, min_pairs, data_version):
+    # Whole states over the full crime range: a sum of per-state moments, no row scan
+    states = [int(state) for state in selected_states] if selected_states else None
+    columns = selected_columns or CORR_COLUMNS
+    with stage('aggregate'):
+        moments = data_source.correlation_moments(states)
+        corr = pd.DataFrame(moments.correlation(min_pairs or 1), index=ATTRIBUTE_COLUMNS, columns=ATTRIBUTE_COLUMNS)
+        counts = pd.DataFrame(moments.n.astype(np.int64), index=ATTRIBUTE_COLUMNS, columns=ATTRIBUTE_COLUMNS)
+    with stage('figures'):
+        return build_explorer_figures(corr, counts, columns, EXPLORER_TARGET)
+
+@callback(
+    Output('county-state-dropdown', 'value'),
+    Input('us-map', 'clickData'),
+    prevent_initial_call=True
+)
+def drill_down_to_state(click_data):
+    abbr = click_data['points'][0]['location']
+    codes = state_summary.loc[state_summary['state_abbr'] == abbr, 'state']
+    if codes.empty:
+        raise PreventUpdate
+    return codes.iloc[0]
+
+@callback(
+    [Output('county-map', 'figure'),
+     Output('county-map-view', 'data')],
+    [Input('map-metric-dropdown', 'value'),
+     Input('color-scale-dropdown', 'value'),
+     Input('county-state-dropdown', 'value'),
+     Input('county-map', 'relayoutData'),
+     Input('dataset-version', 'data')],
+    State('county-map-view', 'data')
+)
+@instrument
+def update_county_map(selected_metric, color_scale, selected_state, relayout_data, data_version, shown_view):
+    if not geometry_available():
+        return build_notice_figure(f"County boundaries not found: set CRIME_DASHBOARD_COUNTY_GEOJSON (looked for {COUNTY_GEOJSON})"), None
+    state = None if selected_state == 'all' else int(selected_state)
+    shown = tuple(shown_view[:-1]) if shown_view and shown_view[-1] == data_version else None
     
-    # Create ranking bar chart
-    top_states = state_summary.dropna(subset=['state_abbr']).nlargest(15, selected_metric)
+    # The geometry level follows the visible extent: the whole country, a state, or a zoomed-in part
+    zoom = (relayout_data or {}).get('geo.projection.scale')
+    if dash.ctx.triggered_id == 'county-map':
+        if zoom is None:
+            raise PreventUpdate
+        level = level_for_extent(US_EXTENT / zoom)
+    elif shown is not None and shown[0] == state:
+        level = shown[1]
+    else:
+        level = level_for_extent(US_EXTENT if state is None else county_extent(state))
+    key = (state, level, selected_metric, color_scale)
+    if key == shown:
+        raise PreventUpdate
     
-    bar_fig = px.bar(
-        top_states,
-        x='state_abbr',
-        y=selected_metric,
-        title=f'Top 15 States by {selected_metric.replace("_", " ").title()}',
-        labels={
-            'state_abbr': 'State',
-            selected_metric: selected_metric.replace("_", " ").title()
-        },
-        color=selected_metric,
-        color_continuous_scale=color_scale
-    )
-    bar_fig.update_layout(height=400)
+    figure = county_figure_cache.get_or_build(key, lambda: [render_county_figure(*key)])[0]
+    # Metric and color scale changes leave the boundaries alone: send only what differs
+    previous = county_figure_cache.peek(shown) if shown else None
+    current = county_figure_cache.peek(key)
+    if previous is not None and current is not None:
+        with stage('diff'):
+            figure = figure_patch(previous[0], current[0])
+    return figure, list(key) + [data_version]
+
+def county_summary_for(state):
+    county_summary = data_source.county_summary()
+    return county_summary if state is None else county_summary[county_summary['state'] == state]
+
+def county_extent(state):
+    """Largest side in degrees of the state's counties that have data"""
+    return features_extent(county_features('country', county_summary_for(state)['fips']))
+
+def render_county_figure(state, level, selected_metric, color_scale):
+    with stage('aggregate'):
+        county_summary = county_summary_for(state)
+    with stage('geometry'):
+        counties = county_features(level, county_summary['fips'])
+    abbr = county_summary['state_abbr'].iloc[0] if state is not None and len(county_summary) else None
+    with stage('figures'):
+        return build_county_figure(county_summary, counties, selected_metric, color_scale, abbr, uirevision=str(state))
+
+# Every map figure is precomputed so the map page never builds one on request
+MAP_FIGURE_KEYS = [(metric['value'], scale['value']) for metric in MAP_METRIC_OPTIONS for scale in COLOR_SCALE_OPTIONS]
+# The overview every visitor starts from: all states over the full crime range
+DEFAULT_OVERVIEW_KEY = (None, *quantize_range(crime_min, crime_max, SLIDER_STEP))
+
+def layout_components(layout):
+    """Components of a layout by id"""
+    return {
+        component.id: component
+        for item in layout for component in (item, *item._traverse()) if getattr(component, 'id', None)
+    }
+
+app_components = layout_components([app.layout])
+snapshot_key = None
+figure_snapshots = {}
+
+def prerender_default_figures():
+    """Warm the map cache and prepare the default views for the page layouts
+
+    With snapshots on, the views are loaded from the snapshot saved for this
+    dataset version when there is one, and rendered and saved otherwise.
+    """
+    global snapshot_key, figure_snapshots
+    if not SNAPSHOTS:
+        map_figure_cache.warm(MAP_FIGURE_KEYS, render_map_figures)
+        return
+    # The default overview's range (and so its uirevision) follows the slider step
+    snapshot_key = snapshot_fingerprint(data_source.fingerprint(), {'default_overview': DEFAULT_OVERVIEW_KEY})
+    saved = load_snapshots(snapshot_key) or {}
+    views = {f'map/{metric}/{scale}': (map_figure_cache, (metric, scale), render_map_figures) for metric, scale in MAP_FIGURE_KEYS}
+    views['overview'] = (overview_figure_cache, DEFAULT_OVERVIEW_KEY, render_overview_figures)
+    snapshots = {}
+    for name, (cache, key, render) in views.items():
+        payload = saved.get(name) or cache.get_serialized(key) or serialize_figures(render(*key))
+        cache.put_serialized(key, payload)
+        snapshots[name] = list(payload)
+    if snapshots != saved:
+        save_snapshots(snapshot_key, snapshots)
+    figure_snapshots = snapshots
+    app_components['dataset-version'].data = dataset_version
+    # Pages built before carry the previous views (and state options)
+    page_layouts.clear()
+
+def embed_snapshots(components):
+    """Put the prerendered default views into the components of a freshly built page"""
+    if not figure_snapshots:
+        return
+    # Initial callbacks are skipped (prevent_initial_call), so the layouts carry the figures
+    if 'crime-scatter-plot' in components:
+        for output, figure in zip(overview_outputs, figure_snapshots['overview']):
+            components[output.component_id].figure = json.loads(figure)
+        if 'overview-figure-keys' in components:
+            components['overview-figure-keys'].data = [list(DEFAULT_OVERVIEW_KEY) + [dataset_version]] * 4
+    if 'us-map' in components:
+        metric, scale = components['map-metric-dropdown'].value, components['color-scale-dropdown'].value
+        for graph_id, figure in zip(['us-map', 'state-ranking-bar'], figure_snapshots[f'map/{metric}/{scale}']):
+            components[graph_id].figure = json.loads(figure)
+
+STARTUP.mark('app')
+prerender_default_figures()
+STARTUP.mark('prerender')
+
+@app.server.before_request
+def swap_in_new_dataset():
+    """Switch to a newly published shared dataset generation, all at once"""
+    global data_source, state_summary, dataset_version
+    new_source = data_source.reloaded()
+    if new_source is None:
+        return
+    data_source, state_summary = new_source, new_source.state_summary()
+    overview_figure_cache.clear()
+    map_figure_cache.clear()
+    county_figure_cache.clear()
+    dataset_version += 1
+    prerender_default_figures()
+
+@instrument
+def ingest_rows(rows):
+    """Fold a micro-batch of streamed rows into the data, dropping only the figures it changes"""
+    global state_summary, dataset_version
+    with stage('append'):
+        data_source.append(rows)
+    with stage('aggregate'):
+        state_summary = data_source.state_summary()
+    
+    # An overview entry (state, low, high) - or ('heatmap', state, low, high) - changes
+    # only if a new row falls into its selection
+    states = rows['state'].to_numpy()
+    crime = rows['ViolentCrimesPerPop'].to_numpy()
+    def affected(key):
+        state, low, high = key[-3:]
+        selected = (crime >= low) & (crime <= high)
+        if state is not None:
+            selected &= states == state
+        return bool(selected.any())
+    overview_figure_cache.invalidate(affected)
+    
+    # Every map figure reads the state or county summary
+    map_figure_cache.clear()
+    county_figure_cache.clear()
+    dataset_version += 1
+    prerender_default_figures()
+
+@callback(
+    Output('dataset-version', 'data'),
+    Input('dataset-refresh', 'n_intervals'),
+    State('dataset-version', 'data')
+)
+def refresh_dataset_version(n_intervals, shown_version):
+    # Pages redraw (mostly from the figure cache) only after the data changed
+    if shown_version == dataset_version:
+        raise PreventUpdate
+    return dataset_version
+
+@app.server.route('/stats/figure-cache')
+def figure_cache_stats():
+    """Hit/miss/eviction counters for the figure caches"""
+    return {
+        'overview': overview_figure_cache.stats(),
+        'map': map_figure_cache.stats(),
+        'county': county_figure_cache.stats()
+    }
+
+# Batch exports of the overview and map selections (see batch_export)
+OVERVIEW_PANELS = ['scatter', 'histogram', 'boxplot', 'heatmap']
+export_executor = ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix='export')
+
+def known_states():
+    """Codes of the states in the data, the only ones exports accept"""
+    return set(state_summary['state'].astype(int).tolist())
+
+def export_selection(args):
+    """(state, low, high) of export query arguments, normalized like the overview callback's inputs"""
+    # Crime rates are normalized to [0, 1]; bounds beyond it would only overflow the step grid
+    low = parse_float(args, 'low', crime_min, bounds=(0, 1))
+    high = parse_float(args, 'high', crime_max, bounds=(0, 1))
+    return (parse_state(args.get('state'), known_states()), *quantize_range(low, high, SLIDER_STEP))
+
+def export_name(state, low, high):
+    return f"{'all' if state is None else state}-{low:g}-{high:g}"
+
+@app.server.route('/export/communities.<fmt>')
+def export_communities(fmt):
+    """Every column of the communities the overview filters select, streamed as CSV or Parquet"""
+    state, low, high = export_selection(flask.request.args)
+    frames = data_source.export_rows(state, low, high, chunk_rows=EXPORT_CHUNK_ROWS)
+    return stream_table(frames, fmt, f'communities-{export_name(state, low, high)}')
+
+@app.server.route('/export/states.<fmt>')
+def export_states(fmt):
+    """The state summary behind the map page, ranked by its metric"""
+    metric = parse_choices(flask.request.args.get('metric', 'crime_rate_mean'), [option['value'] for option in MAP_METRIC_OPTIONS])[0]
+    summary = state_summary.dropna(subset=['state_abbr']).sort_values(metric, ascending=False)
+    return stream_table([summary], fmt, f'states-{metric}')
+
+def export_overview_variant(state, low, high):
+    """JSON text of the overview figures of a selection, through the figure cache"""
+    key = (state, low, high)
+    payload = overview_figure_cache.get_serialized(key)
+    if payload is None:
+        generation = overview_figure_cache.generation
+        # Export threads already run in parallel; only a process pool gets around the GIL
+        executor = compute_executor if isinstance(compute_executor, ProcessPoolExecutor) else None
+        payload = render_overview_json(state, low, high, executor)
+        overview_figure_cache.put_serialized(key, payload, generation)
+    return payload
+
+def export_map_variant(metric, scale):
+    return map_figure_cache.get_serialized((metric, scale)) or serialize_figures(render_map_figures(metric, scale))
+
+@app.server.route('/export/figures')
+def export_figures():
+    """Many figure variants rendered on the export pool, streamed as JSON lines in request order
+
+    Overview variants are one per state in states (codes, all, or each) over
+    the low-high range, with the figures of panels; map variants one per
+    metric and color scale.
+    """
+    args = flask.request.args
+    if args.get('page', 'overview') == 'map':
+        metrics = parse_choices(args.get('metrics'), [option['value'] for option in MAP_METRIC_OPTIONS])
+        scales = parse_choices(args.get('scales'), [option['value'] for option in COLOR_SCALE_OPTIONS])
+        variants = [(metric, scale) for metric in metrics for scale in scales]
+        labels = [{'metric': metric, 'scale': scale} for metric, scale in variants]
+        render, figures = export_map_variant, [0, 1]
+        name = 'map'
+    else:
+        _, low, high = export_selection(args)
+        states = parse_states(args.get('states'), known_states())
+        panels = parse_choices(args.get('panels'), OVERVIEW_PANELS)
+        variants = [(state, low, high) for state in states]
+        labels = [{'state': state, 'low': low, 'high': high, 'panels': panels} for state in states]
+        render, figures = export_overview_variant, [OVERVIEW_PANELS.index(panel) for panel in panels]
+        name = f'overview-{low:g}-{high:g}'
     
-    return map_fig, bar_fig
+    def lines():
+        payloads = ordered_map(export_executor, render, variants, window=2 * EXPORT_WORKERS)
+        for label, payload in zip(labels, payloads):
+            yield json_line(label, [payload[i] for i in figures])
+    return streamed_response(lines(), 'application/x-ndjson', f'figures-{name}.jsonl')
+
+# Per-callback timings, payload sizes and row counts in Prometheus format at /metrics
+install_metrics(app.server, callback_map=app.callback_map)
+
+# Registered after the metrics hooks, so it runs before them (Flask runs
+# after_request hooks in reverse) and they record the compressed size
+if COMPRESSION:
+    install_compression(app.server)
+
+def cache_metrics():
+    caches = {'overview': overview_figure_cache.stats(), 'map': map_figure_cache.stats(), 'county': county_figure_cache.stats()}
+    return [
+        (f'crime_dashboard_figure_cache_{field}', f'Figure cache {field}',
+         {(('cache', name),): stats[field] for name, stats in caches.items()})
+        for field in ('hits', 'misses', 'evictions', 'size')
+    ]
+
+REGISTRY.add_collector(cache_metrics)
+
+# Import / data / prerender / first response breakdown, at /stats/startup and /metrics
+install_startup_report(app.server)
+REGISTRY.add_collector(STARTUP.metrics)
+
+# Rows streamed in through CRIME_DASHBOARD_STREAM are folded in by background threads
+if STREAM_URL and not data_source.supports_append():
+    raise ValueError("CRIME_DASHBOARD_STREAM needs a data source that takes new rows: "
+                     "the in-memory CSV or shared one, without CRIME_DASHBOARD_COMPACT=1")
+ingester = StreamIngester(STREAM_URL, ingest_rows).start() if STREAM_URL else None
+
+STREAM_METRICS = {
+    'accepted': 'Streamed rows added to the data',
+    'rejected': 'Streamed rows that failed validation',
+    'batches': 'Streamed micro-batches applied'
+}
+
+def stream_metrics():
+    stats = ingester.stats()
+    return [(f'crime_dashboard_stream_{field}', help_text, {(): stats[field]}) for field, help_text in STREAM_METRICS.items()]
+
+if ingester is not None:
+    REGISTRY.add_collector(stream_metrics)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=8050)
\ No newline at end of file
@@ -0,0 +1,128 @@
+"""Schema, loading and state-level aggregation of the UCI communities dataset"""
+
+import pandas as pd
+
+import data_cache
+from partitioned_data import load_partitions, partition_paths
+
+# State FIPS code mapping (partial - for the states that have data)
+STATE_FIPS_MAPPING = {
+    1: 'AL', 2: 'AK', 4: 'AZ', 5: 'AR', 6: 'CA', 8: 'CO', 9: 'CT', 10: 'DE', 
+    11: 'DC', 12: 'FL', 13: 'GA', 15: 'HI', 16: 'ID', 17: 'IL', 18: 'IN', 
+    19: 'IA', 20: 'KS', 21: 'KY', 22: 'LA', 23: 'ME', 24: 'MD', 25: 'MA', 
+    26: 'MI', 27: 'MN', 28: 'MS', 29: 'MO', 30: 'MT', 31: 'NE', 32: 'NV', 
+    33: 'NH', 34: 'NJ', 35: 'NM', 36: 'NY', 37: 'NC', 38: 'ND', 39: 'OH', 
+    40: 'OK', 41: 'OR', 42: 'PA', 44: 'RI', 45: 'SC', 46: 'SD', 47: 'TN', 
+    48: 'TX', 49: 'UT', 50: 'VT', 51: 'VA', 53: 'WA', 54: 'WV', 55: 'WI', 56: 'WY'
+}
+
+DATA_FILE = 'communities_crime.data'
+
+# Column names based on the .names file
+COLUMN_NAMES = [
+    'state', 'county', 'community', 'communityname', 'fold', 
+    'population', 'householdsize', 'racepctblack', 'racePctWhite', 'racePctAsian',
+    'racePctHisp', 'agePct12t21', 'agePct12t29', 'agePct16t24', 'agePct65up',
+    'numbUrban', 'pctUrban', 'medIncome', 'pctWWage', 'pctWFarmSelf',
+    'pctWInvInc', 'pctWSocSec', 'pctWPubAsst', 'pctWRetire', 'medFamInc',
+    'perCapInc', 'whitePerCap', 'blackPerCap', 'indianPerCap', 'AsianPerCap',
+    'OtherPerCap', 'HispPerCap', 'NumUnderPov', 'PctPopUnderPov', 'PctLess9thGrade',
+    'PctNotHSGrad', 'PctBSorMore', 'PctUnemployed', 'PctEmploy', 'PctEmplManu',
+    'PctEmplProfServ', 'PctOccupManu', 'PctOccupMgmtProf', 'MalePctDivorce', 'MalePctNevMarr',
+    'FemalePctDiv', 'TotalPctDiv', 'PersPerFam', 'PctFam2Par', 'PctKids2Par',
+    'PctYoungKids2Par', 'PctTeen2Par', 'PctWorkMomYoungKids', 'PctWorkMom', 'NumIlleg',
+    'PctIlleg', 'NumImmig', 'PctImmigRecent', 'PctImmigRec5', 'PctImmigRec8',
+    'PctImmigRec10', 'PctRecentImmig', 'PctRecImmig5', 'PctRecImmig8', 'PctRecImmig10',
+    'PctSpeakEnglOnly', 'PctNotSpeakEnglWell', 'PctLargHouseFam', 'PctLargHouseOccup', 'PersPerOccupHous',
+    'PersPerOwnOccHous', 'PersPerRentOccHous', 'PctPersOwnOccup', 'PctPersDenseHous', 'PctHousLess3BR',
+    'MedNumBR', 'HousVacant', 'PctHousOccup', 'PctHousOwnOcc', 'PctVacantBoarded',
+    'PctVacMore6Mos', 'MedYrHousBuilt', 'PctHousNoPhone', 'PctWOFullPlumb', 'OwnOccLowQuart',
+    'OwnOccMedVal', 'OwnOccHiQuart', 'RentLowQ', 'RentMedian', 'RentHighQ',
+    'MedRent', 'MedRentPctHousInc', 'MedOwnCostPctInc', 'MedOwnCostPctIncNoMtg', 'NumInShelters',
+    'NumStreet', 'PctForeignBorn', 'PctBornSameState', 'PctSameHouse85', 'PctSameCity85',
+    'PctSameState85', 'LemasSwornFT', 'LemasSwFTPerPop', 'LemasSwFTFieldOps', 'LemasSwFTFieldPerPop',
+    'LemasTotalReq', 'LemasTotReqPerPop', 'PolicReqPerOffic', 'PolicPerPop', 'RacialMatchCommPol',
+    'PctPolicWhite', 'PctPolicBlack', 'PctPolicHisp', 'PctPolicAsian', 'PctPolicMinor',
+    'OfficAssgnDrugUnits', 'NumKindsDrugsSeiz', 'PolicAveOTWorked', 'LandArea', 'PopDens',
+    'PctUsePubTrans', 'PolicCars', 'PolicOperBudg', 'LemasPctPolicOnPatr', 'LemasGangUnitDeploy',
+    'LemasPctOfficDrugUn', 'PolicBudgPerPop', 'ViolentCrimesPerPop'
+]
+
+# Columns load_data() always reads: it cleans and filters on them
+REQUIRED_COLUMNS = ['state', 'communityname', 'ViolentCrimesPerPop']
+
+def load_data(path=DATA_FILE, use_cache=True, columns=None, states=None):
+    """Load and preprocess the UCI Communities and Crime dataset
+    
+    path may also be a directory or glob of partition files, which are
+    parsed in parallel (see partitioned_data). columns restricts the frame
+    to those columns (plus REQUIRED_COLUMNS) and states to the rows of those
+    state codes; state_abbr is always derived.
+    """
+    paths = partition_paths(path)
+    if paths != [path]:
+        return load_partitions(paths, load_data, states=states, use_cache=use_cache, columns=columns)
+    
+    if columns is not None:
+        wanted = set(columns) | set(REQUIRED_COLUMNS)
+        columns = [name for name in COLUMN_NAMES if name in wanted]
+    
+    # Load the data, reusing the columnar cache from a previous start when possible
+    def parse(usecols=None):
+        return pd.read_csv(path, names=COLUMN_NAMES, usecols=usecols, na_values='?')
+    
+    if use_cache:
+        df = data_cache.load_cached_frame(path, COLUMN_NAMES, parse, read_options={'na_values': '?'}, columns=columns)
+    else:
+        df = parse(columns)
+    
+    if states is not None:
+        df = df[df['state'].isin(states)]
+    return prepare_frame(df)
+
+def prepare_frame(df):
+    """Clean a frame parsed with COLUMN_NAMES the way load_data() does"""
+    # Clean community names
+    df['communityname'] = df['communityname'].fillna('Unknown')
+    
+    # Map state codes to abbreviations
+    df['state_abbr'] = df['state'].map(STATE_FIPS_MAPPING)
+    
+    # Filter out rows with missing crime data (target variable)
+    df = df.dropna(subset=['ViolentCrimesPerPop'])
+    
+    return df
+
+def create_state_summary(df):
+    """Create state-level aggregated data"""
+    state_summary = df.groupby(['state', 'state_abbr']).agg({
+        'ViolentCrimesPerPop': ['mean', 'median', 'std', 'count'],
+        'population': 'sum',
+        'medIncome': 'mean',
+        'PctPopUnderPov': 'mean',
+        'pctUrban': 'mean'
+    }).round(4)
+    
+    # Flatten column names
+    state_summary.columns = [
+        'crime_rate_mean', 'crime_rate_median', 'crime_rate_std', 'num_communities',
+        'total_population', 'avg_income', 'avg_poverty_rate', 'avg_urban_pct'
+    ]
+    
+    state_summary = state_summary.reset_index()
+    return state_summary
+
+def create_county_summary(df):
+    """County-level aggregates of the communities that carry a county code
+    
+    fips is the 5-digit state and county code the county boundaries use.
+    """
+    counties = df.dropna(subset=['county'])
+    county_summary = counties.groupby(['state', 'state_abbr', 'county'])['ViolentCrimesPerPop'].agg(
+        ['mean', 'median', 'count']
+    ).round(4)
+    county_summary.columns = ['crime_rate_mean', 'crime_rate_median', 'num_communities']
+    
+    county_summary = county_summary.reset_index()
+    county_summary['fips'] = (county_summary['state'] * 1000 + county_summary['county']).astype(int).astype(str).str.zfill(5)
+    return county_summary
@@ -0,0 +1,142 @@
+"""Columnar on-disk cache for the parsed communities dataset"""
+
+import hashlib
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+# Bump whenever the on-disk layout below changes
+CACHE_FORMAT_VERSION = 1
+
+CACHE_DIR = os.environ.get('CRIME_DASHBOARD_CACHE_DIR', '.cache')
+
+# file_digest results by (path, size, mtime), so repeated loads of an
+# unchanged file (e.g. of single columns) do not hash it again
+_digests = {}
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """SHA-256 of a file's contents, read in chunks"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key in _digests:
+        return _digests[key]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    _digests[key] = digest.hexdigest()
+    return _digests[key]
+
+
+def schema_digest(column_names, read_options=None):
+    """Hash of everything besides the file contents that shapes the parsed frame"""
+    schema = {
+        'version': CACHE_FORMAT_VERSION,
+        'columns': list(column_names),
+        'read_options': read_options or {},
+    }
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()
+
+
+def cache_entry_path(path, column_names, read_options=None, cache_dir=CACHE_DIR):
+    """Directory holding the cache entry for this source file and schema
+
+    Named <file name>-<hash of the full path>-<contents>-<schema>, so partitions
+    sharing a file name (state=6/year=1995.data, state=36/year=1995.data) get
+    entries of their own.
+    """
+    source = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:8]
+    key = f"{file_digest(path)[:16]}-{schema_digest(column_names, read_options)[:16]}"
+    return os.path.join(cache_dir, f"{os.path.basename(path)}-{source}-{key}")
+
+
+def write_frame(df, entry):
+    """Write df as one .npy file per column plus a meta.json manifest"""
+    tmp = f"{entry}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    columns = []
+    for i, name in enumerate(df.columns):
+        series = df[name]
+        column = {'name': name, 'file': f"{i}.npy", 'dtype': str(series.dtype), 'mask': None}
+        column['kind'] = 'numeric' if pd.api.types.is_numeric_dtype(series) else 'string'
+        if column['kind'] == 'string':
+            # Strings are stored fixed-width; missing values go in a separate mask
+            mask = series.isna().to_numpy()
+            values = series.where(~mask, '').astype(str).to_numpy().astype(str)
+            if mask.any():
+                column['mask'] = f"{i}.mask.npy"
+                np.save(os.path.join(tmp, column['mask']), mask)
+        else:
+            values = series.to_numpy()
+        np.save(os.path.join(tmp, column['file']), values)
+        columns.append(column)
+
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({'version': CACHE_FORMAT_VERSION, 'rows': len(df), 'columns': columns}, f)
+
+    try:
+        os.rename(tmp, entry)
+    except OSError:
+        # Another process finished the same entry first
+        shutil.rmtree(tmp, ignore_errors=True)
+
+
+def read_frame(entry, mmap_mode=None, columns=None):
+    """Rebuild the DataFrame stored by write_frame, or only the given columns of it"""
+    with open(os.path.join(entry, 'meta.json')) as f:
+        meta = json.load(f)
+    if meta['version'] != CACHE_FORMAT_VERSION:
+        raise ValueError(f"Unsupported cache format {meta['version']}")
+
+    stored = {column['name']: column for column in meta['columns']}
+    data = {}
+    for column in (stored[name] for name in (columns or stored)):
+        values = np.load(os.path.join(entry, column['file']), mmap_mode=mmap_mode)
+        if column['kind'] == 'string':
+            values = values.astype(object)
+            if column['mask']:
+                values[np.load(os.path.join(entry, column['mask']))] = np.nan
+            values = pd.array(values, dtype=column['dtype'])
+        data[column['name']] = values
+    return pd.DataFrame(data)
+
+
+def prune_stale_entries(entry):
+    """Remove other cache entries for the same source file (same name and full path)"""
+    cache_dir, name = os.path.split(entry)
+    prefix = name.rsplit('-', 2)[0] + '-'
+    for other in os.listdir(cache_dir):
+        if other.startswith(prefix) and other != name and '.tmp-' not in other:
+            shutil.rmtree(os.path.join(cache_dir, other), ignore_errors=True)
+
+
+def load_cached_frame(path, column_names, parse, read_options=None, cache_dir=CACHE_DIR, columns=None):
+    """Return parse()'s frame for path, served from the columnar cache when it is current
+
+    The cache key covers the source file's contents and the column schema, so
+    editing either one transparently triggers a re-parse on the next start.
+    With columns, only those are read back (a miss still caches every column).
+    """
+    entry = cache_entry_path(path, column_names, read_options, cache_dir)
+    if os.path.isdir(entry):
+        try:
+            return read_frame(entry, columns=columns)
+        except (OSError, ValueError, KeyError):
+            # Corrupt or partial entry - rebuild it below
+            shutil.rmtree(entry, ignore_errors=True)
+
+    df = parse()
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        write_frame(df, entry)
+        prune_stale_entries(entry)
+    except OSError:
+        # Caching is best effort, e.g. on a read-only deployment
+        pass
+    return df if columns is None else df[columns]
@@ -0,0 +1,402 @@
+"""Pluggable backends the dashboard reads community data through
+
+The CSV file is loaded into memory as before; SQLite (or DuckDB, when
+installed) keeps the data in a database and answers each filter and the
+state summary as a query, so workers do not hold their own copy of the frame.
+Select a backend with CRIME_DASHBOARD_DATABASE_URL, e.g. sqlite:///communities.db
+(or shared:///<dir> for a generation published by shared_dataset.py).
+
+Importing the CSV into a database:
+
+    python data_source.py sqlite:///communities.db [communities_crime.data]
+"""
+
+import os
+import queue
+import sqlite3
+import sys
+import threading
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from compact_frame import COMPACT_STORAGE, load_compact_data
+from correlation_engine import ATTRIBUTE_COLUMNS, CHUNK_ROWS, CorrelationEngine
+from crime_data import DATA_FILE, create_county_summary, load_data
+from filter_index import CrimeRangeIndex
+from overview_stats import OVERVIEW_COLUMNS, OverviewFrame
+from partitioned_data import dataset_digest
+from summary_engine import INPUT_COLUMNS, SUMMARY_COLUMNS, StateSummaryEngine
+
+try:
+    import duckdb
+except ImportError:
+    duckdb = None
+
+TABLE = 'communities'
+POOL_SIZE = int(os.environ.get('CRIME_DASHBOARD_POOL_SIZE', 4))
+# State codes to load, e.g. 6,36,48; partitions of other states are not read (default: all)
+LOAD_STATES = [int(code) for code in os.environ.get('CRIME_DASHBOARD_STATES', '').split(',') if code.strip()] or None
+
+
+class DataSource:
+    """Interface every backend implements"""
+
+    def query_overview(self, state=None, low=-np.inf, high=np.inf):
+        """OverviewFrame of communities in state (None for all) with crime rate in [low, high]"""
+        raise NotImplementedError
+
+    def state_summary(self):
+        """Frame with the columns create_state_summary() produces"""
+        raise NotImplementedError
+
+    def crime_bounds(self):
+        """(min, max) of ViolentCrimesPerPop"""
+        raise NotImplementedError
+
+    def county_summary(self):
+        """Frame with the columns create_county_summary() produces"""
+        raise NotImplementedError
+
+    def correlation_moments(self, states=None, columns=None):
+        """Summed PairwiseMoments of states (None for all) over columns (default every attribute)"""
+        raise NotImplementedError
+
+    def export_rows(self, state=None, low=-np.inf, high=np.inf, chunk_rows=CHUNK_ROWS):
+        """DataFrames of every column of the communities query_overview() selects, in row order, chunk by chunk"""
+        raise NotImplementedError
+
+    def supports_append(self):
+        """Whether append() takes rows, so the source can be fed a stream"""
+        return False
+
+    def append(self, rows):
+        """Add rows prepared like load_data() output (see stream_ingest)"""
+        raise NotImplementedError(f"{type(self).__name__} does not take appended rows")
+
+    def fingerprint(self):
+        """String identifying the data this source serves, or None if it can change unseen"""
+        return None
+
+    def reloaded(self):
+        """A fresh source if the underlying data was replaced since this one was opened, else None"""
+        return None
+
+    def close(self):
+        pass
+
+
+class CsvDataSource(DataSource):
+    """The communities_crime.data file held in memory with prebuilt query structures
+
+    path may be a partitioned dataset (see partitioned_data), and states
+    limits what is loaded. With compact, df is a CompactFrame of the working
+    set (see compact_frame).
+    """
+
+    def __init__(self, path=DATA_FILE, df=None, compact=COMPACT_STORAGE, states=LOAD_STATES):
+        self.path = path
+        self.states = states
+        if df is None:
+            df = load_compact_data(path, states=states) if compact else load_data(path, states=states)
+        self.df = df
+        self.crime_index = CrimeRangeIndex.from_frame(self.df)
+        self.overview_frame = OverviewFrame.from_frame(self.df)
+        # Running per-state aggregates; new rows can be folded in with engine.insert()
+        self.engine = StateSummaryEngine.from_frame(self.df)
+        # Correlation moments over every attribute, built on first use
+        self._correlations = None
+        self.appended = 0
+        self._write_lock = threading.Lock()
+
+    def query_overview(self, state=None, low=-np.inf, high=np.inf):
+        # Index first: append() publishes the frame an index points into before the index
+        rows = self.crime_index.query(state, low, high)
+        return self.overview_frame.take(rows)
+
+    def state_summary(self):
+        with self._write_lock:
+            return self.engine.summary()
+
+    def county_summary(self):
+        return create_county_summary(self.df[['state', 'state_abbr', 'county', 'ViolentCrimesPerPop']])
+
+    def correlation_moments(self, states=None, columns=None):
+        with self._write_lock:
+            if self._correlations is None:
+                self._correlations = CorrelationEngine.from_frame(self.df)
+            return self._correlations.moments(states, columns)
+
+    def export_rows(self, state=None, low=-np.inf, high=np.inf, chunk_rows=CHUNK_ROWS):
+        # A scan rather than an index query: no list of every matching row is held,
+        # and rows appended meanwhile go to a new frame, not this one
+        df = self.df
+        columns = list(df.columns)
+        for start in range(0, len(df), chunk_rows):
+            if isinstance(df, pd.DataFrame):
+                chunk = df.iloc[start:start + chunk_rows]
+            else:
+                # Columns outside the working set are loaded (compactly) on first export
+                chunk = df.row_slice(start, start + chunk_rows, columns)
+            selected = chunk['ViolentCrimesPerPop'].between(low, high)
+            if state is not None:
+                selected &= chunk['state'] == state
+            yield chunk[selected.to_numpy()]
+
+    def supports_append(self):
+        return isinstance(self.df, pd.DataFrame)
+
+    def append(self, rows):
+        """Fold new rows into the frame, the filter index and the state aggregates
+
+        Queries running meanwhile keep seeing the previous rows: the frame,
+        index and overview block are replaced by extended copies, not mutated.
+        """
+        if not isinstance(self.df, pd.DataFrame):
+            raise NotImplementedError("Compact storage does not take appended rows")
+        with self._write_lock:
+            # First: it refuses a batch with crime rates outside [0, 1] before anything changed
+            self.engine.insert(rows[INPUT_COLUMNS])
+            crime_index = self.crime_index.extend(rows['state'].to_numpy(), rows['ViolentCrimesPerPop'].to_numpy())
+            self.overview_frame = self.overview_frame.append(OverviewFrame.from_frame(rows))
+            self.crime_index = crime_index
+            self.df = pd.concat([self.df, rows[self.df.columns]], ignore_index=True)
+            if self._correlations is not None:
+                self._correlations.insert(rows)
+            self.appended += len(rows)
+
+    def fingerprint(self):
+        # Streamed rows exist only in this process
+        if self.appended:
+            return None
+        storage = 'frame' if isinstance(self.df, pd.DataFrame) else 'compact'
+        states = 'all' if self.states is None else ','.join(map(str, sorted(self.states)))
+        return f'{dataset_digest(self.path)}:{storage}:{states}'
+
+    def crime_bounds(self):
+        crime = self.df['ViolentCrimesPerPop']
+        return crime.min(), crime.max()
+
+
+class ConnectionPool:
+    """Fixed-size pool of database connections shared by all callback threads"""
+
+    def __init__(self, connect, size=POOL_SIZE, timeout=30):
+        self._connect = connect
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self.size = size
+        self.timeout = timeout
+        # Connections must not be shared with forked compute workers
+        os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def _acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+        # Open connections lazily, up to size; after that wait for one to come back
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                return self._connect()
+        return self._idle.get(timeout=self.timeout)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SQLDataSource(DataSource):
+    """Communities stored in a SQLite or DuckDB table, queried on demand"""
+
+    # Median via window functions: average of the one or two middle rows per state
+    SUMMARY_SQL = f"""
+        WITH ranked AS (
+            SELECT state, state_abbr, "ViolentCrimesPerPop" AS crime,
+                   ROW_NUMBER() OVER (PARTITION BY state, state_abbr ORDER BY "ViolentCrimesPerPop") AS rn,
+                   COUNT(*) OVER (PARTITION BY state, state_abbr) AS n
+            FROM {TABLE}
+            WHERE state_abbr IS NOT NULL AND "ViolentCrimesPerPop" IS NOT NULL
+        ),
+        medians AS (
+            SELECT state, state_abbr, AVG(crime) AS median
+            FROM ranked
+            WHERE 2 * rn >= n AND 2 * rn <= n + 2
+            GROUP BY state, state_abbr
+        )
+        SELECT c.state, c.state_abbr,
+               AVG(c."ViolentCrimesPerPop"), m.median,
+               SUM(c."ViolentCrimesPerPop"), SUM(c."ViolentCrimesPerPop" * c."ViolentCrimesPerPop"),
+               COUNT(c."ViolentCrimesPerPop"), SUM(c.population),
+               AVG(c."medIncome"), AVG(c."PctPopUnderPov"), AVG(c."pctUrban")
+        FROM {TABLE} c JOIN medians m ON c.state = m.state AND c.state_abbr = m.state_abbr
+        WHERE c."ViolentCrimesPerPop" IS NOT NULL
+        GROUP BY c.state, c.state_abbr, m.median
+        ORDER BY c.state, c.state_abbr
+    """
+
+    def __init__(self, url, pool_size=POOL_SIZE):
+        self.url = url
+        scheme, _, path = url.partition(':///')
+        if scheme == 'sqlite':
+            # Read-only URI connections may be shared across threads, one at a time
+            connect = lambda: sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+        elif scheme == 'duckdb':
+            if duckdb is None:
+                raise ImportError("duckdb URLs need the duckdb package (pip install duckdb)")
+            connect = lambda: duckdb.connect(path, read_only=True)
+        else:
+            raise ValueError(f"Unsupported database URL: {url}")
+        self.pool = ConnectionPool(connect, size=pool_size)
+        self._correlations = None
+        self._correlations_lock = threading.Lock()
+
+        columns = ', '.join(_quote(name) for name in ['state_abbr', 'communityname'] + OVERVIEW_COLUMNS)
+        self._overview_sql = (
+            f'SELECT {columns} FROM {TABLE} WHERE "ViolentCrimesPerPop" BETWEEN ? AND ?'
+        )
+
+    def _fetch(self, sql, params=()):
+        with self.pool.connection() as conn:
+            return conn.execute(sql, params).fetchall()
+
+    def query_overview(self, state=None, low=-np.inf, high=np.inf):
+        sql, params = self._overview_sql, [float(low), float(high)]
+        if state is not None:
+            sql += ' AND state = ?'
+            params.append(int(state))
+        rows = self._fetch(sql + ' ORDER BY row_id', params)
+
+        if not rows:
+            empty = np.empty(0, dtype=object)
+            return OverviewFrame(np.empty((0, len(OVERVIEW_COLUMNS))), empty, empty)
+        labels, names, *values = zip(*rows)
+        return OverviewFrame(
+            np.ascontiguousarray(np.array(values, dtype=float).T),
+            np.array(labels, dtype=object),
+            np.array(names, dtype=object)
+        )
+
+    def state_summary(self):
+        records = []
+        for state, abbr, mean, median, total, squares, count, population, income, poverty, urban in self._fetch(self.SUMMARY_SQL):
+            # Sample standard deviation from the running sums, as pandas would report it
+            std = np.sqrt(max(squares - total * total / count, 0.0) / (count - 1)) if count > 1 else np.nan
+            records.append([state, abbr, mean, median, std, count, population, income, poverty, urban])
+        summary = pd.DataFrame(records, columns=SUMMARY_COLUMNS)
+        summary[SUMMARY_COLUMNS[2:]] = summary[SUMMARY_COLUMNS[2:]].round(4)
+        return summary
+
+    def county_summary(self):
+        rows = self._fetch(f'SELECT state, state_abbr, county, "ViolentCrimesPerPop" FROM {TABLE} WHERE county IS NOT NULL')
+        return create_county_summary(pd.DataFrame(rows, columns=['state', 'state_abbr', 'county', 'ViolentCrimesPerPop']))
+
+    def correlation_moments(self, states=None, columns=None):
+        # One pass over the table on first use; the table does not change under the app
+        with self._correlations_lock:
+            if self._correlations is None:
+                self._correlations = self._build_correlations()
+        return self._correlations.moments(states, columns)
+
+    def _build_correlations(self, chunk_rows=CHUNK_ROWS):
+        names = ['state'] + ATTRIBUTE_COLUMNS
+        engine = None
+        with self.pool.connection() as conn:
+            cursor = conn.execute(f'SELECT {", ".join(_quote(name) for name in names)} FROM {TABLE}')
+            while True:
+                chunk = cursor.fetchmany(chunk_rows)
+                if not chunk:
+                    break
+                rows = pd.DataFrame(chunk, columns=names).astype({name: float for name in ATTRIBUTE_COLUMNS})
+                if engine is None:
+                    engine = CorrelationEngine(ATTRIBUTE_COLUMNS, np.nan_to_num(rows[ATTRIBUTE_COLUMNS].mean().to_numpy()))
+                engine.insert(rows)
+        return engine if engine is not None else CorrelationEngine()
+
+    def export_rows(self, state=None, low=-np.inf, high=np.inf, chunk_rows=CHUNK_ROWS):
+        # One cursor streamed in chunks; it holds a pooled connection until the export is done
+        sql, params = f'SELECT * FROM {TABLE} WHERE "ViolentCrimesPerPop" BETWEEN ? AND ?', [float(low), float(high)]
+        if state is not None:
+            sql += ' AND state = ?'
+            params.append(int(state))
+        with self.pool.connection() as conn:
+            cursor = conn.execute(sql + ' ORDER BY row_id', params)
+            names = [description[0] for description in cursor.description]
+            chunk = cursor.fetchmany(chunk_rows)
+            # The first chunk is sent even when empty, so exports still name their columns
+            while True:
+                yield pd.DataFrame(chunk, columns=names).drop(columns='row_id')
+                chunk = cursor.fetchmany(chunk_rows)
+                if not chunk:
+                    break
+
+    def crime_bounds(self):
+        return self._fetch(f'SELECT MIN("ViolentCrimesPerPop"), MAX("ViolentCrimesPerPop") FROM {TABLE}')[0]
+
+    def close(self):
+        self.pool.close()
+
+
+def open_data_source(url=None):
+    """Backend for a database URL; None (the default) reads the CSV file"""
+    if not url:
+        return CsvDataSource()
+    if url.startswith('csv:///'):
+        return CsvDataSource(url[len('csv:///'):])
+    if url.startswith('shared:///'):
+        from shared_dataset import SharedDataSource
+        return SharedDataSource(url[len('shared:///'):])
+    return SQLDataSource(url)
+
+
+def import_to_database(url, path=DATA_FILE):
+    """Load the CSV with load_data() and write it to the database at url"""
+    scheme, _, target = url.partition(':///')
+    df = load_data(path).reset_index(drop=True)
+    df.insert(0, 'row_id', np.arange(len(df)))
+
+    if scheme == 'sqlite':
+        conn = sqlite3.connect(target)
+        df.to_sql(TABLE, conn, if_exists='replace', index=False)
+    elif scheme == 'duckdb' and duckdb is not None:
+        conn = duckdb.connect(target)
+        conn.execute(f'CREATE OR REPLACE TABLE {TABLE} AS SELECT * FROM df')
+    else:
+        raise ValueError(f"Unsupported database URL: {url}")
+
+    # The database-side equivalent of CrimeRangeIndex
+    conn.execute(f'CREATE INDEX idx_{TABLE}_crime ON {TABLE} ("ViolentCrimesPerPop")')
+    conn.execute(f'CREATE INDEX idx_{TABLE}_state_crime ON {TABLE} (state, "ViolentCrimesPerPop")')
+    conn.commit()
+    conn.close()
+    return len(df)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3):
+        sys.exit(__doc__)
+    count = import_to_database(*sys.argv[1:])
+    print(f"Imported {count} communities into {sys.argv[1]}")
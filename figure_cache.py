@@ -0,0 +1,137 @@
+"""Bounded LRU cache of serialized Plotly figures for the dashboard callbacks"""
+
+import json
+import math
+import threading
+from collections import OrderedDict
+
+import plotly.io as pio
+
+from instrumentation import stage
+
+
+def quantize_range(low, high, step):
+    """Widen a slider range outward to the slider's step grid
+
+    Near-identical drags then share a cache key, and the snapped range never
+    excludes a row the raw range would have included.
+    """
+    # Round first so float noise like 0.3 / 0.01 = 29.999... does not shift a step
+    low = math.floor(round(low / step, 6)) * step
+    high = math.ceil(round(high / step, 6)) * step
+    return round(low, 10), round(high, 10)
+
+
+def serialize_figures(figures):
+    """JSON text of each figure, as stored in the cache"""
+    with stage('serialize'):
+        return tuple(pio.to_json(figure, validate=False) for figure in figures)
+
+
+class FigureCache:
+    """LRU cache mapping normalized callback inputs to figure JSON
+
+    Each entry holds the JSON text of every figure a callback returns, so a
+    hit skips figure construction and validation entirely. maxsize=None
+    disables eviction, which suits small input spaces that are fully
+    precomputed.
+    """
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Bumped whenever entries are dropped because the data changed
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Cached figures for key as plain dicts, or None on a miss"""
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        with stage('cache_load'):
+            return [json.loads(figure) for figure in payload]
+
+    def peek(self, key):
+        """Like get() but without touching the LRU order or the hit/miss counters"""
+        with self._lock:
+            payload = self._entries.get(key)
+        return None if payload is None else [json.loads(figure) for figure in payload]
+
+    def get_serialized(self, key):
+        """Stored JSON text of the figures for key, or None; not counted as a lookup"""
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, figures, generation=None):
+        self.put_serialized(key, serialize_figures(figures), generation)
+
+    def put_serialized(self, key, payload, generation=None):
+        """Store figures already converted with serialize_figures()
+
+        Figures built from data read at an earlier generation are not stored,
+        so a build racing an invalidation cannot bring stale figures back.
+        """
+        payload = tuple(payload)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = payload
+            self._entries.move_to_end(key)
+            while self.maxsize is not None and len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_build(self, key, build):
+        """Return cached figures for key, calling build() to create them on a miss"""
+        figures = self.get(key)
+        if figures is None:
+            generation = self.generation
+            figures = build()
+            self.put(key, figures, generation)
+        return figures
+
+    def warm(self, keys, build):
+        """Precompute build(*key) for every key that is not cached yet"""
+        for key in keys:
+            if key not in self:
+                self.put(key, build(*key))
+
+    def invalidate(self, affected):
+        """Drop the entries whose key affected(key) is true; returns how many"""
+        with self._lock:
+            self.generation += 1
+            keys = [key for key in self._entries if affected(key)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+            }
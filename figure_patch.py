@@ -0,0 +1,65 @@
+"""Delta updates of figures the browser already shows
+
+With CRIME_DASHBOARD_PATCH_RESPONSES=1 the overview callback remembers (in
+a dcc.Store) which cached figures the page currently displays and answers
+with a dash.Patch of the differences instead of the full figures: the
+layout, template and trace styling of consecutive filter states are
+identical, so usually only the trace data arrays travel.
+"""
+
+import os
+
+from dash import Patch, no_update
+
+PATCH_RESPONSES = os.environ.get('CRIME_DASHBOARD_PATCH_RESPONSES', '0') == '1'
+
+
+def diff_figure(old, new, location=()):
+    """Operations turning the plain figure dict old into new
+
+    Returns (operation, location, value) tuples with operation one of
+    'assign', 'delete' and 'extend'. Dicts are compared key by key and the
+    trace list index by index; any other changed value is assigned whole.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        operations = []
+        for key, value in new.items():
+            if key not in old:
+                operations.append(('assign', location + (key,), value))
+            elif old[key] != value:
+                operations += diff_figure(old[key], value, location + (key,))
+        operations += [('delete', location + (key,), None) for key in old if key not in new]
+        return operations
+
+    if location == ('data',) and isinstance(old, list) and isinstance(new, list):
+        operations = []
+        for i, (old_trace, new_trace) in enumerate(zip(old, new)):
+            if old_trace != new_trace:
+                operations += diff_figure(old_trace, new_trace, location + (i,))
+        if len(new) > len(old):
+            operations.append(('extend', location, new[len(old):]))
+        # Trailing traces go last to first so earlier indices stay valid
+        operations += [('delete', location + (i,), None) for i in range(len(old) - 1, len(new) - 1, -1)]
+        return operations
+
+    return [('assign', location, new)]
+
+
+def figure_patch(old, new):
+    """A dash.Patch turning old into new, no_update when they are equal"""
+    operations = diff_figure(old, new)
+    if not operations:
+        return no_update
+    patch = Patch()
+    for operation, location, value in operations:
+        target = patch
+        for key in location[:-1]:
+            target = target[key]
+        if operation == 'assign':
+            target[location[-1]] = value
+        elif operation == 'delete':
+            del target[location[-1]]
+        else:
+            target[location[-1]].extend(value)
+    return patch
+
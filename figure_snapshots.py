@@ -0,0 +1,96 @@
+"""Figures rendered ahead of time for the views every visitor starts from
+
+The map page in each metric / color-scale combination and the overview at
+"all states, full range" look the same for everyone. They are rendered once
+per dataset version, embedded into the page layouts so the first paint
+needs no callback round trip, and saved as figure JSON under
+SNAPSHOT_DIR keyed by a fingerprint of the data, of the code that draws
+them and of the settings it reads (such as the large-data threshold); later
+starts on the same data and settings load them instead of rendering.
+
+    python figure_snapshots.py
+
+renders them ahead of deployment (it imports the app, which builds and
+saves any snapshot that is missing or stale).
+"""
+
+import hashlib
+import json
+import os
+import sys
+
+import plotly
+
+from data_cache import CACHE_DIR
+
+SNAPSHOTS = os.environ.get('CRIME_DASHBOARD_SNAPSHOTS', '1') == '1'
+SNAPSHOT_DIR = os.path.join(CACHE_DIR, 'snapshots')
+KEEP_SNAPSHOTS = 2
+
+# Modules whose code shapes the snapshot figures; editing one invalidates them
+FIGURE_MODULES = ('crime_data', 'summary_engine', 'overview_stats', 'overview_figures', 'map_figures')
+
+
+def render_settings():
+    """{module.NAME: value} of the scalar settings of FIGURE_MODULES, environment knobs included"""
+    settings = {}
+    for name in FIGURE_MODULES:
+        for attribute, value in vars(sys.modules[name]).items():
+            if attribute.isupper() and isinstance(value, (bool, int, float, str)):
+                settings[f'{name}.{attribute}'] = value
+    return settings
+
+
+def snapshot_fingerprint(data_fingerprint, settings=None):
+    """Key of the snapshots for a dataset version, or None if the data has no stable version
+
+    settings adds the caller's own values that shape the figures to render_settings().
+    """
+    if data_fingerprint is None:
+        return None
+    digest = hashlib.sha256(f'{data_fingerprint}|plotly {plotly.__version__}'.encode())
+    for name in FIGURE_MODULES:
+        with open(sys.modules[name].__file__, 'rb') as f:
+            digest.update(f.read())
+    settings = {**render_settings(), **(settings or {})}
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:32]
+
+
+def load_snapshots(fingerprint, directory=SNAPSHOT_DIR):
+    """{name: [figure JSON, ...]} saved for fingerprint, or None"""
+    if fingerprint is None:
+        return None
+    try:
+        with open(os.path.join(directory, f'{fingerprint}.json')) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def save_snapshots(fingerprint, snapshots, directory=SNAPSHOT_DIR, keep=KEEP_SNAPSHOTS):
+    """Write snapshots atomically, keeping only the newest few fingerprints"""
+    if fingerprint is None:
+        return
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{fingerprint}.json')
+    tmp = f'{path}.tmp-{os.getpid()}'
+    with open(tmp, 'w') as f:
+        json.dump(snapshots, f)
+    os.replace(tmp, path)
+
+    saved = sorted(
+        (entry for entry in os.scandir(directory) if entry.name.endswith('.json')),
+        key=lambda entry: entry.stat().st_mtime, reverse=True
+    )
+    for entry in saved[keep:]:
+        os.unlink(entry.path)
+
+
+if __name__ == '__main__':
+    import crime_dashboard_with_map as app
+
+    fingerprint = app.snapshot_key
+    if fingerprint is None:
+        sys.exit("This data source has no stable version; snapshots are rendered at startup only")
+    print(f"Snapshots for {len(app.figure_snapshots)} views in {os.path.join(SNAPSHOT_DIR, fingerprint)}.json")
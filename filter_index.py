@@ -0,0 +1,109 @@
+"""Sorted row index for (state, crime range) filtering without scanning the frame"""
+
+import numpy as np
+
+
+class CrimeRangeIndex:
+    """Row positions sorted by crime rate, both overall and within each state
+
+    Built once at load time. A query is a dictionary lookup for the state
+    followed by two binary searches, and returns positional row indices that
+    can be fed straight to DataFrame.take().
+    """
+
+    def __init__(self, states, values):
+        states = np.asarray(states)
+        values = np.asarray(values, dtype=float)
+
+        # All states: one ordering by value
+        self.order = np.argsort(values, kind='stable')
+        self.sorted_values = values[self.order]
+
+        # Per state: ordered by state, then by value, so each state is a contiguous run
+        self.state_order = np.lexsort((values, states))
+        self.state_sorted_values = values[self.state_order]
+        run_states, run_starts = np.unique(states[self.state_order], return_index=True)
+        run_ends = np.append(run_starts[1:], len(values))
+        self.state_runs = {
+            state.item(): (start, end)
+            for state, start, end in zip(run_states, run_starts, run_ends)
+        }
+
+    # Everything besides state_runs, e.g. for saving and memory-mapping the index
+    ARRAYS = ('order', 'sorted_values', 'state_order', 'state_sorted_values')
+
+    @classmethod
+    def from_frame(cls, df, state_column='state', value_column='ViolentCrimesPerPop'):
+        return cls(df[state_column].to_numpy(), df[value_column].to_numpy())
+
+    @classmethod
+    def from_arrays(cls, arrays, state_runs):
+        """Rebuild an index from its ARRAYS (used as-is, without copying) and state_runs"""
+        index = cls.__new__(cls)
+        for name in cls.ARRAYS:
+            setattr(index, name, arrays[name])
+        index.state_runs = {int(state): (int(start), int(end)) for state, (start, end) in state_runs.items()}
+        return index
+
+    def __len__(self):
+        return len(self.order)
+
+    def extend(self, states, values):
+        """A new index that also covers rows appended after the indexed ones
+
+        The new rows are merged into the sorted arrays with binary searches,
+        O(n) copying instead of a full re-sort, and land after existing rows
+        of equal value exactly as a rebuild would place them.
+        """
+        states = np.asarray(states)
+        values = np.asarray(values, dtype=float)
+        positions = np.arange(len(self), len(self) + len(values))
+
+        batch = np.argsort(values, kind='stable')
+        at = np.searchsorted(self.sorted_values, values[batch], side='right')
+        arrays = {
+            'order': np.insert(self.order, at, positions[batch]),
+            'sorted_values': np.insert(self.sorted_values, at, values[batch]),
+        }
+
+        batch = np.lexsort((values, states))
+        at = np.empty(len(batch), dtype=np.intp)
+        counts = {state: end - start for state, (start, end) in self.state_runs.items()}
+        for state in np.unique(states):
+            state = state.item()
+            in_state = states[batch] == state
+            if state in self.state_runs:
+                start, end = self.state_runs[state]
+            else:
+                # A new state's run goes after every existing run of a smaller state
+                start = end = max((run[1] for other, run in self.state_runs.items() if other < state), default=0)
+            run_values = self.state_sorted_values[start:end]
+            at[in_state] = start + np.searchsorted(run_values, values[batch[in_state]], side='right')
+            counts[state] = counts.get(state, 0) + int(in_state.sum())
+        arrays['state_order'] = np.insert(self.state_order, at, positions[batch])
+        arrays['state_sorted_values'] = np.insert(self.state_sorted_values, at, values[batch])
+
+        state_runs, start = {}, 0
+        for state in sorted(counts):
+            state_runs[state] = (start, start + counts[state])
+            start += counts[state]
+        return CrimeRangeIndex.from_arrays(arrays, state_runs)
+
+    def query(self, state=None, low=-np.inf, high=np.inf, keep_order=True):
+        """Positions of rows in state (None for all) with low <= value <= high
+
+        With keep_order the positions come back in original row order, so
+        anything built from the filtered rows looks the same as with a mask.
+        """
+        if state is None:
+            order, values = self.order, self.sorted_values
+        elif state in self.state_runs:
+            start, end = self.state_runs[state]
+            order, values = self.state_order[start:end], self.state_sorted_values[start:end]
+        else:
+            return np.empty(0, dtype=np.intp)
+
+        lo = np.searchsorted(values, low, side='left')
+        hi = np.searchsorted(values, high, side='right')
+        positions = order[lo:hi]
+        return np.sort(positions) if keep_order else positions
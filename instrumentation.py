@@ -0,0 +1,262 @@
+"""Hot-path instrumentation for the dashboard callbacks
+
+Callbacks wrapped with instrument() record their total duration, and code
+inside them marks its stages (filter, aggregate, figures, serialize, ...)
+with stage(). Dash's own work after a callback returns - encoding the
+response - is measured per request from the Flask hooks installed by
+install_metrics(), together with the response size. Everything goes into
+histograms served in the Prometheus text format at /metrics.
+
+Setting CRIME_DASHBOARD_PROFILE_SLOW_MS turns on a sampling profiler for
+instrumented callbacks: the stacks of a callback that runs longer than the
+threshold are written in folded format (one "frame;frame;frame count" line
+per stack, as read by flamegraph.pl and speedscope) to
+CRIME_DASHBOARD_PROFILE_DIR.
+
+Metrics are per process; stages of work sent to a process pool are only
+visible as their total in the submitting process.
+"""
+
+import bisect
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+
+import flask
+
+PROFILE_SLOW_MS = float(os.environ.get('CRIME_DASHBOARD_PROFILE_SLOW_MS', 0))
+PROFILE_DIR = os.environ.get('CRIME_DASHBOARD_PROFILE_DIR', os.path.join('.cache', 'profiles'))
+PROFILE_INTERVAL = 0.005
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BYTES_BUCKETS = tuple(10 ** exponent for exponent in range(2, 9))
+ROWS_BUCKETS = tuple(10 ** exponent for exponent in range(0, 8))
+
+# Name of the instrumented callback the current thread (or job) is running
+_current_callback = contextvars.ContextVar('current_callback', default=None)
+
+
+class Histogram:
+    """Cumulative-bucket histogram with a running sum, as Prometheus expects"""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets + (float('inf'),), self.counts):
+            total += count
+            yield bound, total
+
+
+class MetricsRegistry:
+    """Histograms keyed by metric name and label values, plus gauge collectors"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._collectors = []
+
+    def define(self, name, help_text, buckets):
+        with self._lock:
+            self._metrics.setdefault(name, (help_text, buckets, {}))
+
+    def observe(self, name, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            _, buckets, series = self._metrics[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def add_collector(self, collect):
+        """collect() returns (name, help, {labels tuple: value}) gauges read at scrape time"""
+        self._collectors.append(collect)
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, (help_text, _, series) in sorted(self._metrics.items()):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for key, histogram in sorted(series.items()):
+                    for bound, total in histogram.cumulative():
+                        le = '+Inf' if bound == float('inf') else repr(float(bound))
+                        lines.append(f'{name}_bucket{_labels(key + (("le", le),))} {total}')
+                    lines.append(f'{name}_sum{_labels(key)} {histogram.sum!r}')
+                    lines.append(f'{name}_count{_labels(key)} {histogram.count}')
+        for collect in self._collectors:
+            for name, help_text, values in collect():
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} gauge']
+                lines += [f'{name}{_labels(key)} {value!r}' for key, value in sorted(values.items())]
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(items):
+    if not items:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in items)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(items, escaped)) + '}'
+
+
+REGISTRY = MetricsRegistry()
+REGISTRY.define('crime_dashboard_callback_seconds', 'Time spent inside a Dash callback', SECONDS_BUCKETS)
+REGISTRY.define('crime_dashboard_stage_seconds', 'Time spent in one stage of a callback', SECONDS_BUCKETS)
+REGISTRY.define('crime_dashboard_request_seconds', 'Time to answer a callback request, including response encoding', SECONDS_BUCKETS)
+REGISTRY.define('crime_dashboard_response_bytes', 'Size of a callback response body', BYTES_BUCKETS)
+REGISTRY.define('crime_dashboard_filtered_rows', 'Communities left after filtering', ROWS_BUCKETS)
+
+
+@contextmanager
+def stage(name):
+    """Time the enclosed block as a stage of the running instrumented callback"""
+    callback_name = _current_callback.get()
+    if callback_name is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        REGISTRY.observe('crime_dashboard_stage_seconds', time.perf_counter() - start,
+                         callback=callback_name, stage=name)
+
+
+def observe_rows(count):
+    """Record how many rows the running callback filtered down to"""
+    callback_name = _current_callback.get()
+    if callback_name is not None:
+        REGISTRY.observe('crime_dashboard_filtered_rows', count, callback=callback_name)
+
+
+def instrument(fn):
+    """Record the duration of a callback (and profile it when enabled)"""
+    name = fn.__name__
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _current_callback.set(name)
+        if flask.has_request_context():
+            flask.g.callback_name = name
+        sampling = PROFILER.start() if PROFILE_SLOW_MS > 0 else None
+        start = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            _current_callback.reset(token)
+            REGISTRY.observe('crime_dashboard_callback_seconds', elapsed, callback=name)
+            if sampling is not None:
+                stacks = PROFILER.stop(sampling)
+                if elapsed * 1000 >= PROFILE_SLOW_MS:
+                    dump_folded_stacks(stacks, name, elapsed)
+
+    return wrapper
+
+
+def callback_label(output, callback_map):
+    """Name of the function registered for a callback request's output id, else the id itself"""
+    fn = (callback_map or {}).get(output, {}).get('callback')
+    return getattr(fn, '__name__', None) or output or 'unknown'
+
+
+def install_metrics(server, path='/metrics', callback_map=None):
+    """Time callback requests on a Flask server and serve the metrics at path
+
+    Requests are labelled with the callback they ran; those that did not run an
+    instrumented one (a background callback's polls, uninstrumented callbacks)
+    with the function callback_map - the Dash app's - registers for their output.
+    """
+
+    @server.before_request
+    def start_request_timer():
+        flask.g.request_start = time.perf_counter()
+
+    @server.after_request
+    def record_callback_request(response):
+        if flask.request.path.endswith('/_dash-update-component') and 'request_start' in flask.g:
+            name = flask.g.get('callback_name')
+            if name is None:
+                body = flask.request.get_json(silent=True) or {}
+                name = callback_label(body.get('output'), callback_map)
+            REGISTRY.observe('crime_dashboard_request_seconds',
+                             time.perf_counter() - flask.g.request_start, callback=name)
+            if not response.direct_passthrough:
+                REGISTRY.observe('crime_dashboard_response_bytes', response.calculate_content_length() or 0,
+                                 callback=name)
+        return response
+
+    @server.route(path)
+    def metrics():
+        return flask.Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+
+class SamplingProfiler:
+    """Samples the stacks of registered threads from one background thread"""
+
+    def __init__(self, interval=PROFILE_INTERVAL):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}
+        self._thread = None
+
+    def start(self):
+        """Begin sampling the calling thread; returns a handle for stop()"""
+        handle = (threading.get_ident(), object())
+        with self._lock:
+            self._active[handle] = Counter()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+                self._thread.start()
+        return handle
+
+    def stop(self, handle):
+        """Folded stack counts collected since start()"""
+        with self._lock:
+            return self._active.pop(handle)
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                for (thread_id, _), stacks in self._active.items():
+                    frame = frames.get(thread_id)
+                    if frame is not None:
+                        stacks[_fold(frame)] += 1
+
+
+def _fold(frame):
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})')
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def dump_folded_stacks(stacks, name, elapsed, directory=PROFILE_DIR):
+    """Write sampled stacks of a slow callback; returns the file path"""
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f'{name}-{time.strftime("%Y%m%d-%H%M%S")}-{int(elapsed * 1000)}ms.folded')
+    with open(path, 'w') as f:
+        for stack, count in stacks.most_common():
+            f.write(f'{stack} {count}\n')
+    return path
+
+
+PROFILER = SamplingProfiler()
@@ -0,0 +1,265 @@
+"""Local job queue that runs heavy Dash callbacks off the request threads
+
+ExecutorCallbackManager is a Dash background-callback manager backed by a
+thread pool in the server process: the request that triggers a heavy callback
+only enqueues a job and returns, and the browser polls for the result. When
+an input changes again while a job is queued or running, Dash asks the
+manager to terminate the superseded job; queued jobs are dropped outright and
+running ones have their result discarded.
+
+The CPU-bound part of a job can additionally be sent to a compute pool
+(threads or processes, see make_compute_executor) with submit_compute(), so
+figure construction is not serialized behind the GIL; terminating the job
+also cancels that work if it has not started.
+
+Results live in this process's memory, so run the server with a single
+worker process (threads are fine) when background callbacks are enabled.
+Results nobody collects (the page was closed) expire after RESULT_TTL
+seconds, and at most MAX_STORED_RESULTS are kept.
+"""
+
+import contextvars
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextvars import copy_context
+
+from dash._callback_context import context_value
+from dash._utils import AttributeDict
+from dash.background_callback._proxy_set_props import ProxySetProps
+from dash.background_callback.managers import BaseBackgroundCallbackManager
+from dash.exceptions import PreventUpdate
+
+# 'off' runs callbacks synchronously as before; 'thread' or 'process' selects the compute pool
+EXECUTOR_MODE = os.environ.get('CRIME_DASHBOARD_EXECUTOR', 'off')
+EXECUTOR_WORKERS = int(os.environ.get('CRIME_DASHBOARD_EXECUTOR_WORKERS', os.cpu_count() or 2))
+# Seconds an uncollected job result, progress or set_props update is kept, and how many at most
+RESULT_TTL = float(os.environ.get('CRIME_DASHBOARD_JOB_RESULT_TTL', 300))
+MAX_STORED_RESULTS = 1000
+
+# Modules compute workers import once in the forkserver, before any worker is forked
+WORKER_PRELOAD = ['overview_figures']
+
+# (manager, job) of the background job running in this context, for submit_compute()
+_current_job = contextvars.ContextVar('current_job', default=None)
+
+
+def make_compute_executor(mode=EXECUTOR_MODE, workers=EXECUTOR_WORKERS):
+    """Pool for CPU-bound work, or None when background callbacks are off
+
+    Process workers are forked from a forkserver, a fresh single-threaded
+    process, never from the server with its request, ingest and profiler
+    threads. They hold no dataset: tasks carry the rows they work on, so the
+    pool stays valid when the data changes. Submitted functions must be
+    module-level.
+    """
+    if mode == 'thread':
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix='compute')
+    if mode == 'process':
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(WORKER_PRELOAD)
+        return ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    if mode == 'off':
+        return None
+    raise ValueError(f"Unknown CRIME_DASHBOARD_EXECUTOR mode: {mode}")
+
+
+def submit_compute(executor, fn, *args):
+    """executor.submit(fn, *args), cancelled along with the background job submitting it"""
+    future = executor.submit(fn, *args)
+    running = _current_job.get()
+    if running is not None:
+        manager, job = running
+        manager._attach(job, future)
+    return future
+
+
+class ExecutorCallbackManager(BaseBackgroundCallbackManager):
+    """Dash background-callback manager running jobs on an in-process thread pool"""
+
+    def __init__(self, workers=EXECUTOR_WORKERS, cache_by=None):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='callback-job')
+        self._lock = threading.Lock()
+        self._job_ids = itertools.count(1)
+        self._jobs = {}
+        self._job_keys = {}
+        # Compute-pool futures submitted by each running job
+        self._compute = {}
+        self._cancelled = set()
+        self._results = {}
+        self._progress = {}
+        self._updated_props = {}
+        # Insertion order of every stored entry, oldest first: (mapping, key) -> time stored
+        self._stored = {}
+        self._signing_secret = None
+        super().__init__(cache_by)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'queued_or_running': sum(not future.done() for future in self._jobs.values()),
+                'cancelled': len(self._cancelled),
+                'results_waiting': len(self._results),
+            }
+
+    # Job lifecycle
+
+    def call_job_fn(self, key, job_fn, args, context):
+        job = next(self._job_ids)
+        future = self.executor.submit(job_fn, key, self._make_progress_key(key), args, context, job)
+        with self._lock:
+            self._jobs[job] = future
+            self._job_keys[job] = key
+            self._expire()
+        future.add_done_callback(lambda _: self._forget(job))
+        return job
+
+    def _forget(self, job):
+        with self._lock:
+            self._jobs.pop(job, None)
+            self._compute.pop(job, None)
+            if job in self._cancelled:
+                self._cancelled.discard(job)
+                self._job_keys.pop(job, None)
+
+    def _attach(self, job, future):
+        with self._lock:
+            if job in self._cancelled:
+                future.cancel()
+            elif job in self._jobs:
+                self._compute.setdefault(job, []).append(future)
+
+    def is_cancelled(self, job):
+        with self._lock:
+            return job in self._cancelled
+
+    def terminate_job(self, job):
+        if job is None:
+            return
+        job = int(job)
+        with self._lock:
+            future = self._jobs.get(job)
+            if future is None:
+                return
+            # A queued job never starts; a running one finishes but its result is dropped,
+            # and its compute work is dropped too unless a worker already took it
+            self._cancelled.add(job)
+            compute = self._compute.pop(job, [])
+        future.cancel()
+        for compute_future in compute:
+            compute_future.cancel()
+
+    def terminate_unhealthy_job(self, job):
+        return False
+
+    def job_running(self, job):
+        job = int(job)
+        with self._lock:
+            if job in self._cancelled:
+                return False
+            future = self._jobs.get(job)
+            # A finished job whose result has not been collected yet still counts,
+            # so a poll racing with completion does not drop the result
+            return (future is not None and not future.done()) or self._job_keys.get(job) in self._results
+
+    # Results, progress and set_props, keyed like the diskcache manager
+
+    def _store(self, mapping, key, value, job=None):
+        with self._lock:
+            if job is None or job not in self._cancelled:
+                mapping[key] = value
+                self._stored.pop((id(mapping), key), None)
+                self._stored[(id(mapping), key)] = (mapping, time.monotonic())
+                self._expire()
+
+    def _expire(self):
+        """Drop stored entries older than RESULT_TTL, and the oldest beyond MAX_STORED_RESULTS"""
+        deadline = time.monotonic() - RESULT_TTL
+        while self._stored:
+            entry = next(iter(self._stored))
+            mapping, stored_at = self._stored[entry]
+            if stored_at >= deadline and len(self._stored) <= MAX_STORED_RESULTS:
+                break
+            del self._stored[entry]
+            mapping.pop(entry[1], None)
+        # Finished jobs whose result expired uncollected
+        for job in [job for job, key in self._job_keys.items() if job not in self._jobs and key not in self._results]:
+            del self._job_keys[job]
+
+    def _take(self, mapping, key, default):
+        """Remove and return a stored entry; call with the lock held"""
+        self._stored.pop((id(mapping), key), None)
+        return mapping.pop(key, default)
+
+    def get_progress(self, key):
+        with self._lock:
+            return self._take(self._progress, self._make_progress_key(key), None)
+
+    def result_ready(self, key):
+        with self._lock:
+            return key in self._results
+
+    def get_result(self, key, job):
+        with self._lock:
+            result = self._take(self._results, key, self.UNDEFINED)
+            self._take(self._progress, self._make_progress_key(key), None)
+            if result is not self.UNDEFINED and job:
+                self._job_keys.pop(int(job), None)
+        return result
+
+    def get_updated_props(self, key):
+        with self._lock:
+            return self._take(self._updated_props, self._make_set_props_key(key), {})
+
+    def clear_cache_entry(self, key):
+        with self._lock:
+            self._take(self._results, key, None)
+
+    def get_or_create_signing_secret(self, generate):
+        with self._lock:
+            if self._signing_secret is None:
+                self._signing_secret = generate()
+            return self._signing_secret
+
+    def make_job_fn(self, fn, progress, key=None):
+        manager = self
+
+        def job_fn(result_key, progress_key, user_callback_args, context, job):
+            if manager.is_cancelled(job):
+                return
+
+            def set_progress(value):
+                if not isinstance(value, (list, tuple)):
+                    value = [value]
+                manager._store(manager._progress, progress_key, value, job)
+
+            def set_props(_id, props):
+                manager._store(manager._updated_props, manager._make_set_props_key(result_key), {_id: props}, job)
+
+            def run():
+                _current_job.set((manager, job))
+                c = AttributeDict(**context)
+                c.ignore_register_page = False
+                c.updated_props = ProxySetProps(set_props)
+                context_value.set(c)
+                maybe_progress = [set_progress] if progress else []
+                try:
+                    if isinstance(user_callback_args, dict):
+                        output = fn(*maybe_progress, **user_callback_args)
+                    elif isinstance(user_callback_args, (list, tuple)):
+                        output = fn(*maybe_progress, *user_callback_args)
+                    else:
+                        output = fn(*maybe_progress, user_callback_args)
+                except PreventUpdate:
+                    output = {'_dash_no_update': '_dash_no_update'}
+                except Exception as err:  # pylint: disable=broad-except
+                    output = {'background_callback_error': {'msg': str(err), 'tb': traceback.format_exc()}}
+                manager._store(manager._results, result_key, output, job)
+
+            copy_context().run(run)
+
+        return job_fn
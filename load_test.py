@@ -0,0 +1,190 @@
+"""Load test of the dashboard's callback endpoint under concurrent users
+
+Each simulated user keeps one HTTP connection open and, as fast as the
+server answers, fires the callbacks a visitor triggers: overview updates
+for a random state and crime range (mostly figure cache misses) and map
+updates (cache hits). Throughput, latency percentiles and the requests the
+server turned away with 503 are reported per run.
+
+Against a running server:
+
+    python load_test.py --url http://localhost:8050 --users 32 --duration 20
+
+Or start each server in turn and compare them, by default the development
+server (python crime_dashboard_with_map.py) and the admission-controlled
+one (python asgi_server.py):
+
+    python load_test.py --compare
+
+Both run the same threaded app, so expect similar throughput; the
+difference shows past saturation, in the tail latency of the development
+server against the bounded latency and shed requests of asgi_server.py.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import signal
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+
+from crime_data import STATE_FIPS_MAPPING
+
+DEFAULT_URL = 'http://127.0.0.1:8050'
+SERVERS = {
+    'dev': [sys.executable, 'crime_dashboard_with_map.py'],
+    'asgi': [sys.executable, 'asgi_server.py', '127.0.0.1', '8050'],
+}
+# Share of requests that are overview updates; the rest are map updates
+OVERVIEW_SHARE = 0.7
+SLIDER_STEP = 0.01
+
+OVERVIEW_IDS = ['crime-scatter-plot', 'crime-histogram', 'state-boxplot', 'correlation-heatmap']
+MAP_IDS = ['us-map', 'state-ranking-bar']
+MAP_METRICS = ['crime_rate_mean', 'crime_rate_median', 'num_communities']
+COLOR_SCALES = ['Reds', 'Blues', 'Viridis', 'Plasma']
+
+
+def callback_body(output_ids, inputs):
+    """Request body of a Dash callback returning the figures of output_ids"""
+    return {
+        'output': '..' + '...'.join(f'{graph_id}.figure' for graph_id in output_ids) + '..',
+        'outputs': [{'id': graph_id, 'property': 'figure'} for graph_id in output_ids],
+        'inputs': [{'id': component, 'property': prop, 'value': value} for component, prop, value in inputs],
+        'changedPropIds': [f'{inputs[0][0]}.{inputs[0][1]}'],
+        'state': [],
+    }
+
+
+def random_request(rng):
+    """(label, body) of a random overview or map update"""
+    if rng.random() < OVERVIEW_SHARE:
+        state = rng.choice(['all'] + list(STATE_FIPS_MAPPING))
+        low, high = sorted(round(rng.randrange(101) * SLIDER_STEP, 2) for _ in range(2))
+        return 'overview', callback_body(OVERVIEW_IDS, [
+            ('state-dropdown', 'value', state),
+            ('crime-range-slider', 'value', [low, high]),
+            ('dataset-version', 'data', 0),
+        ])
+    return 'map', callback_body(MAP_IDS, [
+        ('map-metric-dropdown', 'value', rng.choice(MAP_METRICS)),
+        ('color-scale-dropdown', 'value', rng.choice(COLOR_SCALES)),
+        ('dataset-version', 'data', 0),
+    ])
+
+
+def simulate_user(url, deadline, seed, results):
+    rng = random.Random(seed)
+    parts = urllib.parse.urlsplit(url)
+    conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+    path = parts.path.rstrip('/') + '/_dash-update-component'
+    while time.monotonic() < deadline:
+        label, body = random_request(rng)
+        start = time.perf_counter()
+        try:
+            conn.request('POST', path, json.dumps(body), {
+                'Content-Type': 'application/json', 'Accept-Encoding': 'gzip'
+            })
+            response = conn.getresponse()
+            response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            status = None
+            conn.close()
+            conn = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=60)
+        results.append((label, status, time.perf_counter() - start))
+    conn.close()
+
+
+def run_load(url, users, duration, seed=0):
+    """Drive url with users concurrent users for duration seconds; returns the summary"""
+    results = []
+    deadline = time.monotonic() + duration
+    threads = [
+        threading.Thread(target=simulate_user, args=(url, deadline, seed + i, results), daemon=True)
+        for i in range(users)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(results, time.perf_counter() - start)
+
+
+def summarize(results, elapsed):
+    ok = sorted(seconds for _, status, seconds in results if status in (200, 204))
+    def percentile(q):
+        return round(ok[min(len(ok) - 1, int(q * len(ok)))] * 1000, 1) if ok else None
+    return {
+        'requests': len(results),
+        'ok': len(ok),
+        'shed': sum(status == 503 for _, status, _ in results),
+        'errors': sum(status not in (200, 204, 503) for _, status, _ in results),
+        'throughput': round(len(ok) / elapsed, 1),
+        'mean_ms': round(statistics.mean(ok) * 1000, 1) if ok else None,
+        'p50_ms': percentile(0.5),
+        'p95_ms': percentile(0.95),
+        'p99_ms': percentile(0.99),
+    }
+
+
+def wait_until_up(url, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise TimeoutError(f"Server at {url} did not come up within {timeout} s")
+
+
+def serve_and_load(command, url, users, duration, warmup, log=print):
+    """Start a server with command, load it once warm, and stop it"""
+    server = subprocess.Popen(command, start_new_session=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up(url)
+        if warmup:
+            run_load(url, users, warmup)
+        return run_load(url, users, duration)
+    finally:
+        # The development server's reloader runs the app in a child process
+        os.killpg(server.pid, signal.SIGTERM)
+        server.wait()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', default=DEFAULT_URL)
+    parser.add_argument('--users', type=int, default=32, help='concurrent simulated users')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load per run')
+    parser.add_argument('--warmup', type=float, default=5, help='seconds of unmeasured load after a server starts')
+    parser.add_argument('--compare', nargs='*', choices=list(SERVERS),
+                        help='start these servers in turn and load each (default: all)')
+    args = parser.parse_args(argv)
+
+    if args.compare is None:
+        runs = {args.url: run_load(args.url, args.users, args.duration)}
+    else:
+        runs = {}
+        for name in args.compare or list(SERVERS):
+            print(f"Loading the {name} server ({' '.join(SERVERS[name][1:])})...", file=sys.stderr)
+            runs[name] = serve_and_load(SERVERS[name], args.url, args.users, args.duration, args.warmup)
+
+    print(f"{'server':<24} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'shed':>6} {'errors':>6}")
+    for name, summary in runs.items():
+        print(f"{name:<24} {summary['throughput']:>8} {summary['p50_ms']!s:>8} {summary['p95_ms']!s:>8} "
+              f"{summary['p99_ms']!s:>8} {summary['shed']:>6} {summary['errors']:>6}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
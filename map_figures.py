@@ -0,0 +1,88 @@
+"""Figure builders for the US map page"""
+
+import plotly.graph_objects as go
+
+
+def build_map_figures(state_summary, selected_metric, color_scale):
+    """Choropleth and top-15 ranking of a state summary by one metric"""
+    # plotly.express takes a while to import; with saved snapshots no map figure is built at startup
+    import plotly.express as px
+
+    # Create choropleth map
+    map_fig = px.choropleth(
+        state_summary.dropna(subset=['state_abbr']),
+        locations='state_abbr',
+        color=selected_metric,
+        locationmode='USA-states',
+        color_continuous_scale=color_scale,
+        scope='usa',
+        title=f'US States by {selected_metric.replace("_", " ").title()}',
+        hover_data={
+            'crime_rate_mean': ':.4f',
+            'num_communities': True,
+            'avg_income': ':.4f',
+            'avg_poverty_rate': ':.4f'
+        },
+        labels={
+            'crime_rate_mean': 'Avg Crime Rate',
+            'crime_rate_median': 'Median Crime Rate',
+            'num_communities': 'Communities',
+            'state_abbr': 'State'
+        }
+    )
+    map_fig.update_layout(height=600)
+
+    # Create ranking bar chart
+    top_states = state_summary.dropna(subset=['state_abbr']).nlargest(15, selected_metric)
+
+    bar_fig = px.bar(
+        top_states,
+        x='state_abbr',
+        y=selected_metric,
+        title=f'Top 15 States by {selected_metric.replace("_", " ").title()}',
+        labels={
+            'state_abbr': 'State',
+            selected_metric: selected_metric.replace("_", " ").title()
+        },
+        color=selected_metric,
+        color_continuous_scale=color_scale
+    )
+    bar_fig.update_layout(height=400)
+
+    return map_fig, bar_fig
+
+
+def build_county_figure(county_summary, counties, selected_metric, color_scale, state_abbr=None, uirevision=None):
+    """County choropleth of a county summary over a FeatureCollection keyed by FIPS code"""
+    metric_title = selected_metric.replace("_", " ").title()
+    county_fig = go.Figure(go.Choropleth(
+        geojson=counties,
+        locations=county_summary['fips'],
+        z=county_summary[selected_metric],
+        featureidkey='id',
+        customdata=county_summary[['state_abbr', 'num_communities']],
+        colorscale=color_scale,
+        colorbar={'title': {'text': metric_title}},
+        marker={'line': {'width': 0.3, 'color': 'white'}},
+        hovertemplate=f'County %{{location}} (%{{customdata[0]}})<br>{metric_title}: %{{z}}'
+                      '<br>Communities: %{customdata[1]}<extra></extra>'
+    ))
+    county_fig.update_geos(scope='usa', fitbounds='locations' if state_abbr else False)
+    county_fig.update_layout(
+        title=f'{state_abbr + " " if state_abbr else ""}Counties by {metric_title}',
+        uirevision=uirevision,
+        height=600
+    )
+    return county_fig
+
+
+def build_notice_figure(message):
+    """Empty figure carrying a message in place of the plot"""
+    notice_fig = go.Figure()
+    notice_fig.update_layout(
+        xaxis={'visible': False},
+        yaxis={'visible': False},
+        annotations=[{'text': message, 'showarrow': False, 'font': {'size': 14}}],
+        height=300
+    )
+    return notice_fig
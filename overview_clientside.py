@@ -0,0 +1,101 @@
+"""Data shipped to the browser for clientside filtering of the overview page
+
+With CRIME_DASHBOARD_CLIENTSIDE=1 the server sends the columns the scatter
+plot, histogram and box plot read once per state selection, as base64
+typed arrays, and assets/overview_clientside.js filters them and redraws
+those three figures on every slider movement without a server round trip.
+Only the correlation heatmap is still computed on the server.
+
+Every row of the selected state is shipped, so the mode suits datasets of
+up to around a hundred thousand communities; above LARGE_DATA_THRESHOLD
+rows the browser draws the scatter plot with WebGL instead of the
+server-side density view.
+"""
+
+import base64
+import functools
+import json
+import os
+
+import numpy as np
+import pandas as pd
+from plotly.colors import qualitative
+
+from compact_frame import CompactColumn
+from overview_figures import (
+    LARGE_DATA_THRESHOLD, SIZE_MAX, build_box_figure, build_histogram_figure, build_scatter_figure
+)
+from overview_stats import BOXPLOT_STATES, HISTOGRAM_BINS, OVERVIEW_COLUMNS, OverviewFrame
+
+CLIENTSIDE_FILTERING = os.environ.get('CRIME_DASHBOARD_CLIENTSIDE', '0') == '1'
+
+# Columns the clientside figures read
+CLIENT_COLUMNS = ['ViolentCrimesPerPop', 'population', 'medIncome', 'pctUrban', 'PctPopUnderPov']
+
+
+def encode_typed_array(values):
+    """A numeric array as a base64 little-endian typed array, fixed-point when exact
+
+    The browser decodes {dtype, data, scale, missing} back to floats, with
+    missing codes as NaN.
+    """
+    column = CompactColumn.encode(values)
+    codes = column.codes.astype(column.codes.dtype.newbyteorder('<'))
+    return {
+        'dtype': codes.dtype.name,
+        'data': base64.b64encode(codes.tobytes()).decode('ascii'),
+        'scale': column.scale,
+        'missing': None if column.missing is None else int(column.missing),
+    }
+
+
+def build_overview_payload(frame, slider_step, uirevision=None):
+    """Everything the clientside overview callback needs for one state selection"""
+    label_codes, label_names = pd.factorize(frame.labels, sort=False)
+    return {
+        'rows': len(frame),
+        'columns': {name: encode_typed_array(frame.column(name)) for name in CLIENT_COLUMNS},
+        'labels': encode_typed_array(label_codes.astype(np.int16)),
+        'label_names': [str(label) for label in label_names],
+        'names': [str(name) for name in frame.names],
+        'slider_step': slider_step,
+        'uirevision': uirevision,
+    }
+
+
+@functools.lru_cache(maxsize=None)
+def figure_templates():
+    """Layouts and trace styling of the server-built figures, for the browser to fill in
+
+    Sent once with the page layout rather than with every payload.
+    """
+    one_row = OverviewFrame(
+        np.zeros((1, len(OVERVIEW_COLUMNS))), np.array(['XX'], dtype=object), np.array([''], dtype=object)
+    )
+    scatter = json.loads(build_scatter_figure(one_row).to_json())
+    edges = np.linspace(0, 1, HISTOGRAM_BINS + 1)
+    histogram = json.loads(build_histogram_figure((np.zeros(HISTOGRAM_BINS), edges)).to_json())
+    box = json.loads(build_box_figure({
+        'labels': ['XX'], 'q1': [0], 'median': [0], 'q3': [0], 'lowerfence': [0], 'upperfence': [0],
+        'outliers': [np.array([1.0])]
+    }).to_json())
+    return {
+        'scatter': {'layout': scatter['layout'], 'trace': _strip(scatter['data'][0])},
+        'histogram': {'layout': histogram['layout'], 'trace': _strip(histogram['data'][0])},
+        'box': {'layout': box['layout'], 'trace': _strip(box['data'][0]), 'outliers': _strip(box['data'][1])},
+        'colors': qualitative.Plotly,
+        'size_max': SIZE_MAX,
+        'histogram_bins': HISTOGRAM_BINS,
+        'box_states': BOXPLOT_STATES,
+        'webgl_threshold': LARGE_DATA_THRESHOLD,
+    }
+
+
+def _strip(trace):
+    """A trace without its data, keeping only the styling"""
+    data_keys = {'x', 'y', 'customdata', 'name', 'legendgroup', 'meta', 'width',
+                 'q1', 'median', 'q3', 'lowerfence', 'upperfence'}
+    trace = {key: value for key, value in trace.items() if key not in data_keys}
+    if 'marker' in trace:
+        trace['marker'] = {key: value for key, value in trace['marker'].items() if key not in ('size', 'sizeref')}
+    return trace
@@ -0,0 +1,248 @@
+"""Figure builders for the overview page"""
+
+import os
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.colors import qualitative
+
+from figure_cache import serialize_figures
+from overview_stats import CORR_COLUMNS, compute_overview_stats, group_by_label
+
+# Above this many filtered communities the scatter plot is aggregated server-side
+LARGE_DATA_THRESHOLD = int(os.environ.get('CRIME_DASHBOARD_LARGE_DATA_THRESHOLD', 20000))
+
+# Raster resolution (per axis) of the aggregated scatter plot
+DENSITY_BINS = 200
+
+# Same marker scaling plotly express applies with size_max=20
+SIZE_MAX = 20
+
+SCATTER_TITLE = 'Crime Rate vs Population (sized by median income)'
+SCATTER_LABELS = {
+    'population': 'Population (normalized)',
+    'ViolentCrimesPerPop': 'Violent Crimes Per Capita',
+    'state_abbr': 'State'
+}
+SCATTER_HOVERTEMPLATE = (
+    'State=%{meta}<br>Population (normalized)=%{x}<br>Violent Crimes Per Capita=%{y}'
+    '<br>medIncome=%{marker.size}<br>communityname=%{customdata[0]}'
+    '<br>pctUrban=%{customdata[1]}<br>PctPopUnderPov=%{customdata[2]}<extra></extra>'
+)
+BOX_COLOR = qualitative.Plotly[0]
+
+
+def build_overview_figures(frame, stats, uirevision=None):
+    """The four overview figures from an OverviewFrame and its compute_overview_stats()"""
+    return (
+        build_scatter_figure(frame, stats['groups'], uirevision=uirevision),
+        build_histogram_figure(stats['histogram']),
+        build_box_figure(stats['boxes']),
+        build_heatmap_figure(stats['corr'])
+    )
+
+
+def build_overview_json(frame, uirevision=None):
+    """Serialized overview figures of an OverviewFrame; the compute pool's entry point
+
+    Workers get the filtered rows with the task, so they need no dataset of their own.
+    """
+    return serialize_figures(build_overview_figures(frame, compute_overview_stats(frame), uirevision))
+
+
+def parse_viewport(relayout_data):
+    """Axis ranges from a graph's relayoutData
+
+    Returns (x0, x1, y0, y1) for a zoom or pan, 'reset' when the user
+    autoscales, and None when the event does not change the axes. A missing
+    axis range is returned as None in its slots.
+    """
+    if not relayout_data:
+        return None
+    if relayout_data.get('xaxis.autorange') or relayout_data.get('yaxis.autorange'):
+        return 'reset'
+
+    ranges = []
+    for axis in ('xaxis', 'yaxis'):
+        if f'{axis}.range[0]' in relayout_data:
+            ranges += [relayout_data[f'{axis}.range[0]'], relayout_data[f'{axis}.range[1]']]
+        elif f'{axis}.range' in relayout_data:
+            ranges += list(relayout_data[f'{axis}.range'])
+        else:
+            ranges += [None, None]
+    if all(value is None for value in ranges):
+        return None
+    return tuple(ranges)
+
+
+def build_scatter_figure(frame, groups=None, viewport=None, uirevision=None, threshold=LARGE_DATA_THRESHOLD):
+    """Crime rate vs population scatter, switching to a large-data mode above threshold
+
+    Up to threshold rows every community is drawn as an SVG marker, as
+    before. Above it the plot becomes a density raster of the visible
+    region, and once the user zooms in far enough that at most threshold
+    communities are visible those are sent at full resolution as WebGL
+    markers.
+    """
+    if len(frame) <= threshold:
+        return _point_scatter(frame, groups)
+
+    x = frame.column('population')
+    y = frame.column('ViolentCrimesPerPop')
+    x0, x1, y0, y1 = _viewport_bounds(viewport, x, y)
+
+    visible = (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+    if viewport is not None and visible.sum() <= threshold:
+        fig = _point_scatter(frame.take(np.flatnonzero(visible)), trace_type=go.Scattergl)
+    else:
+        fig = _density_scatter(x[visible], y[visible], (x0, x1), (y0, y1))
+
+    # Keep the user's zoom when the zoomed figure replaces the density view
+    fig.update_layout(uirevision=uirevision)
+    if viewport is not None:
+        fig.update_xaxes(range=[x0, x1])
+        fig.update_yaxes(range=[y0, y1])
+    return fig
+
+
+def _viewport_bounds(viewport, x, y):
+    """Fill unzoomed axes of a viewport with the data extent"""
+    full = (np.nanmin(x), np.nanmax(x), np.nanmin(y), np.nanmax(y))
+    if viewport is None:
+        return full
+    return tuple(full[i] if value is None else value for i, value in enumerate(viewport))
+
+
+def _point_scatter(frame, groups=None, trace_type=go.Scatter):
+    """One marker per community, one trace per state, styled like px.scatter"""
+    if groups is None:
+        groups, _ = group_by_label(frame.labels)
+
+    size = frame.column('medIncome')
+    sizeref = 2.0 * np.nanmax(size) / SIZE_MAX ** 2 if len(size) else 1
+    colors = qualitative.Plotly
+
+    traces = []
+    for i, (label, positions) in enumerate(groups):
+        customdata = np.column_stack([
+            frame.names[positions],
+            frame.column('pctUrban')[positions],
+            frame.column('PctPopUnderPov')[positions]
+        ])
+        traces.append(trace_type(
+            x=frame.column('population')[positions],
+            y=frame.column('ViolentCrimesPerPop')[positions],
+            customdata=customdata,
+            name=label,
+            legendgroup=label,
+            meta=label,
+            mode='markers',
+            marker={
+                'color': colors[i % len(colors)],
+                'size': size[positions],
+                'sizemode': 'area',
+                'sizeref': sizeref,
+                'symbol': 'circle'
+            },
+            hovertemplate=SCATTER_HOVERTEMPLATE
+        ))
+
+    scatter_fig = go.Figure(traces)
+    scatter_fig.update_layout(
+        title=SCATTER_TITLE,
+        xaxis_title=SCATTER_LABELS['population'],
+        yaxis_title=SCATTER_LABELS['ViolentCrimesPerPop'],
+        legend={'title': {'text': SCATTER_LABELS['state_abbr']}, 'itemsizing': 'constant'},
+        height=500
+    )
+    return scatter_fig
+
+
+def _density_scatter(x, y, x_range, y_range):
+    counts, x_edges, y_edges = np.histogram2d(x, y, bins=DENSITY_BINS, range=[x_range, y_range])
+    # Empty cells stay transparent so the raster reads like a point cloud
+    z = np.where(counts > 0, counts, np.nan).T
+
+    density_fig = go.Figure(go.Heatmap(
+        x=(x_edges[:-1] + x_edges[1:]) / 2,
+        y=(y_edges[:-1] + y_edges[1:]) / 2,
+        z=z,
+        colorscale='Viridis',
+        colorbar={'title': 'Communities'},
+        hovertemplate='Population: %{x:.3f}<br>Crime rate: %{y:.3f}<br>Communities: %{z}<extra></extra>'
+    ))
+    density_fig.update_layout(
+        title=f'Crime Rate vs Population<br><sup>Density of {len(x):,} communities - zoom in to see individual points</sup>',
+        xaxis_title=SCATTER_LABELS['population'],
+        yaxis_title=SCATTER_LABELS['ViolentCrimesPerPop'],
+        height=500
+    )
+    return density_fig
+
+
+def build_histogram_figure(histogram):
+    counts, edges = histogram
+    hist_fig = go.Figure(go.Bar(
+        x=(edges[:-1] + edges[1:]) / 2,
+        y=counts,
+        width=np.diff(edges),
+        marker={'color': BOX_COLOR},
+        hovertemplate='Violent Crimes Per Capita=%{x}<br>count=%{y}<extra></extra>'
+    ))
+    hist_fig.update_layout(
+        title='Distribution of Crime Rates',
+        xaxis_title='Violent Crimes Per Capita',
+        yaxis_title='count',
+        bargap=0,
+        height=400
+    )
+    return hist_fig
+
+
+def build_box_figure(boxes):
+    """Box plot from precomputed quartiles, with outliers as a separate marker trace"""
+    box_fig = go.Figure(go.Box(
+        x=boxes['labels'],
+        q1=boxes['q1'],
+        median=boxes['median'],
+        q3=boxes['q3'],
+        lowerfence=boxes['lowerfence'],
+        upperfence=boxes['upperfence'],
+        marker={'color': BOX_COLOR},
+        boxpoints=False,
+        showlegend=False
+    ))
+    outlier_counts = [len(values) for values in boxes['outliers']]
+    if sum(outlier_counts):
+        box_fig.add_trace(go.Scatter(
+            x=np.repeat(boxes['labels'], outlier_counts),
+            y=np.concatenate(boxes['outliers']),
+            mode='markers',
+            marker={'color': BOX_COLOR, 'size': 4},
+            hovertemplate='State=%{x}<br>Violent Crimes Per Capita=%{y}<extra></extra>',
+            showlegend=False
+        ))
+    box_fig.update_layout(
+        title='Crime Rate Distribution by State (Top 10 States)',
+        xaxis_title='State',
+        yaxis_title='Violent Crimes Per Capita',
+        height=400
+    )
+    return box_fig
+
+
+def build_heatmap_figure(corr):
+    heatmap_fig = go.Figure(go.Heatmap(
+        z=corr,
+        x=CORR_COLUMNS,
+        y=CORR_COLUMNS,
+        colorscale='RdBu_r',
+        texttemplate='%{z}',
+        hovertemplate='x: %{x}<br>y: %{y}<br>color: %{z}<extra></extra>'
+    ))
+    heatmap_fig.update_layout(
+        title='Correlation Matrix: Crime Rate vs Socioeconomic Factors',
+        yaxis={'autorange': 'reversed'},
+        height=500
+    )
+    return heatmap_fig
@@ -0,0 +1,124 @@
+"""Single-pass statistics kernel behind the four overview panels"""
+
+import numpy as np
+import pandas as pd
+
+CORR_COLUMNS = [
+    'ViolentCrimesPerPop', 'medIncome', 'PctPopUnderPov', 'PctUnemployed',
+    'pctUrban', 'population', 'racepctblack', 'racePctWhite', 'PctBSorMore'
+]
+# Every numeric column any overview panel reads; the scatter plot's columns
+# are all among the correlation columns
+OVERVIEW_COLUMNS = CORR_COLUMNS
+COLUMN_INDEX = {name: i for i, name in enumerate(OVERVIEW_COLUMNS)}
+
+HISTOGRAM_BINS = 30
+BOXPLOT_STATES = 10
+
+
+class OverviewFrame:
+    """The rows of the communities frame reduced to what the overview reads
+
+    block is a C-contiguous (rows x OVERVIEW_COLUMNS) float64 array; the
+    state abbreviations and community names ride alongside as object arrays.
+    """
+
+    def __init__(self, block, labels, names):
+        self.block = block
+        self.labels = labels
+        self.names = names
+
+    @classmethod
+    def from_frame(cls, df):
+        return cls(
+            np.ascontiguousarray(df[OVERVIEW_COLUMNS].to_numpy(dtype=float)),
+            df['state_abbr'].to_numpy(dtype=object),
+            df['communityname'].to_numpy(dtype=object)
+        )
+
+    def __len__(self):
+        return len(self.block)
+
+    def take(self, rows):
+        return OverviewFrame(self.block[rows], self.labels[rows], self.names[rows])
+
+    def append(self, other):
+        """A new frame with the rows of other after these"""
+        return OverviewFrame(
+            np.concatenate([self.block, other.block]),
+            np.concatenate([self.labels, other.labels]),
+            np.concatenate([self.names, other.names])
+        )
+
+    def column(self, name):
+        return self.block[:, COLUMN_INDEX[name]]
+
+
+def compute_overview_stats(frame):
+    """Histogram, per-state box statistics, correlations and state groups in one pass
+
+    Returns a dict of plain arrays that overview_figures turns into traces:
+      histogram: (counts, bin edges) of the crime rate over HISTOGRAM_BINS bins
+      groups: state labels in order of first appearance with their row positions
+      boxes: quartiles, whisker ends and outliers for the BOXPLOT_STATES largest states
+      corr: correlation matrix of CORR_COLUMNS
+    """
+    crime = frame.column('ViolentCrimesPerPop')
+    groups, counts = group_by_label(frame.labels)
+
+    return {
+        'histogram': np.histogram(crime, bins=HISTOGRAM_BINS),
+        'groups': groups,
+        'boxes': _box_stats(crime, groups, counts),
+        'corr': correlation_matrix(frame)
+    }
+
+
+def correlation_matrix(frame):
+    """Correlation matrix of CORR_COLUMNS over an OverviewFrame"""
+    return _correlation(frame.block[:, [COLUMN_INDEX[name] for name in CORR_COLUMNS]])
+
+
+def group_by_label(labels):
+    """Row positions per label, labels in order of first appearance like plotly express"""
+    codes, uniques = pd.factorize(labels, sort=False)
+    order = np.argsort(codes, kind='stable')
+    counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+    # Rows without a label (code -1) sort first and are skipped
+    starts = np.concatenate([[0], np.cumsum(counts)]) + np.count_nonzero(codes < 0)
+    groups = [(uniques[code], order[starts[code]:starts[code + 1]]) for code in range(len(uniques))]
+    return groups, counts
+
+
+def _box_stats(values, groups, counts):
+    """Tukey box statistics for the states with the most rows, largest first"""
+    top = np.argsort(-counts, kind='stable')[:BOXPLOT_STATES]
+    boxes = {key: [] for key in ('labels', 'q1', 'median', 'q3', 'lowerfence', 'upperfence', 'outliers')}
+    for code in top:
+        label, positions = groups[code]
+        sorted_values = np.sort(values[positions])
+        q1, median, q3 = np.quantile(sorted_values, [0.25, 0.5, 0.75])
+        reach = 1.5 * (q3 - q1)
+        inside = sorted_values[(sorted_values >= q1 - reach) & (sorted_values <= q3 + reach)]
+        boxes['labels'].append(label)
+        boxes['q1'].append(q1)
+        boxes['median'].append(median)
+        boxes['q3'].append(q3)
+        boxes['lowerfence'].append(inside[0])
+        boxes['upperfence'].append(inside[-1])
+        boxes['outliers'].append(sorted_values[(sorted_values < inside[0]) | (sorted_values > inside[-1])])
+    return boxes
+
+
+def _correlation(block):
+    """Pearson correlation of the block's columns via one centered matrix product"""
+    if len(block) < 2:
+        return np.full((block.shape[1], block.shape[1]), np.nan)
+    if np.isnan(block).any():
+        # Pairwise-complete handling for missing values
+        return pd.DataFrame(block).corr().to_numpy()
+    centered = block - block.mean(axis=0)
+    cross = centered.T @ centered
+    scale = np.sqrt(np.diag(cross))
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return cross / np.outer(scale, scale)
@@ -0,0 +1,87 @@
+"""Datasets sharded into many files, parsed concurrently
+
+load_data() accepts a directory or a glob of partition files in the
+communities_crime.data format as well as a single file:
+
+    communities/state=6/year=1995.data       # hive-style keys in directories...
+    communities/state=36_year=1995.data      # ...or in file names
+    'communities/**/*.data'
+
+A directory includes every file below it (names starting with a dot are
+skipped). Partitions are parsed on a process pool of LOAD_WORKERS processes,
+each through the columnar dataset cache, and concatenated once in path
+order. When only some states are wanted, partitions whose state= key names
+another state are not read at all; partitions without the key are read and
+filtered by row.
+"""
+
+import glob
+import hashlib
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+from data_cache import file_digest
+
+LOAD_WORKERS = int(os.environ.get('CRIME_DASHBOARD_LOAD_WORKERS', os.cpu_count() or 1))
+
+# key=value segments of a partition path, separated by /, _ or the extension dot
+PARTITION_KEY = re.compile(r'(?:^|[/_])(\w+?)=([^/_.]+)')
+
+
+def partition_paths(path):
+    """Files making up the dataset at path: the file itself, every file below a directory, or a glob's matches"""
+    if glob.has_magic(path):
+        paths = glob.glob(path, recursive=True)
+    elif os.path.isdir(path):
+        paths = [
+            os.path.join(directory, name)
+            for directory, subdirectories, names in os.walk(path)
+            for name in names if not name.startswith('.')
+        ]
+    else:
+        return [path]
+    paths = sorted(p for p in paths if os.path.isfile(p) and not os.path.basename(p).startswith('.'))
+    if not paths:
+        raise FileNotFoundError(f"No data files in {path}")
+    return paths
+
+
+def partition_keys(path):
+    """{key: value} of the key=value segments in a partition path"""
+    return dict(PARTITION_KEY.findall(path.replace(os.sep, '/')))
+
+
+def may_contain(path, states):
+    """Whether the partition at path can hold rows of states (None for any)"""
+    state = partition_keys(path).get('state')
+    return states is None or state is None or int(state) in states
+
+
+def load_partitions(paths, load, states=None, workers=LOAD_WORKERS, **options):
+    """load(path, states=states, **options) of every partition that may hold states, concatenated"""
+    selected = [path for path in paths if may_contain(path, states)]
+    if not selected:
+        raise FileNotFoundError(f"No partitions hold states {sorted(states)}")
+    load_one = partial(load, states=states, **options)
+    workers = min(workers, len(selected))
+    if workers > 1:
+        with ProcessPoolExecutor(workers) as pool:
+            frames = list(pool.map(load_one, selected))
+    else:
+        frames = [load_one(path) for path in selected]
+    return pd.concat(frames, ignore_index=True)
+
+
+def dataset_digest(path):
+    """file_digest() of a single file, or a digest over every partition's name and contents"""
+    paths = partition_paths(path)
+    if paths == [path]:
+        return file_digest(path)
+    digest = hashlib.sha256()
+    for partition in paths:
+        digest.update(f'{partition}:{file_digest(partition)}\n'.encode())
+    return digest.hexdigest()
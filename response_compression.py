@@ -0,0 +1,57 @@
+"""gzip / brotli compression of the dashboard's HTTP responses
+
+Figure JSON compresses well (repeated keys, base64 typed arrays of
+two-decimal values), so callback responses shrink several times over.
+brotli is used when the brotli package is installed and the browser
+accepts it, gzip otherwise.
+"""
+
+import gzip
+import os
+
+import flask
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSION = os.environ.get('CRIME_DASHBOARD_COMPRESSION', '1') == '1'
+
+# Smaller bodies are not worth the CPU time and header overhead
+MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+COMPRESSIBLE_TYPES = ('application/json', 'application/javascript', 'text/html', 'text/css', 'text/plain')
+
+
+def available_encodings():
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def install_compression(server, min_size=MIN_SIZE):
+    """Compress eligible responses of a Flask server in an after_request hook"""
+
+    @server.after_request
+    def compress_response(response):
+        # Streamed responses (the exports) would be buffered whole; they compress themselves
+        if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+                or 'Content-Encoding' in response.headers
+                or response.mimetype not in COMPRESSIBLE_TYPES):
+            return response
+        encoding = flask.request.accept_encodings.best_match(available_encodings())
+        if encoding is None:
+            return response
+        body = response.get_data()
+        if len(body) < min_size:
+            return response
+        response.set_data(compress(body, encoding))
+        response.headers['Content-Encoding'] = encoding
+        response.vary.add('Accept-Encoding')
+        return response
@@ -0,0 +1,197 @@
+"""Dataset generations shared read-only by every worker process
+
+A single publisher (run once before starting the WSGI server, and again to
+roll out new data) loads the dataset and writes it, together with the
+derived query structures, as memory-mappable .npy files into a generation
+directory, ideally on tmpfs such as /dev/shm. Workers attach with
+shared:///<dir> as CRIME_DASHBOARD_DATABASE_URL (four slashes for an
+absolute path, as with sqlite URLs): the frame, overview block,
+filter index and state summary are rebuilt as read-only views onto the same
+pages, so resident memory no longer grows with the number of workers.
+
+    python shared_dataset.py publish /dev/shm/crime_dashboard [communities_crime.data]
+    CRIME_DASHBOARD_DATABASE_URL=shared:////dev/shm/crime_dashboard gunicorn crime_dashboard_with_map:server
+
+Publishing switches the CURRENT pointer atomically; workers notice on their
+next request (see SharedDataSource.reloaded) and swap generations as a whole.
+"""
+
+import json
+import os
+import shutil
+import sys
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from crime_data import DATA_FILE, load_data
+from data_source import CsvDataSource
+from filter_index import CrimeRangeIndex
+from overview_stats import OverviewFrame
+from summary_engine import StateSummaryEngine
+
+POINTER = 'CURRENT'
+KEEP_GENERATIONS = 2
+RELOAD_CHECK_INTERVAL = float(os.environ.get('CRIME_DASHBOARD_RELOAD_CHECK_INTERVAL', 2.0))
+
+
+def publish_generation(df, root):
+    """Write df and its derived structures as a new generation and make it current"""
+    os.makedirs(root, exist_ok=True)
+    generation = _current_generation(root) + 1
+    name = f'gen-{generation:06d}'
+    tmp = os.path.join(root, f'.{name}.tmp-{os.getpid()}')
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    df = df.reset_index(drop=True)
+    float_columns = [c for c in df.columns if pd.api.types.is_float_dtype(df[c])]
+    int_columns = [c for c in df.columns if pd.api.types.is_integer_dtype(df[c])]
+    string_columns = [c for c in df.columns if c not in float_columns and c not in int_columns]
+
+    # Column-major 2D blocks: each column is contiguous and the frame becomes one block per dtype
+    np.save(os.path.join(tmp, 'float.npy'), np.ascontiguousarray(df[float_columns].to_numpy(dtype=np.float64).T))
+    np.save(os.path.join(tmp, 'int.npy'), np.ascontiguousarray(df[int_columns].to_numpy(dtype=np.int64).T))
+    categories = {}
+    for column in string_columns:
+        codes, uniques = pd.factorize(df[column])
+        np.save(os.path.join(tmp, f'{column}.codes.npy'), codes.astype(np.int32))
+        categories[column] = [str(value) for value in uniques]
+
+    overview = OverviewFrame.from_frame(df)
+    np.save(os.path.join(tmp, 'overview.npy'), overview.block)
+    index = CrimeRangeIndex.from_frame(df)
+    for array in CrimeRangeIndex.ARRAYS:
+        np.save(os.path.join(tmp, f'index.{array}.npy'), getattr(index, array))
+
+    summary = StateSummaryEngine.from_frame(df).summary()
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump({
+            'generation': generation,
+            'rows': len(df),
+            'columns': list(df.columns),
+            'float_columns': float_columns,
+            'int_columns': int_columns,
+            'categories': categories,
+            'state_runs': {str(state): [int(start), int(end)] for state, (start, end) in index.state_runs.items()},
+            'state_summary': json.loads(summary.to_json(orient='split', index=False)),
+        }, f)
+
+    os.rename(tmp, os.path.join(root, name))
+    # Atomic pointer swap: readers see either the old or the new generation
+    pointer_tmp = os.path.join(root, f'.{POINTER}.tmp-{os.getpid()}')
+    with open(pointer_tmp, 'w') as f:
+        f.write(name)
+    os.replace(pointer_tmp, os.path.join(root, POINTER))
+    _prune_generations(root, keep=KEEP_GENERATIONS)
+    return name
+
+
+def _current_generation(root):
+    name = read_pointer(root)
+    return int(name.split('-')[1]) if name else 0
+
+
+def read_pointer(root):
+    try:
+        with open(os.path.join(root, POINTER)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+
+def _prune_generations(root, keep):
+    # Workers still mapping a removed generation keep their pages until they swap
+    generations = sorted(name for name in os.listdir(root) if name.startswith('gen-'))
+    for name in generations[:-keep]:
+        shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+
+def attach_generation(path):
+    """Read-only, zero-copy views of a published generation
+
+    Returns (df, overview_frame, crime_index, state_summary, meta).
+    """
+    def load(name):
+        return np.load(os.path.join(path, name), mmap_mode='r')
+
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f)
+
+    parts = [
+        pd.DataFrame(load('float.npy').T, columns=meta['float_columns'], copy=False),
+        pd.DataFrame(load('int.npy').T, columns=meta['int_columns'], copy=False),
+    ]
+    categoricals = {
+        column: pd.Categorical.from_codes(load(f'{column}.codes.npy'), categories=values)
+        for column, values in meta['categories'].items()
+    }
+    df = pd.concat(parts, axis=1)
+    for column, values in categoricals.items():
+        df[column] = values
+    # Same column order as the CSV backend's frame
+    df = df[meta['columns']]
+
+    overview_frame = OverviewFrame(load('overview.npy'), categoricals['state_abbr'], categoricals['communityname'])
+    crime_index = CrimeRangeIndex.from_arrays(
+        {array: load(f'index.{array}.npy') for array in CrimeRangeIndex.ARRAYS},
+        meta['state_runs']
+    )
+    split = meta['state_summary']
+    state_summary = pd.DataFrame(split['data'], columns=split['columns'])
+    return df, overview_frame, crime_index, state_summary, meta
+
+
+class SharedDataSource(CsvDataSource):
+    """CsvDataSource whose data lives in a published shared generation"""
+
+    def __init__(self, root):
+        self.root = root
+        self.generation = read_pointer(root)
+        if self.generation is None:
+            raise FileNotFoundError(f"No dataset published in {root}; run: python shared_dataset.py publish {root}")
+        self.path = os.path.join(root, self.generation)
+        self.df, self.overview_frame, self.crime_index, self._summary, self.meta = attach_generation(self.path)
+        self._engine = None
+        self._correlations = None
+        self.appended = 0
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        self._next_check = time.monotonic() + RELOAD_CHECK_INTERVAL
+
+    @property
+    def engine(self):
+        # Only needed to fold in new rows; built on first use
+        if self._engine is None:
+            self._engine = StateSummaryEngine.from_frame(self.df)
+        return self._engine
+
+    def state_summary(self):
+        with self._write_lock:
+            return self._summary.copy() if self._engine is None else self._engine.summary()
+
+    def fingerprint(self):
+        return None if self.appended else f'{os.path.abspath(self.path)}:{self.meta["generation"]}'
+
+    def reloaded(self):
+        """A source for the newest generation if one was published since, else None"""
+        now = time.monotonic()
+        if now < self._next_check or not self._lock.acquire(blocking=False):
+            return None
+        try:
+            self._next_check = now + RELOAD_CHECK_INTERVAL
+            if read_pointer(self.root) in (None, self.generation):
+                return None
+            return SharedDataSource(self.root)
+        finally:
+            self._lock.release()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (3, 4) or sys.argv[1] != 'publish':
+        sys.exit(__doc__)
+    root = sys.argv[2]
+    path = sys.argv[3] if len(sys.argv) == 4 else DATA_FILE
+    print(f"Published {publish_generation(load_data(path), root)} to {root}")
@@ -0,0 +1,86 @@
+"""Startup timeline of a dashboard process, up to its first response
+
+Cold starts (a new autoscaled instance, a restarted worker) pay for
+importing the libraries, loading the data and prerendering the default
+views before the first request can be answered. The app marks each phase
+as it finishes; once the first response has gone out the breakdown is
+written to stderr, and it stays available at /stats/startup and as the
+crime_dashboard_startup_seconds metric.
+
+crime_dashboard_with_map.py imports this module first, so the clock starts
+before the heavy imports; it must therefore only use the standard library.
+"""
+
+import sys
+import threading
+import time
+
+# Taken when the app module starts importing its dependencies
+STARTED = time.perf_counter()
+
+
+class StartupTimeline:
+    """Ordered (phase, seconds since start) marks of one process's startup"""
+
+    def __init__(self, started=STARTED):
+        self.started = started
+        self.marks = []
+        self.first_path = None
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        """Record that phase ended now"""
+        with self._lock:
+            self.marks.append((phase, time.perf_counter() - self.started))
+
+    def mark_first_response(self, path):
+        """Record the end of the first response; False for every later one"""
+        with self._lock:
+            if self.first_path is not None:
+                return False
+            self.first_path = path
+            self.marks.append(('first_response', time.perf_counter() - self.started))
+            return True
+
+    def phases(self):
+        """[(phase, seconds it took, seconds since start)] in order"""
+        with self._lock:
+            marks = list(self.marks)
+        ends = [0.0] + [end for _, end in marks]
+        return [(phase, end - previous, end) for (phase, end), previous in zip(marks, ends)]
+
+    def stats(self):
+        return {
+            'phases': [{'phase': phase, 'seconds': round(took, 4), 'since_start': round(end, 4)}
+                       for phase, took, end in self.phases()],
+            'first_response_path': self.first_path
+        }
+
+    def report(self):
+        lines = [f"{phase:<16} {took * 1000:9.1f} ms   (at {end * 1000:9.1f} ms)" for phase, took, end in self.phases()]
+        return '\n'.join(['Startup timeline:'] + lines)
+
+    def metrics(self):
+        return [(
+            'crime_dashboard_startup_seconds', 'Seconds each startup phase took',
+            {(('phase', phase),): took for phase, took, _ in self.phases()}
+        )]
+
+
+STARTUP = StartupTimeline()
+
+
+def install_startup_report(server, timeline=STARTUP, path='/stats/startup'):
+    """Mark a Flask server's first response, report the timeline then, and serve it at path"""
+    # Installed once the app is built, so Flask is loaded by then
+    import flask
+
+    @server.after_request
+    def record_first_response(response):
+        if timeline.mark_first_response(flask.request.path):
+            print(timeline.report(), file=sys.stderr)
+        return response
+
+    @server.route(path)
+    def startup_stats():
+        return timeline.stats()
@@ -0,0 +1,250 @@
+"""Streaming ingestion of new community records
+
+New rows in the communities_crime.data format are read from a directory or
+a Unix socket, validated against the column schema and handed on in
+micro-batches, prepared exactly as load_data() prepares the file:
+
+    CRIME_DASHBOARD_STREAM=dir:///incoming         # lines appended to files in incoming/
+    CRIME_DASHBOARD_STREAM=unix:///ingest.sock     # lines written to the socket
+
+(four slashes for absolute paths, as with the database URLs). Files in the
+directory are read from the start and then followed as they grow, so after
+a restart the in-memory store again holds the data file plus every
+streamed row; names starting with a dot are skipped, which lets writers
+rename finished temporary files into place. Rows can be sent to the
+socket with e.g. `nc -U ingest.sock < new_rows.data`.
+
+A batch is handed on once BATCH_ROWS lines have arrived or BATCH_SECONDS
+after its first line. Rejected lines are logged with the reason.
+"""
+
+import csv
+import io
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+
+import pandas as pd
+
+from crime_data import COLUMN_NAMES, STATE_FIPS_MAPPING, prepare_frame
+
+STREAM_URL = os.environ.get('CRIME_DASHBOARD_STREAM')
+BATCH_ROWS = int(os.environ.get('CRIME_DASHBOARD_STREAM_BATCH_ROWS', 1000))
+BATCH_SECONDS = float(os.environ.get('CRIME_DASHBOARD_STREAM_BATCH_SECONDS', 1.0))
+# How often browsers ask whether the dataset changed
+REFRESH_INTERVAL_MS = int(os.environ.get('CRIME_DASHBOARD_STREAM_REFRESH_MS', 5000))
+POLL_INTERVAL = 1.0
+
+# Integer codes; every other numeric attribute is normalized to [0, 1]
+CODE_COLUMNS = ['state', 'county', 'community', 'fold']
+NAME_COLUMN = 'communityname'
+# Rows without these are rejected (load_data drops rows without a crime rate)
+REQUIRED_FIELDS = ['state', 'ViolentCrimesPerPop']
+
+logger = logging.getLogger(__name__)
+
+
+def parse_batch(lines):
+    """Validate lines of the data file format and prepare the valid ones
+
+    Returns (frame, rejected): frame as load_data() would return those rows
+    (None if there are none) and rejected as (line, reason) pairs.
+    """
+    lines = [line.rstrip('\r\n') for line in lines]
+    lines = [line for line in lines if line.strip()]
+    rejected = []
+    candidates = []
+    for line in lines:
+        fields = line.count(',') + 1
+        if fields == len(COLUMN_NAMES):
+            candidates.append(line)
+        else:
+            rejected.append((line, f'expected {len(COLUMN_NAMES)} fields, got {fields}'))
+    if not candidates:
+        return None, rejected
+
+    raw = pd.read_csv(io.StringIO('\n'.join(candidates)), names=COLUMN_NAMES, dtype=str,
+                      keep_default_na=False, quoting=csv.QUOTE_NONE)
+    reasons = pd.Series(None, index=raw.index, dtype=object)
+    for column in COLUMN_NAMES:
+        if column == NAME_COLUMN:
+            continue
+        text = raw[column].str.strip()
+        missing = text == '?'
+        values = pd.to_numeric(text.mask(missing), errors='coerce')
+        checks = [(values.isna() & ~missing, f'{column} is not a number')]
+        if column in REQUIRED_FIELDS:
+            checks.append((missing, f'{column} is missing'))
+        if column in CODE_COLUMNS:
+            checks.append((values.notna() & (values % 1 != 0), f'{column} is not an integer code'))
+        else:
+            checks.append((values.notna() & ((values < 0) | (values > 1)), f'{column} is outside [0, 1]'))
+        if column == 'state':
+            checks.append((values.notna() & ~values.isin(list(STATE_FIPS_MAPPING)), 'unknown state code'))
+        for failed, reason in checks:
+            reasons = reasons.mask(reasons.isna() & failed, reason)
+
+    valid = reasons.isna().to_numpy()
+    rejected += [(line, reason) for line, reason, ok in zip(candidates, reasons, valid) if not ok]
+    if not valid.any():
+        return None, rejected
+    accepted = '\n'.join(line for line, ok in zip(candidates, valid) if ok)
+    frame = pd.read_csv(io.StringIO(accepted), names=COLUMN_NAMES, na_values='?')
+    return prepare_frame(frame), rejected
+
+
+class DirectoryTail:
+    """Follows every file in a directory and emits each complete new line"""
+
+    def __init__(self, path, emit, poll_interval=POLL_INTERVAL):
+        self.path = path
+        self.emit = emit
+        self.poll_interval = poll_interval
+        self.offsets = {}
+
+    def run(self, stopped):
+        while not stopped.is_set():
+            try:
+                self.poll()
+            except OSError:
+                # The directory or a file went away or became unreadable; try again
+                logger.exception("Could not read streamed rows from %s", self.path)
+            stopped.wait(self.poll_interval)
+
+    def poll(self):
+        for name in sorted(os.listdir(self.path)):
+            path = os.path.join(self.path, name)
+            if name.startswith('.') or not os.path.isfile(path):
+                continue
+            offset = self.offsets.get(name, 0)
+            size = os.path.getsize(path)
+            if size < offset:
+                # Truncated or replaced: start over
+                offset = 0
+            if size == offset:
+                continue
+            with open(path, 'rb') as f:
+                f.seek(offset)
+                data = f.read(size - offset)
+            # A trailing partial line is read again once it is complete
+            end = data.rfind(b'\n') + 1
+            self.offsets[name] = offset + end
+            for line in data[:end].decode('utf-8', errors='replace').splitlines():
+                self.emit(line)
+
+
+class SocketListener:
+    """Accepts connections on a Unix socket and emits every line received"""
+
+    def __init__(self, path, emit):
+        self.path = path
+        self.emit = emit
+
+    def run(self, stopped):
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        server.bind(self.path)
+        server.listen()
+        server.settimeout(POLL_INTERVAL)
+        try:
+            while not stopped.is_set():
+                try:
+                    conn, _ = server.accept()
+                except socket.timeout:
+                    continue
+                threading.Thread(target=self._read, args=(conn,), name='stream-connection', daemon=True).start()
+        finally:
+            server.close()
+            if os.path.exists(self.path):
+                os.unlink(self.path)
+
+    def _read(self, conn):
+        with conn, conn.makefile('r', encoding='utf-8', errors='replace') as lines:
+            for line in lines:
+                self.emit(line)
+
+
+def open_stream(url, emit):
+    """Line source for a dir:/// or unix:/// stream URL, whose directory must exist"""
+    scheme, _, path = url.partition(':///')
+    if scheme == 'dir':
+        if not os.path.isdir(path):
+            raise FileNotFoundError(f"Stream directory not found: {path}")
+        return DirectoryTail(path, emit)
+    if scheme == 'unix':
+        if not os.path.isdir(os.path.dirname(path) or '.'):
+            raise FileNotFoundError(f"Directory of the stream socket not found: {path}")
+        return SocketListener(path, emit)
+    raise ValueError(f"Unsupported stream URL: {url}")
+
+
+class StreamIngester:
+    """Reads a stream in background threads and calls on_batch(frame) per micro-batch"""
+
+    def __init__(self, url, on_batch, batch_rows=BATCH_ROWS, batch_seconds=BATCH_SECONDS):
+        self.url = url
+        self.on_batch = on_batch
+        self.batch_rows = batch_rows
+        self.batch_seconds = batch_seconds
+        self.accepted = 0
+        self.rejected = 0
+        self.batches = 0
+        self._lines = queue.Queue()
+        self._stopped = threading.Event()
+        self._source = open_stream(url, self._lines.put)
+        self._threads = []
+
+    def start(self):
+        for target, name in ((self._source.run, 'stream-reader'), (self._batch_loop, 'stream-batcher')):
+            thread = threading.Thread(target=target, args=(self._stopped,), name=name, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5):
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def stats(self):
+        return {'accepted': self.accepted, 'rejected': self.rejected, 'batches': self.batches}
+
+    def _next_batch(self, stopped):
+        try:
+            lines = [self._lines.get(timeout=POLL_INTERVAL)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.batch_seconds
+        while len(lines) < self.batch_rows and not stopped.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                lines.append(self._lines.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return lines
+
+    def _batch_loop(self, stopped):
+        while not stopped.is_set():
+            lines = self._next_batch(stopped)
+            if not lines:
+                continue
+            frame, rejected = parse_batch(lines)
+            for line, reason in rejected:
+                logger.warning("Rejected streamed row (%s): %.80s", reason, line)
+            self.rejected += len(rejected)
+            if frame is None or frame.empty:
+                continue
+            try:
+                self.on_batch(frame)
+            except Exception:
+                logger.exception("Could not apply a batch of %d streamed rows", len(frame))
+                self.rejected += len(frame)
+                continue
+            self.accepted += len(frame)
+            self.batches += 1
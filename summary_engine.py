@@ -0,0 +1,173 @@
+"""Incrementally maintained state-level aggregates of the communities frame"""
+
+import numpy as np
+import pandas as pd
+
+# Median sketch grid over [0, 1]; exact for values with up to 4 decimals
+QUANTILE_RESOLUTION = 10000
+
+CRIME_COLUMN = 'ViolentCrimesPerPop'
+SUM_COLUMNS = ['population']
+MEAN_COLUMNS = ['medIncome', 'PctPopUnderPov', 'pctUrban']
+# Every column the engine reads
+INPUT_COLUMNS = ['state', 'state_abbr', CRIME_COLUMN] + SUM_COLUMNS + MEAN_COLUMNS
+
+SUMMARY_COLUMNS = [
+    'state', 'state_abbr', 'crime_rate_mean', 'crime_rate_median', 'crime_rate_std',
+    'num_communities', 'total_population', 'avg_income', 'avg_poverty_rate', 'avg_urban_pct'
+]
+
+
+def check_range(values):
+    """values as a float array, raising ValueError if any is missing or outside the [0, 1] grid"""
+    values = np.asarray(values, dtype=float)
+    outside = ~((values >= 0) & (values <= 1))
+    if outside.any():
+        raise ValueError(
+            f"{int(outside.sum())} values outside [0, 1] (e.g. {values[outside][0]}); "
+            "the median sketch only holds normalized values"
+        )
+    return values
+
+
+class QuantileSketch:
+    """Histogram of values on a fixed [0, 1] grid
+
+    Supports inserts, deletes and merging by adding counts, and answers
+    quantiles with the same linear interpolation pandas uses. Values outside
+    [0, 1] are refused rather than clipped into the end bins.
+    """
+
+    def __init__(self, resolution=QUANTILE_RESOLUTION):
+        self.resolution = resolution
+        self.counts = np.zeros(resolution + 1, dtype=np.int64)
+
+    def _bins(self, values):
+        values = check_range(values)
+        return np.rint(values * self.resolution).astype(np.intp)
+
+    def update(self, values, sign=1):
+        self.counts += sign * np.bincount(self._bins(values), minlength=len(self.counts))
+
+    def merge(self, other):
+        self.counts += other.counts
+
+    def count(self):
+        return int(self.counts.sum())
+
+    def quantile(self, q):
+        n = self.count()
+        if n == 0:
+            return np.nan
+        position = q * (n - 1)
+        lower, upper = int(np.floor(position)), int(np.ceil(position))
+        cumulative = np.cumsum(self.counts)
+        # Bin holding the k-th smallest value (0-based) is the first with cumulative count > k
+        lo_value, hi_value = np.searchsorted(cumulative, [lower, upper], side='right') / self.resolution
+        return lo_value + (hi_value - lo_value) * (position - lower)
+
+
+class StateAggregate:
+    """Running aggregates for one state"""
+
+    def __init__(self, resolution=QUANTILE_RESOLUTION):
+        # Welford/Chan moments of the crime rate
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = QuantileSketch(resolution)
+        # (sum, non-null count) for columns that are summed or averaged
+        self.sums = {column: [0.0, 0] for column in SUM_COLUMNS + MEAN_COLUMNS}
+
+    def apply(self, rows, sign):
+        """Add (sign=1) or remove (sign=-1) a batch of rows belonging to this state"""
+        values = rows[CRIME_COLUMN].to_numpy(dtype=float)
+        n = len(values)
+        batch_mean = values.mean()
+        batch_m2 = ((values - batch_mean) ** 2).sum()
+
+        if sign > 0:
+            total = self.count + n
+            delta = batch_mean - self.mean
+            self.mean += delta * n / total
+            self.m2 += batch_m2 + delta ** 2 * self.count * n / total
+            self.count = total
+        else:
+            # Chan's merge run backwards: recover the aggregate without the batch
+            remaining = self.count - n
+            if remaining <= 0:
+                self.count, self.mean, self.m2 = 0, 0.0, 0.0
+            else:
+                new_mean = (self.count * self.mean - n * batch_mean) / remaining
+                delta = batch_mean - new_mean
+                self.m2 = max(self.m2 - batch_m2 - delta ** 2 * remaining * n / self.count, 0.0)
+                self.mean = new_mean
+                self.count = remaining
+        self.sketch.update(values, sign)
+
+        for column, totals in self.sums.items():
+            column_values = rows[column].to_numpy(dtype=float)
+            present = ~np.isnan(column_values)
+            totals[0] += sign * column_values[present].sum()
+            totals[1] += sign * int(present.sum())
+
+    def row(self):
+        """Values in the order of SUMMARY_COLUMNS, minus the state keys"""
+        def mean_of(column):
+            total, present = self.sums[column]
+            return total / present if present else np.nan
+
+        std = np.sqrt(self.m2 / (self.count - 1)) if self.count > 1 else np.nan
+        return [
+            self.mean, self.sketch.quantile(0.5), std, self.count,
+            self.sums['population'][0],
+            mean_of('medIncome'), mean_of('PctPopUnderPov'), mean_of('pctUrban')
+        ]
+
+
+class StateSummaryEngine:
+    """Per-state aggregates that absorb inserted and deleted rows in O(delta)
+
+    summary() returns the same frame create_state_summary() builds with a
+    full groupby: mean/median/std/count of the crime rate plus the
+    population, income, poverty and urban aggregates, rounded to 4 places.
+    """
+
+    def __init__(self, resolution=QUANTILE_RESOLUTION):
+        self.resolution = resolution
+        self.states = {}
+
+    @classmethod
+    def from_frame(cls, df, resolution=QUANTILE_RESOLUTION):
+        engine = cls(resolution)
+        engine.insert(df[INPUT_COLUMNS])
+        return engine
+
+    def insert(self, rows):
+        self._apply(rows, 1)
+
+    def delete(self, rows):
+        self._apply(rows, -1)
+
+    def _apply(self, rows, sign):
+        # Match groupby's default of dropping rows without a state abbreviation
+        rows = rows.dropna(subset=['state_abbr', CRIME_COLUMN])
+        # Checked up front, so a bad batch leaves every state unchanged
+        check_range(rows[CRIME_COLUMN])
+        for key, group in rows.groupby(['state', 'state_abbr'], sort=False):
+            aggregate = self.states.get(key)
+            if aggregate is None:
+                if sign < 0:
+                    raise KeyError(f"Cannot delete rows for unknown state {key}")
+                aggregate = self.states[key] = StateAggregate(self.resolution)
+            aggregate.apply(group, sign)
+            if aggregate.count == 0:
+                del self.states[key]
+
+    def summary(self):
+        records = [list(key) + aggregate.row() for key, aggregate in sorted(self.states.items())]
+        summary = pd.DataFrame(records, columns=SUMMARY_COLUMNS)
+        summary['num_communities'] = summary['num_communities'].astype('int64')
+        value_columns = SUMMARY_COLUMNS[2:]
+        summary[value_columns] = summary[value_columns].round(4)
+        return summary